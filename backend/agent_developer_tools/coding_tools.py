@@ -1,14 +1,37 @@
 # coding tools
 # purpose: allows agent to write/read/delete/edit files on the active project path
 
-from SimpleAgent.SimpleAgent.litellm_interface import LitellmInterface
 from pathlib import Path
 import prompts
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 # helpers for editing files
-from .utils.file_utils import write_file, read_file, delete_file
+from .utils.file_utils import write_file, write_files, read_file, delete_file
 from .utils.active_project_path import load_active_project_path
+from .utils.edit_engine import apply_edit_locally
+from .utils.diff_utils import describe_change, estimate_tokens, file_summary, record_result
+from .utils.tree_index import get_tree_index
+from .utils.search_index import get_search_index
+from .utils.tool_executor import get_tool_executor
+from .utils.merge_stream import consume_merge_stream
+from .utils.outline import outline as file_outline, format_outline, MAX_ITEMS as OUTLINE_MAX_ITEMS
+from settings_store import settings_store
+import tracing
+from log_writer import log
+
+# merge model interface, imported on the first llm merge (litellm is slow to import)
+LitellmInterface = None
+
+def _merge_model_class():
+    global LitellmInterface
+    if LitellmInterface is None:
+        from SimpleAgent.SimpleAgent.litellm_interface import LitellmInterface as interface
+        LitellmInterface = interface
+    return LitellmInterface
+
+# whole-file reads bigger than this return the first part and a continuation (settings.json: read_file_max_chars)
+READ_FILE_MAX_CHARS = 20000
 
 
 def write_file_tool(file_path, file_name, contents):
@@ -21,7 +44,7 @@ def write_file_tool(file_path, file_name, contents):
     
     result = write_file(full_path, contents)
     if result == 0:
-        return f"Successfully wrote to file {file_name}"
+        return f"Successfully wrote to file {file_name} ({file_summary(file_name, contents)})"
     elif result == 2:
         return f"Write access to {file_name} is not allowed"
     elif result == 3:
@@ -29,7 +52,13 @@ def write_file_tool(file_path, file_name, contents):
     else:
         return f"Unknown error writing to file {file_name}"
     
-def read_file_tool(file_path, file_name):
+def read_file_tool(file_path, file_name, start_line=None, end_line=None, byte_offset=None, byte_length=None, outline=False, max_chars=None):
+    try:
+        start_line, end_line, byte_offset, byte_length, max_chars = (
+            None if value is None else int(value) for value in (start_line, end_line, byte_offset, byte_length, max_chars)
+        )
+    except (TypeError, ValueError):
+        return f"Error reading file {file_name}: start_line, end_line, byte_offset, byte_length and max_chars must be integers"
     active_project_path = load_active_project_path()
     full_path = os.path.join(active_project_path, file_path, file_name)
     result = read_file(full_path)
@@ -39,8 +68,61 @@ def read_file_tool(file_path, file_name):
         return f"Read access to {file_name} is not allowed"
     elif result == 3:
         return f"Error reading file {file_name}"
-    else:
-        return result
+    # the hash lets later edits/compaction tell which version of the file this was
+    summary = file_summary(file_name, result)
+    # the model may ask for less than the configured limit, never for more
+    limit = settings_store.get_value("read_file_max_chars", READ_FILE_MAX_CHARS)
+    max_chars = max(min(max_chars, limit), 1) if max_chars else limit
+
+    if outline:
+        items = file_outline(file_name, result)
+        if not items:
+            return f"[{summary}; outline]\nNo outline available for {file_name}, read a line range instead"
+        # start_line/end_line pick the part of the file to outline, the same size guard as a read applies
+        items = [item for item in items if (start_line or 1) <= item[0] <= (end_line or item[0])]
+        text, shown = "", 0
+        for item in items[:OUTLINE_MAX_ITEMS]:
+            line = format_outline([item]) + "\n"
+            # at least one item, so the continuation always moves forward
+            if text and len(text) + len(line) > max_chars:
+                break
+            text += line
+            shown += 1
+        more = ""
+        if shown < len(items):
+            more = f"; {shown} of {len(items)} items, continue with outline=true, start_line={items[shown][0]}"
+        return f"[{summary}; outline, line: item{more}]\n{text}"
+
+    if byte_offset is not None or byte_length is not None:
+        data = result.encode("utf-8")
+        start = max(byte_offset or 0, 0)
+        length = min(byte_length or max_chars, max_chars)
+        end = min(start + length, len(data))
+        # cut multi-byte characters at the edges are dropped
+        text = data[start:end].decode("utf-8", errors="ignore")
+        more = f"; continue with byte_offset={end}" if end < len(data) else ""
+        return f"[{summary}; bytes {start}-{end} of {len(data)}{more}]\n{text}"
+
+    lines = result.splitlines(keepends=True)
+    if start_line is None and end_line is None and len(result) <= max_chars:
+        return f"[{summary}]\n{result}"
+
+    first = max(start_line or 1, 1)
+    last = min(end_line or len(lines), len(lines))
+    text, shown_to = "", first - 1
+    for number in range(first, last + 1):
+        if len(text) + len(lines[number - 1]) > max_chars:
+            break
+        text += lines[number - 1]
+        shown_to = number
+    if shown_to < first and first <= last:
+        # a single line longer than the limit (minified code), fall back to a byte range
+        line_offset = len("".join(lines[:first - 1]).encode("utf-8"))
+        return read_file_tool(file_path, file_name, byte_offset=line_offset, byte_length=max_chars, max_chars=max_chars)
+    more = ""
+    if shown_to < last:
+        more = f"; truncated at {max_chars} characters, continue with start_line={shown_to + 1}"
+    return f"[{summary}; lines {first}-{shown_to} of {len(lines)}{more}]\n{text}"
 
 def delete_file_tool(file_path, file_name):
     active_project_path = load_active_project_path()
@@ -57,50 +139,15 @@ def delete_file_tool(file_path, file_name):
     else:
         return f"Unknown error deleting file {file_name}"
 
-def list_project_directory_tool():
+def list_project_directory_tool(path="", depth=None, pattern=None):
     active_project_path = load_active_project_path()
     """Returns a JSON representation of the project directory structure"""
     try:
-        def build_directory_tree(directory):
-            result = []
-            
-            # Get all items in the directory
-            items = sorted(os.listdir(directory))
-            
-            # Process each item
-            for item in items:
-                # Skip hidden files and directories
-                if item.startswith('.'):
-                    continue
-                    
-                # Create full path
-                path = os.path.join(directory, item)
-                
-                if os.path.isdir(path):
-                    # Special handling for node_modules directory
-                    if item == "node_modules":
-                        result.append({
-                            "name": item,
-                            "type": "directory",
-                            "children": [{"name": "(node modules not shown)", "type": "info"}]
-                        })
-                    else:
-                        # If it's a directory, add it with its children
-                        result.append({
-                            "name": item,
-                            "type": "directory",
-                            "children": build_directory_tree(path)
-                        })
-                else:
-                    # If it's a file, just add it
-                    result.append({
-                        "name": item,
-                        "type": "file"
-                    })
-            
-            return result
-        
-        return build_directory_tree(active_project_path)
+        # served from the in-memory project index, kept current by the write/delete tools
+        index = get_tree_index(active_project_path)
+        if pattern:
+            return [{"name": match, "type": "file"} for match in index.glob(pattern, path)]
+        return index.list_tree(path, depth)
         # return json.dumps({
         #     "root": os.path.basename(active_project_path),
         #     "contents": directory_tree
@@ -108,39 +155,180 @@ def list_project_directory_tool():
     except Exception as e:
         return json.dumps({"error": f"Error listing project directory: {str(e)}"})
 
-def edit_file_tool(file_path, file_name, code_snippet, instructions=None):
+def search_project_tool(query, regex=False, glob=None, case_sensitive=False, context_lines=1, max_results=50):
+    """Finds text (or a regex) in the project's files, returns matches with line numbers and context"""
     active_project_path = load_active_project_path()
-    """for minor edits, use this tool"""
-    full_path = os.path.join(active_project_path, file_path, file_name)
-    current_code = read_file(full_path)
+    try:
+        matches, truncated = get_search_index(active_project_path).search(
+            query, regex=regex, glob=glob, case_sensitive=case_sensitive,
+            context_lines=max(0, min(context_lines, 5)), max_results=max_results
+        )
+    except ValueError as e:
+        return json.dumps({"error": str(e)})
+    except Exception as e:
+        return json.dumps({"error": f"Error searching project: {str(e)}"})
+    if not matches:
+        return f"No matches for {query}"
+    return {"shown": len(matches), "truncated": truncated, "matches": matches}
 
+def _merge_edit(current_code, file_name, code_snippet, instructions=None, full_path=None):
+    """returns (edited code, method), placing the edit locally when confident, otherwise with the merge model"""
+    # try to place the edit locally first (exact/whitespace-tolerant anchors, search/replace blocks, diff hunks)
+    local_edit = apply_edit_locally(current_code, code_snippet, instructions)
+    if local_edit.content is not None:
+        log.tool(f"edit_file_tool: applied edit to {file_name} locally ({local_edit.method}: {local_edit.detail})", file=full_path, method=local_edit.method)
+        return local_edit.content, local_edit.method
     # apply edit instructions to code
-    try:
-        system_message = prompts.apply_edit_tool_system_prompt
-        prompt = prompts.apply_edit_tool_prompt + "<original>" + current_code + "</original>" + "<code_snippet>" + code_snippet + "</code_snippet>"
-        if instructions is not None:
-            prompt += "<instructions>" + instructions + "</instructions>"
-        bot = LitellmInterface(
+    log.tool(f"edit_file_tool: local apply not confident for {file_name} ({local_edit.detail}), using llm merge", file=full_path, snippet=code_snippet)
+    system_message = prompts.apply_edit_tool_system_prompt
+    prompt = prompts.apply_edit_tool_prompt + "<original>" + current_code + "</original>" + "<code_snippet>" + code_snippet + "</code_snippet>"
+    if instructions is not None:
+        prompt += "<instructions>" + instructions + "</instructions>"
+    # streamed, so progress reaches the preview from the first chunk instead of after the whole rewrite
+    stream = settings_store.get_value("stream_edit_merges", True)
+    merge_model = "openai/gpt-4o-mini"
+    with tracing.span("llm:merge", model=merge_model, file=file_name) as llm:
+        bot = _merge_model_class()(
             name="code_predictor",
-            model="openai/gpt-4o-mini",
+            model=merge_model,
             system_role=system_message,
-            stream=False,
+            stream=stream,
         )
-        edited_code = bot.prompt(prompt=prompt, predicted_output=current_code)
+        output = bot.prompt(prompt=prompt, predicted_output=current_code)
+        ttft = {}
+        if not isinstance(output, str):
+            output = tracing.timed_chunks(output, lambda seconds: ttft.setdefault("seconds", seconds))
+        edited_code = consume_merge_stream(output, current_code, code_snippet, full_path, file_name)
+        # estimates, the interface doesn't hand back the provider's usage
+        llm.set(tokens_in=estimate_tokens(system_message + prompt), tokens_out=estimate_tokens(edited_code),
+                time_to_first_chunk_ms=round(ttft["seconds"] * 1000, 1) if ttft else None)
+        tracing.record_llm_call("merge", merge_model, ttft.get("seconds"), llm.attrs["tokens_in"], llm.attrs["tokens_out"])
+    return edited_code, "llm_merge"
+
+def edit_file_tool(file_path, file_name, code_snippet, instructions=None, return_full_contents=False):
+    active_project_path = load_active_project_path()
+    """for minor edits, use this tool"""
+    full_path = os.path.join(active_project_path, file_path, file_name)
+    current_code = read_file(full_path)
+    if current_code == 1:
+        return f"File {file_name} does not exist"
+    elif current_code == 2:
+        return f"Edit access to {file_name} is not allowed"
+    elif current_code == 3:
+        return f"Error reading file {file_name}"
+
+    try:
+        edited_code, edit_method = _merge_edit(current_code, file_name, code_snippet, instructions, full_path)
     except Exception as e:
         return f"Error applying edit to file {file_name}: {str(e)}"
 
-    # write the edited code to the file
-    result = write_file(full_path, edited_code)
+    # write the edited code to the file (staged and swapped in, the preview never sees a half written file)
+    result = write_files({full_path: edited_code})
     if result == 0:
-        return f"Successfully applied edit to file {file_name}. New file contents: {edited_code}"
+        # return a diff instead of the whole file, it stays in the conversation for every later turn
+        change = describe_change(current_code, edited_code, file_name)
+        message = f"Successfully applied edit to file {file_name} (applied via {edit_method}). {file_summary(file_name, edited_code)}. {change}"
+        full_message = f"Successfully applied edit to file {file_name}. New file contents: {edited_code}"
+        if return_full_contents and change.startswith("Diff"):
+            message += f"\nNew file contents: {edited_code}"
+        record_result(full_message, message)
+        return message
     elif result == 2:
         return f"Edit access to {file_name} is not allowed"
     elif result == 3:
         return f"Error editing file {file_name}"
     else:
         return f"Unknown error editing file {file_name}"
-    
+
+# own pool: batch_edit_tool itself may be running on the tool executor's threads
+_batch_edit_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="batch_edit")
+
+def _apply_file_edits(full_path, file_name, edits):
+    """applies one file's edits in order, returns (original, edited, methods) or an error message"""
+    current_code = read_file(full_path)
+    if current_code == 1:
+        return f"File {file_name} does not exist"
+    elif current_code == 2:
+        return f"Edit access to {file_name} is not allowed"
+    elif current_code == 3:
+        return f"Error reading file {file_name}"
+    edited_code = current_code
+    methods = []
+    for item in edits:
+        try:
+            edited_code, method = _merge_edit(edited_code, file_name, item["code_snippet"], item.get("instructions"), full_path)
+        except Exception as e:
+            return f"Error applying edit to file {file_name}: {str(e)}"
+        methods.append(method)
+    return current_code, edited_code, methods
+
+def batch_edit_tool(edits):
+    """
+    applies edits to several files in one step: all edits are merged in parallel, then written together.
+    if any edit fails nothing is written.
+    """
+    if not isinstance(edits, list) or not edits:
+        return "Batch edit failed, no files were changed. edits must be a non-empty list of edits"
+    for index, item in enumerate(edits, 1):
+        if not isinstance(item, dict) or not item.get("file_name") or not item.get("code_snippet"):
+            return f"Batch edit failed, no files were changed. Edit {index} needs a file_name and a code_snippet"
+    active_project_path = load_active_project_path()
+    # edits to the same file are applied one after another, different files in parallel.
+    # grouped by the normalized path (as tool_executor does), so "" and "." for one file are one group
+    files = {}
+    for item in edits:
+        target = os.path.normpath(os.path.join(item.get("file_path") or "", item["file_name"]))
+        full_path = os.path.join(active_project_path, target)
+        files.setdefault(full_path, (item["file_name"], []))[1].append(item)
+    parent = tracing.current_span()
+
+    def apply_in_pool(path, name, items):
+        with tracing.attach(parent), tracing.span("batch_edit:file", file=name):
+            return _apply_file_edits(path, name, items)
+
+    futures = {path: _batch_edit_pool.submit(apply_in_pool, path, name, items) for path, (name, items) in files.items()}
+    results = {path: future.result() for path, future in futures.items()}
+
+    errors = [result for result in results.values() if isinstance(result, str)]
+    if errors:
+        return "Batch edit failed, no files were changed. " + " ".join(errors)
+
+    result = write_files({path: edited for path, (_, edited, _) in results.items()})
+    if result == 2:
+        return "Batch edit failed, no files were changed. Edit access to one of the files is not allowed"
+    elif result != 0:
+        return "Batch edit failed, no files were changed. Error writing the files"
+
+    summaries = []
+    full_contents = []
+    for path, (original, edited, methods) in results.items():
+        file_name = files[path][0]
+        summaries.append(f"{file_summary(file_name, edited)} (applied via {', '.join(methods)}). {describe_change(original, edited, file_name)}")
+        full_contents.append(f"{file_name}: {edited}")
+    message = f"Successfully applied {len(edits)} edits to {len(files)} files.\n" + "\n".join(summaries)
+    record_result(f"Successfully applied {len(edits)} edits. New file contents: " + "\n".join(full_contents), message)
+    return message
+
+def run_tools_in_parallel_tool(calls):
+    """runs independent tool calls at once (calls on the same file keep their order), results in call order"""
+    results = get_tool_executor(available_functions).execute(calls)
+    return [{"name": call.get("name"), "result": result} for call, result in zip(calls, results)]
+
+def execute_tool_calls(tool_calls):
+    """
+    Executor hook for all tool calls of one model response (openai style tool call objects or dicts).
+    Independent calls run concurrently, see utils/tool_executor. Returns the results in call order.
+    The agent interface (SimpleAgent submodule) still dispatches ordinary tool calls itself, one at a time,
+    until its dispatcher calls this; meanwhile the model gets concurrency through run_tools_in_parallel_tool.
+    """
+    calls = []
+    for tool_call in tool_calls:
+        function = tool_call["function"] if isinstance(tool_call, dict) else tool_call.function
+        if isinstance(function, dict):
+            calls.append({"name": function.get("name"), "arguments": function.get("arguments")})
+        else:
+            calls.append({"name": function.name, "arguments": function.arguments})
+    return get_tool_executor(available_functions).execute(calls)
 
 tool_interface = [
     {
@@ -163,12 +351,18 @@ tool_interface = [
         "type": "function",
         "function": {
             "name": "read_file_tool",
-            "description": "Reads contents from a file in the project directory",
+            "description": "Reads contents from a file in the project directory. Large files are truncated with a note on how to continue. Use outline to see the structure of a big file first, then read only the lines you need",
             "parameters": {
                 "type": "object",
                 "properties": {
                     "file_path": {"type": "string", "description": "Path within the project where the file is located"},
-                    "file_name": {"type": "string", "description": "Name of the file to read"}
+                    "file_name": {"type": "string", "description": "Name of the file to read"},
+                    "start_line": {"type": "integer", "description": "First line to read, 1-based (optional)"},
+                    "end_line": {"type": "integer", "description": "Last line to read, inclusive (optional)"},
+                    "byte_offset": {"type": "integer", "description": "Read from this byte offset instead of by lines, for minified files (optional)"},
+                    "byte_length": {"type": "integer", "description": "Number of bytes to read from byte_offset (optional)"},
+                    "outline": {"type": "boolean", "description": "Return an outline with line numbers instead of the contents: HTML element ids/classes, CSS selectors, JS functions and classes. start_line/end_line limit it to part of the file (optional)"},
+                    "max_chars": {"type": "integer", "description": "Maximum characters to return (optional, can only lower the default limit of 20000)"}
                 },
                 "required": ["file_path", "file_name"]
             }
@@ -193,14 +387,37 @@ tool_interface = [
         "type": "function",
         "function": {
             "name": "list_project_directory_tool",
-            "description": "Lists the project directory structure in a tree format",
+            "description": "Lists the project directory structure in a tree format. Dependency and build folders (node_modules, dist, .gitignore entries) are collapsed",
             "parameters": {
                 "type": "object",
-                "properties": {},
+                "properties": {
+                    "path": {"type": "string", "description": "Subdirectory to list (optional, defaults to the project root)"},
+                    "depth": {"type": "integer", "description": "How many directory levels to expand (optional, defaults to all)"},
+                    "pattern": {"type": "string", "description": "Glob to find files instead of listing the tree, e.g. '*.css' or 'src/*.js' (optional)"}
+                },
                 "required": []
             }
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "search_project_tool",
+            "description": "Searches all project files for text or a regex, e.g. where a class, element id, CSS selector or function is defined or used. Returns file, line number and surrounding lines. Much cheaper than reading whole files",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "Text to find, or a regex when regex is true"},
+                    "regex": {"type": "boolean", "description": "Treat query as a regular expression (optional, default false)"},
+                    "glob": {"type": "string", "description": "Only search files matching this glob, e.g. '*.css' or 'src/*.js' (optional)"},
+                    "case_sensitive": {"type": "boolean", "description": "Match case (optional, default false)"},
+                    "context_lines": {"type": "integer", "description": "Lines of context before and after each match (optional, default 1, max 5)"},
+                    "max_results": {"type": "integer", "description": "Maximum matches to return (optional, default 50)"}
+                },
+                "required": ["query"]
+            }
+        }
+    },
     {
         "type": "function",
         "function": {
@@ -211,19 +428,76 @@ tool_interface = [
                 "properties": {
                     "file_path": {"type": "string", "description": "Path within the project where the file is located"},
                     "file_name": {"type": "string", "description": "Name of the file to edit"},
-                    "code_snippet": {"type": "string", "description": "Instructions or code snippet for the edit"},
-                    "instructions": {"type": "string", "description": "Plain-English directions for how the snippet must be integrated (optional, best when its not obvious how the snippet should be integrated, like when removing code)"}
+                    "code_snippet": {"type": "string", "description": "Instructions or code snippet for the edit. SEARCH/REPLACE blocks (<<<<<<< SEARCH, =======, >>>>>>> REPLACE) or unified diff hunks are applied exactly and fastest"},
+                    "instructions": {"type": "string", "description": "Plain-English directions for how the snippet must be integrated (optional, best when its not obvious how the snippet should be integrated, like when removing code)"},
+                    "return_full_contents": {"type": "boolean", "description": "Also return the full edited file (optional, by default only a diff of the change is returned)"}
                 },
                 "required": ["file_path", "file_name", "code_snippet"]
             }
         }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "batch_edit_tool",
+            "description": "Edits several files in one step, e.g. restyling the header across index.html, styles.css and script.js. Either every edit is applied or none are. Use instead of multiple edit_file_tool calls",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "edits": {
+                        "type": "array",
+                        "description": "Edits to apply, several edits to the same file are applied in order",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "file_path": {"type": "string", "description": "Path within the project where the file is located"},
+                                "file_name": {"type": "string", "description": "Name of the file to edit"},
+                                "code_snippet": {"type": "string", "description": "Code snippet, SEARCH/REPLACE blocks or unified diff hunks for the edit (same as edit_file_tool)"},
+                                "instructions": {"type": "string", "description": "Plain-English directions for how the snippet must be integrated (optional)"}
+                            },
+                            "required": ["file_path", "file_name", "code_snippet"]
+                        }
+                    }
+                },
+                "required": ["edits"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "run_tools_in_parallel_tool",
+            "description": "Runs several tool calls at once, e.g. reading or editing multiple files. Separate tool calls run one after another, so this is much faster than calling the tools one by one. Calls on the same file run in the order given",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "calls": {
+                        "type": "array",
+                        "description": "Tool calls to run",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "name": {"type": "string", "description": "Name of the tool, e.g. read_file_tool or edit_file_tool"},
+                                "arguments": {"type": "object", "description": "Arguments for the tool"}
+                            },
+                            "required": ["name", "arguments"]
+                        }
+                    }
+                },
+                "required": ["calls"]
+            }
+        }
     }
 ]
 
-available_functions = {
+# every tool call is traced as tool:<name> (see tracing)
+available_functions = tracing.traced_functions({
     "write_file_tool": write_file_tool,
     "read_file_tool": read_file_tool,
     "delete_file_tool": delete_file_tool,
     "list_project_directory_tool": list_project_directory_tool,
-    "edit_file_tool": edit_file_tool
-} 
\ No newline at end of file
+    "search_project_tool": search_project_tool,
+    "edit_file_tool": edit_file_tool,
+    "batch_edit_tool": batch_edit_tool,
+    "run_tools_in_parallel_tool": run_tools_in_parallel_tool
+}, "tool") 
\ No newline at end of file
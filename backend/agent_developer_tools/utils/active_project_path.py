@@ -1,18 +1,15 @@
 # active project path
 # purpose: load the active project path from the settings file
 
-import json
-import os
 from pathlib import Path
+from settings_store import settings_store
 # settings file path
-SETTINGS_FILE = Path("settings.json")
+SETTINGS_FILE = Path(settings_store.path)
 
 def load_active_project_path():
-    if SETTINGS_FILE.exists():
-        try:
-            with open(SETTINGS_FILE, "r") as f:
-                return json.load(f)["active_project_path"]
-        except json.JSONDecodeError:
-            print(f"Error parsing {SETTINGS_FILE} when loading allowed path.")
-    else:
-        raise FileNotFoundError(f"Error: Settings file {SETTINGS_FILE} not found.")
\ No newline at end of file
+    # cached by the settings store, only re-read when settings.json changes
+    try:
+        # None when settings.json is malformed and was never loaded, as before the store
+        return settings_store.get_value("active_project_path", missing_ok=False)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Error: Settings file {SETTINGS_FILE} not found.")
@@ -0,0 +1,95 @@
+# content cache
+# purpose: shared in-memory cache of project file contents
+# entries are keyed by realpath and only served while the file's mtime_ns and size still match,
+# so edits made outside the backend are never hidden. writes through file_utils update the cache
+# directly. least recently used entries are evicted once the total byte budget is exceeded.
+
+import os
+import threading
+from collections import OrderedDict
+
+from settings_store import settings_store
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+
+class ContentCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_entry_fraction=0.25):
+        """
+        max_bytes: total budget for cached contents
+        max_entry_fraction: files bigger than this share of the budget are read but not cached
+        """
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = int(max_bytes * max_entry_fraction)
+        self.entries = OrderedDict()  # realpath -> (mtime_ns, size, contents, cost)
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def read(self, file_path):
+        """returns the file's text contents, from memory when the file hasn't changed (raises like open())"""
+        key = os.path.realpath(file_path)
+        st = os.stat(key)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return entry[2]
+            self.misses += 1
+        with open(key, "r") as f:
+            contents = f.read()
+        self._store(key, st, contents)
+        return contents
+
+    def put(self, file_path, contents):
+        """records contents just written to file_path (call right after the write)"""
+        key = os.path.realpath(file_path)
+        try:
+            st = os.stat(key)
+        except OSError:
+            self.invalidate(file_path)
+            return
+        self._store(key, st, contents)
+
+    def invalidate(self, file_path):
+        key = os.path.realpath(file_path)
+        with self._lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.total_bytes -= entry[3]
+
+    def _store(self, key, st, contents):
+        cost = len(contents.encode("utf-8", errors="replace"))
+        with self._lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[3]
+            if cost > self.max_entry_bytes:
+                return
+            self.entries[key] = (st.st_mtime_ns, st.st_size, contents, cost)
+            self.total_bytes += cost
+            while self.total_bytes > self.max_bytes and self.entries:
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= evicted[3]
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            }
+
+
+# shared cache used by the file tools and the project content endpoint
+# budget can be set with "content_cache_max_bytes" in settings.json
+content_cache = ContentCache(settings_store.get_value("content_cache_max_bytes", DEFAULT_MAX_BYTES))
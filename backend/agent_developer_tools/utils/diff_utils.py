@@ -0,0 +1,102 @@
+# diff utils
+# purpose: compact, diff-shaped tool results instead of echoing whole files into the conversation
+# also tracks how many prompt tokens that saves, per turn (turns run on one worker thread) and in total
+
+import difflib
+import hashlib
+import threading
+
+# diffs longer than this are cut off, the agent can still read the file
+MAX_DIFF_LINES = 200
+
+
+def content_hash(text):
+    """short sha256 of file contents, used to tell file versions apart"""
+    return hashlib.sha256(text.encode("utf-8", errors="replace")).hexdigest()[:12]
+
+
+def line_count(text):
+    return text.count("\n") + (1 if text and not text.endswith("\n") else 0)
+
+
+def estimate_tokens(text):
+    """rough token estimate (~4 chars per token), good enough for accounting"""
+    return (len(text) + 3) // 4
+
+
+def file_summary(file_name, text):
+    return f"{file_name}: {line_count(text)} lines, sha256 {content_hash(text)}"
+
+
+def make_diff(old, new, file_name, max_lines=MAX_DIFF_LINES):
+    """unified diff between two versions of a file, truncated to max_lines"""
+    diff = list(difflib.unified_diff(
+        old.splitlines(), new.splitlines(),
+        fromfile=f"a/{file_name}", tofile=f"b/{file_name}",
+        n=2, lineterm=""
+    ))
+    if not diff:
+        return "(no changes)"
+    if len(diff) > max_lines:
+        more = len(diff) - max_lines
+        diff = diff[:max_lines] + [f"... (diff truncated, {more} more lines, use read_file_tool for the full file)"]
+    return "\n".join(diff)
+
+
+def describe_change(old, new, file_name):
+    """the diff of a change, or the whole new file when that is shorter (tiny files)"""
+    diff = make_diff(old, new, file_name)
+    if len(diff) >= len(new):
+        return f"New file contents: {new}"
+    return f"Diff:\n{diff}"
+
+
+# token savings accounting
+_turn = threading.local()
+_totals_lock = threading.Lock()
+totals = {"results": 0, "full_tokens": 0, "sent_tokens": 0}
+
+
+def begin_turn():
+    _turn.stats = {"results": 0, "full_tokens": 0, "sent_tokens": 0}
+
+
+def end_turn():
+    """returns this thread's stats for the turn (tokens_saved included) and resets them"""
+    stats = getattr(_turn, "stats", None) or {"results": 0, "full_tokens": 0, "sent_tokens": 0}
+    _turn.stats = None
+    stats["tokens_saved"] = stats["full_tokens"] - stats["sent_tokens"]
+    return stats
+
+
+def turn_state():
+    """this thread's stats for the current turn (None outside a turn), see set_turn_state"""
+    return getattr(_turn, "stats", None)
+
+
+def set_turn_state(stats):
+    """lets a worker thread running tools for a turn (tool_executor) count into that turn's stats"""
+    _turn.stats = stats
+
+
+def record_result(full_result, sent_result):
+    """records a tool result that replaced full_result (what used to be sent) with sent_result"""
+    full_tokens = estimate_tokens(full_result)
+    sent_tokens = estimate_tokens(sent_result)
+    stats = getattr(_turn, "stats", None)
+    with _totals_lock:
+        # the turn's stats may be shared by several tool threads
+        if stats is not None:
+            stats["results"] += 1
+            stats["full_tokens"] += full_tokens
+            stats["sent_tokens"] += sent_tokens
+        totals["results"] += 1
+        totals["full_tokens"] += full_tokens
+        totals["sent_tokens"] += sent_tokens
+
+
+def savings_totals():
+    with _totals_lock:
+        stats = dict(totals)
+    stats["tokens_saved"] = stats["full_tokens"] - stats["sent_tokens"]
+    return stats
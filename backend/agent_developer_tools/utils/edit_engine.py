@@ -0,0 +1,268 @@
+# edit engine
+# purpose: apply an edit snippet to a file locally, without the gpt-4o-mini round trip
+# strategies, tried in order:
+#   search/replace blocks   (<<<<<<< SEARCH / ======= / >>>>>>> REPLACE)
+#   unified diff hunks      (@@ -a,b +c,d @@)
+#   snippet already present (nothing to do)
+#   anchored replacement    (first/last line of each snippet chunk pin the region it replaces, the chunk must
+#                            keep or rewrite every line of that region)
+# every match must be unique (exact first, then ignoring whitespace). when no strategy is confident
+# the result has content None and the caller falls back to the llm merge.
+
+import difflib
+import re
+from collections import namedtuple
+
+EditResult = namedtuple("EditResult", ["content", "method", "detail"])
+
+SEARCH_REPLACE_RE = re.compile(
+    r"^<{5,9} ?SEARCH[^\n]*\n(.*?)^={5,9}[ \t]*\n(.*?)^>{5,9} ?REPLACE[^\n]*$",
+    re.MULTILINE | re.DOTALL
+)
+HUNK_HEADER_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+CLOSING_TAG_RE = re.compile(r"^</([\w-]+)>$")
+OPENING_TAG_RE = re.compile(r"^<([\w-]+)[\s>/]")
+CLOSING_BRACES = {"}", "};", "},", "});", "})", "]);", "];"}
+MARKER_WORDS = ("existing", "rest", "unchanged", "previous", "remaining", "other", "same", "keep")
+
+# non-blank lines an anchored chunk may drop from the region it replaces (beyond lines it rewrites one for
+# one). a chunk that leaves out more is most likely a partial snippet, the llm merge keeps what it omits
+MAX_DROPPED_LINES = 2
+
+
+def _norm(line):
+    """line with all whitespace runs collapsed, for whitespace-tolerant matching"""
+    return " ".join(line.split())
+
+
+def _indent(line):
+    return line[:len(line) - len(line.lstrip())]
+
+
+def _is_marker(line):
+    """lines like '// ... existing code ...' or '<!-- ... -->' that stand for unchanged code"""
+    text = line.strip()
+    for token in ("<!--", "-->", "/*", "*/", "//", "#"):
+        text = text.replace(token, "")
+    text = text.strip()
+    if "..." not in text or len(text) > 60:
+        return False
+    return text.strip(". ") == "" or any(word in text.lower() for word in MARKER_WORDS)
+
+
+def _strip_blank_edges(lines):
+    start, end = 0, len(lines)
+    while start < end and not lines[start].strip():
+        start += 1
+    while end > start and not lines[end - 1].strip():
+        end -= 1
+    return lines[start:end]
+
+
+def _find_block(lines, block):
+    """start indices where block occurs in lines, exact matches first, then whitespace-tolerant"""
+    if not block:
+        return [], False
+    n = len(block)
+    exact = [i for i in range(len(lines) - n + 1) if lines[i] == block[0] and lines[i:i + n] == block]
+    if exact:
+        return exact, False
+    normed = [_norm(line) for line in lines]
+    block_normed = [_norm(line) for line in block]
+    tolerant = [i for i in range(len(lines) - n + 1)
+                if normed[i] == block_normed[0] and normed[i:i + n] == block_normed]
+    return tolerant, True
+
+
+def _reindent(block, from_line, to_line):
+    """shifts block so its first line's indentation matches to_line (models often drop indentation)"""
+    old, new = _indent(from_line), _indent(to_line)
+    if old == new:
+        return list(block)
+    return [new + line[len(old):] if line.startswith(old) else line for line in block]
+
+
+def _split_lines(text):
+    newline = "\r\n" if "\r\n" in text else "\n"
+    trailing = text.endswith("\n")
+    return text.splitlines(), newline, trailing
+
+
+def _join_lines(lines, newline, trailing):
+    return newline.join(lines) + (newline if trailing and lines else "")
+
+
+def _apply_search_replace(lines, blocks):
+    tolerant_used = False
+    for search, replace in blocks:
+        search_lines = _strip_blank_edges(search.splitlines())
+        replace_lines = replace.splitlines()
+        matches, tolerant = _find_block(lines, search_lines)
+        if len(matches) != 1:
+            return None, f"search block matched {len(matches)} times"
+        i = matches[0]
+        if tolerant:
+            tolerant_used = True
+            replace_lines = _reindent(replace_lines, search_lines[0], lines[i])
+        lines = lines[:i] + replace_lines + lines[i + len(search_lines):]
+    return lines, ("whitespace-tolerant" if tolerant_used else "exact")
+
+
+def _parse_hunks(snippet):
+    hunks = []
+    current = None
+    for line in snippet.splitlines():
+        header = HUNK_HEADER_RE.match(line)
+        if header:
+            current = {"start": int(header.group(1)), "old": [], "new": []}
+            hunks.append(current)
+        elif current is None or line.startswith(("--- ", "+++ ", "\\")):
+            continue
+        elif line.startswith("-"):
+            current["old"].append(line[1:])
+        elif line.startswith("+"):
+            current["new"].append(line[1:])
+        else:
+            # context line, a bare empty line is an empty context line
+            current["old"].append(line[1:])
+            current["new"].append(line[1:])
+    return hunks
+
+
+def _apply_hunks(lines, hunks):
+    tolerant_used = False
+    for hunk in hunks:
+        if not hunk["old"]:
+            return None, "hunk has no context to anchor on"
+        matches, tolerant = _find_block(lines, hunk["old"])
+        if len(matches) != 1:
+            # the line numbers in model-written hunks are too unreliable to pick between several matches
+            return None, f"hunk context matched {len(matches)} times"
+        i = matches[0]
+        new_lines = hunk["new"]
+        if tolerant:
+            tolerant_used = True
+            new_lines = _reindent(new_lines, hunk["old"][0], lines[i])
+        lines = lines[:i] + new_lines + lines[i + len(hunk["old"]):]
+    return lines, ("whitespace-tolerant" if tolerant_used else "exact")
+
+
+def _unique_line(normed, target, start=0):
+    matches = [i for i in range(start, len(normed)) if normed[i] == target]
+    return matches[0] if len(matches) == 1 else None
+
+
+def _structural_end(lines, start, last_line):
+    """end index of the block opened on lines[start], for snippets ending in a closing brace or tag"""
+    last = _norm(last_line)
+    tag = CLOSING_TAG_RE.match(last)
+    if tag:
+        opening = OPENING_TAG_RE.match(lines[start].strip())
+        if not opening or opening.group(1) != tag.group(1):
+            return None
+        open_re = re.compile(r"<" + re.escape(tag.group(1)) + r"[\s>/]")
+        close_tag = f"</{tag.group(1)}>"
+        depth = 0
+        for i in range(start, len(lines)):
+            depth += len(open_re.findall(lines[i])) - lines[i].count(close_tag)
+            if depth <= 0:
+                return i if _norm(lines[i]) == last else None
+        return None
+    if last in CLOSING_BRACES:
+        depth = 0
+        opened = False
+        for i in range(start, len(lines)):
+            depth += lines[i].count("{") - lines[i].count("}")
+            opened = opened or "{" in lines[i]
+            if opened and depth <= 0:
+                return i if _norm(lines[i]) == last else None
+    return None
+
+
+def _dropped_lines(region, chunk):
+    """non-blank lines of region that the chunk neither keeps nor rewrites in place"""
+    region_normed = [_norm(line) for line in region]
+    matcher = difflib.SequenceMatcher(None, region_normed, [_norm(line) for line in chunk], autojunk=False)
+    dropped = 0
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "delete" or (tag == "replace" and i2 - i1 > j2 - j1):
+            removed = [line for line in region_normed[i1:i2] if line]
+            dropped += max(0, len(removed) - (j2 - j1 if tag == "replace" else 0))
+    return dropped
+
+
+def _apply_chunk(lines, chunk):
+    """replaces the region of lines pinned by the chunk's first and last lines"""
+    matches, tolerant = _find_block(lines, chunk)
+    if len(matches) == 1:
+        if tolerant:
+            # a re-indent or a sloppy copy of the same code, only the llm can tell which
+            return None, "snippet differs from the file only in whitespace"
+        return lines, "present"
+    if len(chunk) < 2:
+        return None, "single line snippet is not in the file"
+    normed = [_norm(line) for line in lines]
+    start = _unique_line(normed, _norm(chunk[0]))
+    if start is None:
+        return None, "first snippet line does not match exactly one line"
+    end = _unique_line(normed, _norm(chunk[-1]), start + 1)
+    if end is None:
+        end = _structural_end(lines, start, chunk[-1])
+    if end is None:
+        return None, "could not find where the snippet region ends"
+    if end - start + 1 > len(chunk) + MAX_DROPPED_LINES or _dropped_lines(lines[start:end + 1], chunk) > MAX_DROPPED_LINES:
+        return None, "snippet leaves out lines of the region it would replace"
+    new_lines = _reindent(chunk, chunk[0], lines[start])
+    return lines[:start] + new_lines + lines[end + 1:], "replaced"
+
+
+def _split_chunks(snippet_lines):
+    chunks, current = [], []
+    for line in snippet_lines:
+        if _is_marker(line):
+            chunks.append(current)
+            current = []
+        else:
+            current.append(line)
+    chunks.append(current)
+    return [chunk for chunk in (_strip_blank_edges(c) for c in chunks) if chunk]
+
+
+def apply_edit_locally(original, code_snippet, instructions=None):
+    """
+    tries to apply code_snippet to original without an llm.
+    returns EditResult(content, method, detail), content is None when the edit could not be placed confidently
+    """
+    lines, newline, trailing = _split_lines(original)
+
+    blocks = SEARCH_REPLACE_RE.findall(code_snippet)
+    if blocks:
+        edited, detail = _apply_search_replace(lines, blocks)
+        if edited is None:
+            return EditResult(None, "search_replace", detail)
+        return EditResult(_join_lines(edited, newline, trailing), "search_replace", f"{len(blocks)} block(s), {detail}")
+
+    if any(HUNK_HEADER_RE.match(line) for line in code_snippet.splitlines()):
+        hunks = _parse_hunks(code_snippet)
+        edited, detail = _apply_hunks(lines, hunks)
+        if edited is None:
+            return EditResult(None, "unified_diff", detail)
+        return EditResult(_join_lines(edited, newline, trailing), "unified_diff", f"{len(hunks)} hunk(s), {detail}")
+
+    # free-form snippets are ambiguous when the model also had to explain how to integrate them
+    if instructions:
+        return EditResult(None, "anchored", "instructions given, leaving placement to the llm")
+
+    chunks = _split_chunks(code_snippet.splitlines())
+    if not chunks:
+        return EditResult(None, "anchored", "empty snippet")
+    outcomes = []
+    for chunk in chunks:
+        edited, outcome = _apply_chunk(lines, chunk)
+        if edited is None:
+            return EditResult(None, "anchored", outcome)
+        lines = edited
+        outcomes.append(outcome)
+    if all(outcome == "present" for outcome in outcomes):
+        return EditResult(original, "already_present", "snippet already in file")
+    return EditResult(_join_lines(lines, newline, trailing), "anchored", f"{len(chunks)} chunk(s)")
@@ -4,19 +4,41 @@
 from pathlib import Path
 import json
 import os
+import shutil
+import tempfile
 import asyncio
-import requests
+from event_bus import file_events
+from tracing import traced
+from log_writer import log
 from .active_project_path import load_active_project_path
+from .content_cache import content_cache
 
 
+def _read_umask():
+    # /proc shows it without changing it, os.umask can only be read by setting it
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError):
+        pass
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+# mode open(path, "w") gives a new file, staged files (mkstemp makes them 0600) get it too
+NEW_FILE_MODE = 0o666 & ~_read_umask()
+
 def verify_file_path(file_path):
     active_project_path = load_active_project_path()
     """checks if read/modify on allowed path"""
     if not file_path.startswith(active_project_path):
-        print(f"Error: tried to read or modify {file_path} which is not on the active project path {active_project_path}.")
+        log.error(f"tried to read or modify {file_path} which is not on the active project path {active_project_path}")
         return False
     return True
 
+@traced("io:write_file")
 def write_file(file_path, contents):
     """overwrites the file with the new contents, 
     returns:
@@ -30,11 +52,77 @@ def write_file(file_path, contents):
     try:
         with open(file_path, 'w') as file:
             file.write(contents)
+        content_cache.put(file_path, contents)
         send_file_change_notification(file_path)
         return 0
     except Exception as e:
         return 3
     
+@traced("io:write_files")
+def write_files(files):
+    """writes several files all or nothing: each file is staged to a temp file next to it, then all are
+    swapped in. if any swap fails the files already swapped are put back.
+    files: {file_path: contents}
+    returns:
+    0 if all files written successfully, 
+    2 if any file not allowed (nothing written), 
+    3 if error writing files (nothing written)
+    """
+    if not all(verify_file_path(file_path) for file_path in files):
+        return 2
+
+    staged = {}
+    originals = {}
+    try:
+        for file_path, contents in files.items():
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path), prefix=".staged_")
+            staged[file_path] = tmp_path
+            with os.fdopen(fd, 'w') as file:
+                file.write(contents)
+            if os.path.exists(file_path):
+                shutil.copymode(file_path, tmp_path)
+                with open(file_path, 'rb') as file:
+                    originals[file_path] = file.read()
+            else:
+                os.chmod(tmp_path, NEW_FILE_MODE)
+    except Exception as e:
+        for tmp_path in staged.values():
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        return 3
+
+    committed = []
+    try:
+        for file_path, tmp_path in staged.items():
+            os.replace(tmp_path, file_path)
+            committed.append(file_path)
+    except Exception as e:
+        # roll back the files that were already swapped in
+        for file_path in committed:
+            try:
+                if file_path in originals:
+                    with open(file_path, 'wb') as file:
+                        file.write(originals[file_path])
+                else:
+                    os.remove(file_path)
+            except OSError:
+                pass
+        for file_path, tmp_path in staged.items():
+            if file_path not in committed:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+        return 3
+
+    for file_path, contents in files.items():
+        content_cache.put(file_path, contents)
+        send_file_change_notification(file_path)
+    return 0
+    
+@traced("io:read_file")
 def read_file(file_path):
     """
     reads the file and returns the contents, 
@@ -50,8 +138,8 @@ def read_file(file_path):
     if not os.path.exists(file_path):
         return 1
     try:
-        with open(file_path, 'r') as file:
-            return str(file.read())
+        # served from memory while the file's mtime/size are unchanged
+        return str(content_cache.read(file_path))
     except Exception as e:
         return 3
     
@@ -71,27 +159,35 @@ def delete_file(file_path):
         return 1
     try:
         os.remove(file_path)
+        content_cache.invalidate(file_path)
+        send_file_change_notification(file_path, change="deleted")
         return 0
     except Exception as e:
         return 3
 
-def send_file_change_notification(file_path):
-    """Send notification about file changes to connected clients"""
+def send_file_change_notification(file_path, change="written"):
+    """Send notification about file changes to connected clients (and in-process indexes)"""
     try:
         # Get current active project for notification
         active_project_path = load_active_project_path()
         active_project_name = os.path.basename(active_project_path) if active_project_path else None
         
-        # Send notification via HTTP to avoid async complications
         notification_data = {
             "type": "file_changed",
             "file_path": file_path,
-            "message": f"File updated: {os.path.basename(file_path)}",
+            "change": change,
+            "message": f"File {'deleted' if change == 'deleted' else 'updated'}: {os.path.basename(file_path)}",
             "active_project_name": active_project_name,
             "timestamp": os.path.getmtime(file_path) if os.path.exists(file_path) else None
         }
         
-        # Post to a notification endpoint (we'll create this)
+        # Publish in-process: indexes update immediately, rapid writes to one file are merged for clients
+        file_events.publish(notification_data, key=file_path)
+        if file_events.has_subscribers(coalesce=True):
+            return
+        
+        # Out-of-process tools (e.g. the cli) fall back to the http endpoint
+        import requests
         requests.post(
             "http://localhost:8000/notify_file_change",
             json=notification_data,
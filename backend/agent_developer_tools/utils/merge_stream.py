@@ -0,0 +1,152 @@
+# merge stream
+# purpose: consume the merge model's streamed rewrite of a file chunk by chunk
+# the output is checked against the original as it arrives (how much of it still matches, whether it is
+# running away far past the original's size) and once more when it ends (empty, cut off before the file's
+# end, or far shorter than the original for a small snippet), a bad result raises MergeStreamError. edit_progress events with
+# bytes done vs expected are published on the file event bus, which forwards them to the WebSocket clients.
+# nothing is written here, the caller writes the finished file in one atomic step.
+
+import os
+import time
+
+from event_bus import file_events
+from .active_project_path import load_active_project_path
+
+# publish at most this often per file (the bus also merges events per file for the clients)
+PROGRESS_INTERVAL = 0.1
+# output this much longer than the original (plus the snippet) means the model is not converging
+MAX_GROWTH_FACTOR = 3
+MIN_GROWTH_ALLOWANCE = 4096
+# output under this share of the original is rejected unless the snippet itself is at least that long
+# (a small snippet doesn't remove half a file, a cut off stream does)
+MIN_OUTPUT_RATIO = 0.5
+
+
+class MergeStreamError(Exception):
+    pass
+
+
+def _last_line(text):
+    """last non-blank line, whitespace collapsed"""
+    for line in reversed(text.splitlines()):
+        if line.strip():
+            return " ".join(line.split())
+    return ""
+
+
+def _common_prefix_length(a, b):
+    """length of the common prefix of two strings"""
+    limit = min(len(a), len(b))
+    low, high = 0, limit
+    # binary search on slice equality, much faster than comparing char by char in python
+    while low < high:
+        mid = (low + high + 1) // 2
+        if a[:mid] == b[:mid]:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+class MergeProgress:
+    def __init__(self, original, code_snippet, file_path=None, file_name=None):
+        self.original = original
+        self.code_snippet = code_snippet
+        self.file_path = file_path
+        self.file_name = file_name or (os.path.basename(file_path) if file_path else None)
+        self.expected = len(original)
+        self.max_size = max(len(original), len(code_snippet)) * MAX_GROWTH_FACTOR + MIN_GROWTH_ALLOWANCE
+        self.parts = []
+        self.size = 0
+        # length of the output that is identical to the start of the original
+        self.unchanged_prefix = 0
+        self.diverged = False
+        self.started = time.time()
+        self.first_chunk_at = None
+        self._last_publish = 0.0
+
+    def add(self, chunk):
+        if not chunk:
+            return
+        if self.first_chunk_at is None:
+            self.first_chunk_at = time.time()
+        start = self.size
+        self.parts.append(chunk)
+        self.size += len(chunk)
+        if not self.diverged:
+            matched = _common_prefix_length(chunk, self.original[start:start + len(chunk)])
+            self.unchanged_prefix = start + matched
+            self.diverged = matched < len(chunk)
+        if self.size > self.max_size:
+            raise MergeStreamError(f"merge output grew to {self.size} characters for a {self.expected} character file, stopped")
+        if time.time() - self._last_publish >= PROGRESS_INTERVAL:
+            self.publish("streaming")
+
+    def text(self):
+        return "".join(self.parts)
+
+    def check_complete(self):
+        """raises MergeStreamError when the finished output can't be the whole file"""
+        text = self.text()
+        if not text.strip() and (self.original.strip() or self.code_snippet.strip()):
+            raise MergeStreamError("merge output was empty, the file was not changed")
+        if not self.diverged and self.size < self.expected and self.original[self.size - 1:self.size + 1].count("\n") == 0:
+            # identical to the original so far and stopped in the middle of a line: the stream was cut off
+            raise MergeStreamError(f"merge output stopped after {self.size} of {self.expected} characters, the file was not changed")
+        last = _last_line(text)
+        snippet_lines = {" ".join(line.split()) for line in self.code_snippet.splitlines()}
+        if self.original.strip() and last != _last_line(self.original) and last not in snippet_lines:
+            # the interface doesn't pass on the finish reason: a complete rewrite ends like the original,
+            # or like the snippet when the edit is at the end of the file
+            raise MergeStreamError(f"merge output stopped after {self.size} of {self.expected} characters without reaching the end of the file, the file was not changed")
+        if self.size < self.expected * MIN_OUTPUT_RATIO and len(self.code_snippet) < self.expected * MIN_OUTPUT_RATIO:
+            raise MergeStreamError(
+                f"merge output has {self.size} characters for a {self.expected} character file, the file was not changed. "
+                "to remove large parts of a file, use write_file_tool"
+            )
+
+    def publish(self, status):
+        self._last_publish = time.time()
+        if self.file_path is None:
+            return
+        try:
+            active_project_path = load_active_project_path()
+        except Exception:
+            active_project_path = None
+        file_events.publish({
+            "type": "edit_progress",
+            "file_path": self.file_path,
+            "status": status,
+            "message": f"Editing {self.file_name}",
+            "bytes_done": self.size,
+            # the rewrite is usually about as long as the original
+            "bytes_expected": max(self.expected, self.size),
+            "unchanged_prefix": self.unchanged_prefix,
+            "first_chunk_ms": round((self.first_chunk_at - self.started) * 1000) if self.first_chunk_at else None,
+            "active_project_name": os.path.basename(active_project_path) if active_project_path else None,
+            "timestamp": time.time(),
+        }, key=f"progress:{self.file_path}")
+
+
+def consume_merge_stream(chunks, original, code_snippet, file_path=None, file_name=None):
+    """
+    collects the streamed merge output (chunks: iterable of strings, or the whole string from a
+    non-streaming model), publishing progress. returns the complete new file contents, raises
+    MergeStreamError when the output runs away or is empty or cut off.
+    """
+    progress = MergeProgress(original, code_snippet, file_path, file_name)
+    progress.publish("started")
+    try:
+        if isinstance(chunks, str):
+            progress.add(chunks)
+        else:
+            for chunk in chunks:
+                progress.add(chunk)
+        progress.check_complete()
+    except Exception:
+        progress.publish("failed")
+        if not isinstance(chunks, str) and hasattr(chunks, "close"):
+            chunks.close()
+        raise
+    progress.publish("done")
+    return progress.text()
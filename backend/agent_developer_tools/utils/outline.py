@@ -0,0 +1,99 @@
+# outline
+# purpose: a short structural outline of a project file with line numbers
+# html: elements with an id or class, plus linked scripts/stylesheets (parsed with beautifulsoup)
+# css: selectors and at-rules, js: functions, classes and methods
+# lets the agent see what is in a file (and where) without the whole file in its context.
+
+import os
+import re
+
+CSS_RULE_RE = re.compile(r"^\s*([^\s{}/][^{}]*?)\s*\{")
+JS_PATTERNS = [
+    re.compile(r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)\s*\("),
+    re.compile(r"^\s*(?:export\s+)?(?:default\s+)?class\s+([A-Za-z_$][\w$]*)"),
+    re.compile(r"^\s*(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*=\s*(?:async\s+)?(?:function\b|\([^)]*\)\s*=>|[A-Za-z_$][\w$]*\s*=>)"),
+    re.compile(r"^\s+(?:static\s+)?(?:async\s+)?(?!if\b|for\b|while\b|switch\b|catch\b|return\b|function\b)([A-Za-z_$][\w$]*)\s*\([^)]*\)\s*\{"),
+]
+JS_EXTENSIONS = (".js", ".mjs", ".cjs", ".jsx", ".ts", ".tsx")
+HTML_EXTENSIONS = (".html", ".htm")
+CSS_EXTENSIONS = (".css",)
+MAX_ITEMS = 200
+# labels are cut to this length (a minified bundle is one line with everything on it)
+MAX_LABEL_CHARS = 120
+
+
+def _label(text):
+    text = text.strip()
+    return text if len(text) <= MAX_LABEL_CHARS else text[:MAX_LABEL_CHARS - 3] + "..."
+
+
+def supports_outline(file_name):
+    return file_name.lower().endswith(JS_EXTENSIONS + HTML_EXTENSIONS + CSS_EXTENSIONS)
+
+
+def _html_outline(text):
+    # imported here, beautifulsoup is slow to import and only needed once a file is outlined
+    from bs4 import BeautifulSoup
+    items = []
+    soup = BeautifulSoup(text, "html.parser")
+    for tag in soup.find_all(True):
+        if tag.name == "script" and tag.get("src"):
+            label = f'<script src="{tag["src"]}">'
+        elif tag.name == "link" and tag.get("href"):
+            label = f'<link rel="{" ".join(tag.get("rel") or [])}" href="{tag["href"]}">'
+        elif tag.get("id") or tag.get("class"):
+            label = f"<{tag.name}"
+            if tag.get("id"):
+                label += f' id="{tag["id"]}"'
+            if tag.get("class"):
+                label += f' class="{" ".join(tag["class"])}"'
+            label += ">"
+        elif tag.name in ("title", "script", "style"):
+            label = f"<{tag.name}>"
+        else:
+            continue
+        items.append((tag.sourceline, _label(label)))
+    return items
+
+
+def _css_outline(text):
+    items = []
+    # blank out comments (keeping newlines) so line numbers still match
+    text = re.sub(r"/\*.*?\*/", lambda m: re.sub(r"[^\n]", " ", m.group(0)), text, flags=re.S)
+    for number, line in enumerate(text.splitlines(), 1):
+        match = CSS_RULE_RE.match(line)
+        if match:
+            items.append((number, _label(match.group(1))))
+    return items
+
+
+def _js_outline(text):
+    items = []
+    for number, line in enumerate(text.splitlines(), 1):
+        for pattern in JS_PATTERNS:
+            match = pattern.match(line)
+            if match:
+                items.append((number, _label(line.strip().rstrip("{"))))
+                break
+    return items
+
+
+def outline(file_name, text):
+    """[(line number, label)] describing the file's structure, empty for unsupported files"""
+    extension = os.path.splitext(file_name.lower())[1]
+    if extension in HTML_EXTENSIONS:
+        items = _html_outline(text)
+    elif extension in CSS_EXTENSIONS:
+        items = _css_outline(text)
+    elif extension in JS_EXTENSIONS:
+        items = _js_outline(text)
+    else:
+        items = []
+    return items
+
+
+def format_outline(items, max_items=MAX_ITEMS):
+    lines = [f"{number}: {label}" for number, label in items[:max_items]]
+    if len(items) > max_items:
+        lines.append(f"... ({len(items) - max_items} more)")
+    return "\n".join(lines)
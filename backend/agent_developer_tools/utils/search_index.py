@@ -0,0 +1,323 @@
+# search index
+# purpose: fast text search over a project for search_project_tool
+# every indexed file's lowercased contents are split into trigrams, and a query only scans the files
+# that contain all the trigrams of its literal parts (for regexes: the literal runs every match must
+# contain). the file list comes from the tree index (same ignore rules), files are re-indexed from the
+# write/delete events and, for edits made outside the tools, when their size or mtime changed.
+
+import fnmatch
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from event_bus import file_events
+from .content_cache import content_cache
+from .tree_index import get_tree_index
+
+# bigger files (bundles, data dumps) are not indexed
+MAX_FILE_BYTES = 1024 * 1024
+BINARY_EXTENSIONS = (
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".ico", ".bmp", ".pdf", ".zip", ".gz", ".woff", ".woff2",
+    ".ttf", ".otf", ".eot", ".mp3", ".mp4", ".wav", ".ogg", ".webm", ".mov", ".wasm",
+)
+DEFAULT_MAX_RESULTS = 50
+MAX_LINE_CHARS = 300
+# number of project indexes kept in memory
+MAX_INDEXES = 4
+# seconds between checks of every indexed file's size/mtime (for edits made outside the tools)
+STAT_CHECK_INTERVAL = 2.0
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _skip_quantifier(pattern, i):
+    """skips a quantifier at i (*, +, ?, {m,n}, optionally lazy), returns (new index, quantifier or None)"""
+    if i >= len(pattern) or pattern[i] not in "*+?{":
+        return i, None
+    quantifier = pattern[i]
+    if quantifier == "{":
+        close = pattern.find("}", i)
+        if close == -1:
+            return i, None
+        i = close + 1
+    else:
+        i += 1
+    if i < len(pattern) and pattern[i] in "?+":
+        i += 1
+    return i, quantifier
+
+
+# escapes that stand for one literal character
+LITERAL_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "f": "\f", "v": "\v", "a": "\a"}
+# escapes followed by a fixed number of hex digits
+HEX_ESCAPES = {"x": 2, "u": 4, "U": 8}
+
+
+def _escape(pattern, i):
+    """
+    reads the escape at pattern[i] (a backslash), returns (literal or None, index after it).
+    \\x41, \\u0041, \\N{...}, octal and backreferences are not taken as literals, but their arguments are
+    skipped so they don't read as literal text. raises ValueError when the escape can't be told simply
+    """
+    char = pattern[i + 1]
+    if not char.isalnum():
+        # escaped punctuation is a literal
+        return char, i + 2
+    if char in LITERAL_ESCAPES:
+        return LITERAL_ESCAPES[char], i + 2
+    if char in HEX_ESCAPES:
+        end = i + 2 + HEX_ESCAPES[char]
+        if not re.fullmatch(r"[0-9a-fA-F]+", pattern[i + 2:end]) or end > len(pattern):
+            raise ValueError("incomplete escape")
+        return None, end
+    if char == "N":
+        close = pattern.find("}", i)
+        if pattern[i + 2:i + 3] != "{" or close == -1:
+            raise ValueError("incomplete escape")
+        return None, close + 1
+    if char.isdigit():
+        # octal (\0, \101) or a backreference (\1), either way up to three digits
+        end = i + 1
+        while end < len(pattern) and end < i + 4 and pattern[end].isdigit():
+            end += 1
+        return None, end
+    # \d, \w, \b, ... (and unknown letters, which re rejects anyway)
+    return None, i + 2
+
+
+def regex_literals(pattern):
+    """literal runs (3+ chars) every match of the regex must contain, empty when that can't be told simply"""
+    if "|" in pattern:
+        return []
+    runs, current = [], []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        literal = None
+        if char == "\\" and i + 1 < len(pattern):
+            try:
+                literal, i = _escape(pattern, i)
+            except ValueError:
+                return []
+        elif char in "[(":
+            # classes and groups may match anything (or nothing), skip them
+            closing = "]" if char == "[" else ")"
+            depth = 0
+            while i < len(pattern):
+                if pattern[i] == "\\":
+                    i += 2
+                    continue
+                if pattern[i] == char and (char == "(" or depth == 0):
+                    depth += 1
+                elif pattern[i] == closing:
+                    depth -= 1
+                    if depth == 0:
+                        break
+                i += 1
+            i += 1
+        elif char in ".^$":
+            i += 1
+        else:
+            literal = char
+            i += 1
+        i, quantifier = _skip_quantifier(pattern, i)
+        if literal is not None and quantifier in (None, "+"):
+            current.append(literal)
+        if literal is None or quantifier is not None:
+            # the run can't continue across anything that isn't a single required literal
+            runs.append("".join(current))
+            current = []
+    runs.append("".join(current))
+    return [run for run in runs if len(run) >= 3]
+
+
+def _indexable(rel):
+    return not rel.lower().endswith(BINARY_EXTENSIONS)
+
+
+class ProjectSearchIndex:
+    def __init__(self, root):
+        self.root = os.path.realpath(root)
+        self.lock = threading.RLock()
+        self.files = {}  # rel -> {"mtime_ns", "size", "text", "grams"}
+        self.postings = {}  # trigram -> set of rel
+        self.last_stat_check = 0.0
+        self.sync()
+
+    def _add(self, rel):
+        path = os.path.join(self.root, rel)
+        try:
+            st = os.stat(path)
+            if st.st_size > MAX_FILE_BYTES:
+                self._remove(rel)
+                return
+            text = content_cache.read(path)
+        except (OSError, UnicodeDecodeError, ValueError):
+            self._remove(rel)
+            return
+        self._remove(rel)
+        grams = trigrams(text.lower())
+        self.files[rel] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "text": text, "grams": grams}
+        for gram in grams:
+            self.postings.setdefault(gram, set()).add(rel)
+
+    def _remove(self, rel):
+        entry = self.files.pop(rel, None)
+        if entry is None:
+            return
+        for gram in entry["grams"]:
+            posting = self.postings.get(gram)
+            if posting is not None:
+                posting.discard(rel)
+                if not posting:
+                    del self.postings[gram]
+
+    def sync(self):
+        """matches the indexed files with the tree index's file list (picks up changes made outside the tools)"""
+        with self.lock:
+            current = {rel for rel in get_tree_index(self.root).glob("*") if _indexable(rel)}
+            for rel in set(self.files) - current:
+                self._remove(rel)
+            for rel in current - set(self.files):
+                self._add(rel)
+            if time.time() - self.last_stat_check >= STAT_CHECK_INTERVAL:
+                for rel in list(self.files):
+                    self._fresh(rel)
+                self.last_stat_check = time.time()
+
+    def _rel(self, abs_path):
+        rel = os.path.relpath(os.path.realpath(abs_path), self.root)
+        if rel == "." or rel.startswith(".."):
+            return None
+        return rel.replace(os.sep, "/")
+
+    def file_changed(self, abs_path):
+        rel = self._rel(abs_path)
+        if rel and _indexable(rel) and not any(part.startswith(".") for part in rel.split("/")):
+            with self.lock:
+                self._add(rel)
+
+    def file_removed(self, abs_path):
+        rel = self._rel(abs_path)
+        if rel:
+            with self.lock:
+                self._remove(rel)
+
+    def _fresh(self, rel):
+        """the file's indexed entry, re-indexed first if it changed on disk"""
+        entry = self.files.get(rel)
+        try:
+            st = os.stat(os.path.join(self.root, rel))
+        except OSError:
+            self._remove(rel)
+            return None
+        if entry is None or entry["mtime_ns"] != st.st_mtime_ns or entry["size"] != st.st_size:
+            self._add(rel)
+            entry = self.files.get(rel)
+        return entry
+
+    def search(self, query, regex=False, glob=None, case_sensitive=False, context_lines=1, max_results=DEFAULT_MAX_RESULTS):
+        """
+        returns (matches, truncated). matches are {"file", "line", "text", "context"}, one per matching line,
+        truncated is True when there were more than max_results
+        raises ValueError for an invalid regex
+        """
+        flags = re.MULTILINE | (0 if case_sensitive else re.IGNORECASE)
+        try:
+            matcher = re.compile(query if regex else re.escape(query), flags)
+        except re.error as e:
+            raise ValueError(f"Invalid regex: {e}")
+        literals = regex_literals(query) if regex else ([query] if len(query) >= 3 else [])
+        with self.lock:
+            self.sync()
+            if literals:
+                candidates = None
+                for literal in literals:
+                    for gram in trigrams(literal.lower()):
+                        posting = self.postings.get(gram, set())
+                        candidates = set(posting) if candidates is None else candidates & posting
+                        if not candidates:
+                            return [], False
+            else:
+                candidates = set(self.files)
+            if glob:
+                candidates = {rel for rel in candidates if fnmatch.fnmatch(rel if "/" in glob else rel.rsplit("/", 1)[-1], glob)}
+
+            matches = []
+            for rel in sorted(candidates):
+                entry = self._fresh(rel)
+                if entry is None:
+                    continue
+                text = entry["text"]
+                lines = None
+                pos, line_number, counted_to = 0, 1, 0
+                while pos <= len(text):
+                    match = matcher.search(text, pos)
+                    if match is None:
+                        break
+                    if len(matches) >= max_results:
+                        return matches, True
+                    line_start = text.rfind("\n", 0, match.start()) + 1
+                    line_end = text.find("\n", match.start())
+                    line_end = len(text) if line_end == -1 else line_end
+                    line_number += text.count("\n", counted_to, line_start)
+                    counted_to = line_start
+                    if lines is None:
+                        lines = text.split("\n")
+                    first = max(line_number - 1 - context_lines, 0)
+                    last = min(line_number + context_lines, len(lines))
+                    matches.append({
+                        "file": rel,
+                        "line": line_number,
+                        "text": text[line_start:line_end].strip()[:MAX_LINE_CHARS],
+                        "context": "\n".join(f"{i + 1}: {lines[i][:MAX_LINE_CHARS]}" for i in range(first, last)) if context_lines else None,
+                    })
+                    # one result per line
+                    pos = line_end + 1
+            return matches, False
+
+    def stats(self):
+        with self.lock:
+            return {"files": len(self.files), "trigrams": len(self.postings), "bytes": sum(e["size"] for e in self.files.values())}
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(root):
+    """shared search index for a project root, built on first use"""
+    key = os.path.realpath(root)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+    index = ProjectSearchIndex(key)
+    with _indexes_lock:
+        index = _indexes.setdefault(key, index)
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def _on_file_event(event):
+    file_path = event.get("file_path")
+    if not file_path or event.get("type") != "file_changed":
+        return
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    for index in indexes:
+        if index._rel(file_path) is not None:
+            if event.get("change") == "deleted":
+                index.file_removed(file_path)
+            else:
+                index.file_changed(file_path)
+
+
+# keep indexes current from the tools' write/delete events (immediately, not coalesced)
+file_events.subscribe(_on_file_event, coalesce=False)
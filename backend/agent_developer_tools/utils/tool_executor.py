@@ -0,0 +1,149 @@
+# tool executor
+# purpose: run the tool calls of one model turn concurrently while keeping their sequential meaning
+# every call is classified by the file it targets: reads of a file may overlap each other, but a write,
+# edit or delete waits for every earlier call on that file (and a read waits for earlier writes to it).
+# calls on different files run in parallel on a thread pool, so e.g. three edits that each need an llm
+# merge take about as long as the slowest one. listing the directory waits for all earlier changes,
+# unknown tools act as a barrier. results are returned in the original call order.
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import tracing
+from . import diff_utils
+
+READ_TOOLS = ("read_file_tool",)
+WRITE_TOOLS = ("write_file_tool", "delete_file_tool")
+EDIT_TOOLS = ("edit_file_tool",)
+# tools that read the whole project tree
+TREE_TOOLS = ("list_project_directory_tool", "search_project_tool")
+
+DEFAULT_MAX_WORKERS = 8
+
+
+def classify_call(name, arguments):
+    """(kind, target file) for a tool call, kind is read/write/edit/tree/other"""
+    if name in TREE_TOOLS:
+        return "tree", None
+    if name in READ_TOOLS or name in WRITE_TOOLS or name in EDIT_TOOLS:
+        target = os.path.normpath(os.path.join(arguments.get("file_path") or "", arguments.get("file_name") or ""))
+        kind = "read" if name in READ_TOOLS else "edit" if name in EDIT_TOOLS else "write"
+        return kind, target
+    return "other", None
+
+
+def parse_arguments(arguments):
+    """the call's arguments as a dict, raises ValueError for invalid json or anything but an object"""
+    if isinstance(arguments, str):
+        arguments = json.loads(arguments) if arguments.strip() else {}
+    if arguments is None:
+        return {}
+    if not isinstance(arguments, dict):
+        raise ValueError(f"expected an object, got {type(arguments).__name__}")
+    return dict(arguments)
+
+
+class ToolExecutor:
+    def __init__(self, functions, max_workers=DEFAULT_MAX_WORKERS):
+        """functions: tool name -> callable (available_functions)"""
+        self.functions = functions
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+        self._local = threading.local()
+
+    def _call(self, name, arguments):
+        function = self.functions.get(name)
+        if function is None:
+            return f"Unknown tool {name}"
+        try:
+            return function(**arguments)
+        except Exception as e:
+            return f"Error running {name}: {str(e)}"
+
+    def _run(self, name, arguments, dependencies, turn_state, parent_span):
+        # dependencies were submitted earlier, so with a fifo pool they are already running or done
+        wait(dependencies)
+        previous = diff_utils.turn_state()
+        diff_utils.set_turn_state(turn_state)
+        self._local.in_pool = True
+        try:
+            with tracing.attach(parent_span):
+                return self._call(name, arguments)
+        finally:
+            self._local.in_pool = False
+            diff_utils.set_turn_state(previous)
+
+    def execute(self, calls):
+        """
+        calls: list of {"name": ..., "arguments": dict or json string}
+        returns the results in the same order as calls
+        """
+        if getattr(self._local, "in_pool", False):
+            # a tool running on the pool called back in, waiting on the pool from here could deadlock
+            return [self._call_sequential(call) for call in calls]
+        turn_state = diff_utils.turn_state()
+        parent_span = tracing.current_span()
+        futures = []
+        last_change = {}  # target -> future of the latest write/edit
+        reads_since_change = {}  # target -> futures of reads after that change
+        tree_reads = []  # directory listings since the last barrier
+        barrier = []  # the latest "other" call, everything after it waits
+        for call in calls:
+            name = call.get("name")
+            try:
+                arguments = parse_arguments(call.get("arguments"))
+            except ValueError as e:
+                arguments = None
+                error = f"Invalid arguments for {name}: {str(e)}"
+            kind, target = classify_call(name, arguments or {})
+
+            if kind == "read":
+                dependencies = barrier + ([last_change[target]] if target in last_change else [])
+            elif kind in ("write", "edit"):
+                dependencies = barrier + tree_reads + reads_since_change.get(target, []) + ([last_change[target]] if target in last_change else [])
+            elif kind == "tree":
+                dependencies = barrier + list(last_change.values())
+            else:
+                dependencies = list(futures)
+
+            if arguments is None:
+                future = self.pool.submit(lambda message=error: message)
+            else:
+                future = self.pool.submit(self._run, name, arguments, dependencies, turn_state, parent_span)
+            futures.append(future)
+
+            if kind == "read":
+                reads_since_change.setdefault(target, []).append(future)
+            elif kind in ("write", "edit"):
+                last_change[target] = future
+                reads_since_change[target] = []
+            elif kind == "tree":
+                tree_reads.append(future)
+            else:
+                barrier = [future]
+                last_change, reads_since_change, tree_reads = {}, {}, []
+        return [future.result() for future in futures]
+
+    def _call_sequential(self, call):
+        try:
+            arguments = parse_arguments(call.get("arguments"))
+        except ValueError as e:
+            return f"Invalid arguments for {call.get('name')}: {str(e)}"
+        return self._call(call.get("name"), arguments)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_tool_executor(functions):
+    """shared executor for the coding tools, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ToolExecutor(functions)
+        return _executor
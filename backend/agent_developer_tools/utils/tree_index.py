@@ -0,0 +1,260 @@
+# tree index
+# purpose: in-memory index of a project's directory tree for list_project_directory_tool
+# built once with os.scandir, then kept current from the file change events the write/delete tools publish.
+# each listed directory is also checked against its recorded mtime, so changes made outside the tools
+# are picked up by rescanning only that directory. ignored directories (node_modules, dist, .gitignore
+# entries, ...) are shown collapsed and never scanned.
+
+import fnmatch
+import os
+import threading
+from collections import OrderedDict
+
+from event_bus import file_events
+
+DEFAULT_IGNORES = ["node_modules/", "dist/", "build/", "__pycache__/", "venv/", "vendor/", "bower_components/"]
+# number of project indexes kept in memory
+MAX_INDEXES = 8
+
+
+class IgnoreRules:
+    """a small .gitignore subset: globs, trailing / for directories only, leading / to anchor at the root"""
+
+    def __init__(self, patterns):
+        self.rules = []
+        for line in patterns:
+            line = line.strip()
+            if not line or line.startswith("#") or line.startswith("!"):
+                continue
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            anchored = line.startswith("/") or "/" in line
+            self.rules.append((line.lstrip("/"), dir_only, anchored))
+
+    @classmethod
+    def for_project(cls, root):
+        patterns = list(DEFAULT_IGNORES)
+        try:
+            with open(os.path.join(root, ".gitignore"), "r") as f:
+                patterns.extend(f.read().splitlines())
+        except OSError:
+            pass
+        return cls(patterns)
+
+    def ignored(self, rel_path, is_dir):
+        name = rel_path.rsplit("/", 1)[-1]
+        for pattern, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if fnmatch.fnmatch(rel_path if anchored else name, pattern):
+                return True
+        return False
+
+
+def _join(rel_dir, name):
+    return f"{rel_dir}/{name}" if rel_dir else name
+
+
+class ProjectTreeIndex:
+    def __init__(self, root):
+        self.root = os.path.realpath(root)
+        self.lock = threading.RLock()
+        self.build()
+
+    def build(self):
+        """(re)scans the whole project, skipping hidden and ignored directories"""
+        with self.lock:
+            self.ignore = IgnoreRules.for_project(self.root)
+            # relative dir ("" is the root) -> {"mtime": ns, "entries": {name: is_dir}}
+            self.dirs = {}
+            pending = [""]
+            while pending:
+                rel_dir = pending.pop()
+                for name, is_dir in self._scan(rel_dir).items():
+                    child = _join(rel_dir, name)
+                    if is_dir and not self.ignore.ignored(child, True):
+                        pending.append(child)
+
+    def _scan(self, rel_dir):
+        abs_dir = os.path.join(self.root, rel_dir)
+        entries = {}
+        with os.scandir(abs_dir) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                is_dir = entry.is_dir()
+                if not is_dir and self.ignore.ignored(_join(rel_dir, entry.name), False):
+                    continue
+                entries[entry.name] = is_dir
+        self.dirs[rel_dir] = {"mtime": os.stat(abs_dir).st_mtime_ns, "entries": entries}
+        return entries
+
+    def _drop_subtree(self, rel_dir):
+        prefix = rel_dir + "/"
+        for key in [k for k in self.dirs if k == rel_dir or k.startswith(prefix)]:
+            del self.dirs[key]
+
+    def _fresh_entries(self, rel_dir):
+        """entries of a directory, rescanned if it changed on disk since it was indexed"""
+        node = self.dirs.get(rel_dir)
+        try:
+            mtime = os.stat(os.path.join(self.root, rel_dir)).st_mtime_ns
+        except OSError:
+            self._drop_subtree(rel_dir)
+            return None
+        if node is None or node["mtime"] != mtime:
+            old = node["entries"] if node else {}
+            entries = self._scan(rel_dir)
+            for name, is_dir in old.items():
+                if is_dir and not entries.get(name):
+                    self._drop_subtree(_join(rel_dir, name))
+            return entries
+        return node["entries"]
+
+    def _rel(self, abs_path):
+        rel = os.path.relpath(os.path.realpath(abs_path), self.root)
+        if rel == ".":
+            return ""
+        if rel.startswith(".."):
+            return None
+        return rel.replace(os.sep, "/")
+
+    def contains(self, abs_path):
+        return self._rel(abs_path) is not None
+
+    def file_changed(self, abs_path):
+        """a file was written: add it (and any new parent directories) to the index"""
+        rel = self._rel(abs_path)
+        if not rel:
+            return
+        if rel == ".gitignore":
+            self.build()
+            return
+        with self.lock:
+            parts = rel.split("/")
+            rel_dir = ""
+            for i, name in enumerate(parts):
+                if name.startswith("."):
+                    return
+                is_dir = i < len(parts) - 1
+                child = _join(rel_dir, name)
+                if self.ignore.ignored(child, is_dir):
+                    return
+                node = self.dirs.get(rel_dir)
+                if node is None:
+                    # parent isn't indexed yet (new directory), scan it from disk
+                    self._fresh_entries(rel_dir)
+                    node = self.dirs.get(rel_dir)
+                    if node is None:
+                        return
+                else:
+                    node["entries"][name] = is_dir
+                    node["mtime"] = os.stat(os.path.join(self.root, rel_dir)).st_mtime_ns
+                rel_dir = child
+
+    def file_removed(self, abs_path):
+        rel = self._rel(abs_path)
+        if not rel:
+            return
+        if rel == ".gitignore":
+            self.build()
+            return
+        with self.lock:
+            rel_dir, _, name = rel.rpartition("/")
+            node = self.dirs.get(rel_dir)
+            if node is not None:
+                node["entries"].pop(name, None)
+                try:
+                    node["mtime"] = os.stat(os.path.join(self.root, rel_dir)).st_mtime_ns
+                except OSError:
+                    self._drop_subtree(rel_dir)
+
+    @staticmethod
+    def _subpath(path):
+        rel = os.path.normpath(path or ".").replace(os.sep, "/").strip("/")
+        if rel == ".":
+            return ""
+        if rel == ".." or rel.startswith("../"):
+            raise ValueError(f"Path {path} is outside the project")
+        return rel
+
+    def list_tree(self, path="", depth=None):
+        """nested listing (same shape as before) of path, expanded at most depth levels"""
+        with self.lock:
+            return self._tree(self._subpath(path), depth)
+
+    def _tree(self, rel_dir, depth):
+        entries = self._fresh_entries(rel_dir)
+        if entries is None:
+            raise FileNotFoundError(f"Directory {rel_dir or '.'} does not exist in the project")
+        result = []
+        for name in sorted(entries):
+            if not entries[name]:
+                result.append({"name": name, "type": "file"})
+                continue
+            child = _join(rel_dir, name)
+            if self.ignore.ignored(child, True):
+                children = [{"name": f"({name} not shown)", "type": "info"}]
+            elif depth is not None and depth <= 1:
+                children = [{"name": "(not expanded, list this path or use a larger depth)", "type": "info"}]
+            else:
+                children = self._tree(child, None if depth is None else depth - 1)
+            result.append({"name": name, "type": "directory", "children": children})
+        return result
+
+    def glob(self, pattern, path=""):
+        """flat list of indexed files under path matching pattern (matched on the name, or the path if it has a /)"""
+        with self.lock:
+            matches = []
+            pending = [self._subpath(path)]
+            while pending:
+                rel_dir = pending.pop()
+                entries = self._fresh_entries(rel_dir)
+                if entries is None:
+                    continue
+                for name, is_dir in entries.items():
+                    child = _join(rel_dir, name)
+                    if is_dir:
+                        if not self.ignore.ignored(child, True):
+                            pending.append(child)
+                    elif fnmatch.fnmatch(child if "/" in pattern else name, pattern):
+                        matches.append(child)
+            return sorted(matches)
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_tree_index(root):
+    """shared index for a project root, built on first use"""
+    key = os.path.realpath(root)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+    index = ProjectTreeIndex(key)
+    with _indexes_lock:
+        index = _indexes.setdefault(key, index)
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+def _on_file_event(event):
+    file_path = event.get("file_path")
+    if not file_path or event.get("type") != "file_changed":
+        return
+    with _indexes_lock:
+        indexes = list(_indexes.values())
+    for index in indexes:
+        if index.contains(file_path):
+            if event.get("change") == "deleted":
+                index.file_removed(file_path)
+            else:
+                index.file_changed(file_path)
+
+
+# keep indexes current from the tools' write/delete events (immediately, not coalesced)
+file_events.subscribe(_on_file_event, coalesce=False)
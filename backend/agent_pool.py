@@ -0,0 +1,157 @@
+# agent pool
+# purpose: keep one agent (LitellmInterface) per client session instead of a single shared bot
+# sessions are kept in LRU order, evicted when idle for too long, and evicted oldest-first
+# when the total size of all conversation histories goes over the memory budget.
+
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+def history_size(bot):
+    """approximate size in bytes of an agent's conversation history"""
+    messages = getattr(bot, "messages", None)
+    if not messages:
+        return 0
+    try:
+        return len(json.dumps(messages, default=str))
+    except Exception:
+        return 0
+
+
+class AgentSession:
+    def __init__(self, key, bot):
+        self.key = key
+        self.bot = bot
+        # one turn at a time per session, different sessions run in parallel
+        self.lock = threading.Lock()
+        self.busy = 0
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.history_bytes = 0
+        # token accounting of recent turns, filled in by code_agent
+        self.turn_stats = deque(maxlen=50)
+
+
+class AgentPool:
+    def __init__(self, factory, max_sessions=64, idle_ttl=30 * 60, max_history_bytes=64 * 1024 * 1024):
+        """
+        factory: callable returning a new agent instance
+        max_sessions: max number of live sessions, least recently used is evicted first
+        idle_ttl: seconds a session can sit unused before it is evicted
+        max_history_bytes: budget for the combined size of all session histories
+        """
+        self.factory = factory
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_history_bytes = max_history_bytes
+        self.sessions = OrderedDict()
+        # agents built ahead of time (warm-up), handed to new sessions before calling the factory
+        self.spares = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = {"ttl": 0, "lru": 0, "memory": 0}
+
+    @staticmethod
+    def make_key(session_id, project_name=None):
+        """sessions bound to a project get their own agent per project"""
+        return (session_id, project_name)
+
+    def acquire(self, session_id, project_name=None):
+        """returns the session for this key (creating it if needed) and marks it busy"""
+        key = self.make_key(session_id, project_name)
+        with self._lock:
+            self._evict_expired()
+            session = self.sessions.get(key)
+            if session is not None:
+                self.hits += 1
+                self.sessions.move_to_end(key)
+            else:
+                self.misses += 1
+                session = AgentSession(key, None)
+                self.sessions[key] = session
+            session.busy += 1
+            self._evict_lru()
+            session.last_used = time.monotonic()
+        # build the agent outside the pool lock, agent construction can be slow
+        try:
+            with session.lock:
+                if session.bot is None:
+                    session.bot = self._take_spare() or self.factory()
+        except BaseException:
+            # the caller never gets the session, so it can't release it
+            with self._lock:
+                session.busy -= 1
+                if session.bot is None and session.busy == 0 and self.sessions.get(key) is session:
+                    del self.sessions[key]
+            raise
+        return session
+
+    def _take_spare(self):
+        with self._lock:
+            return self.spares.pop() if self.spares else None
+
+    def prewarm(self, count=1):
+        """builds agents ahead of the first request so it doesn't pay for agent construction"""
+        while True:
+            with self._lock:
+                if len(self.spares) >= count:
+                    return
+            bot = self.factory()
+            with self._lock:
+                self.spares.append(bot)
+
+    def release(self, session):
+        """marks the session idle again and re-checks the memory budget"""
+        session.history_bytes = history_size(session.bot)
+        with self._lock:
+            session.busy -= 1
+            session.last_used = time.monotonic()
+            self._evict_over_budget()
+
+    def reset(self, session_id, project_name=None):
+        """drops a session's agent, the next request starts a fresh conversation"""
+        key = self.make_key(session_id, project_name)
+        with self._lock:
+            # a turn still running on the dropped session finishes on its own agent
+            return self.sessions.pop(key, None) is not None
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        for key, session in list(self.sessions.items()):
+            if not session.busy and now - session.last_used > self.idle_ttl:
+                del self.sessions[key]
+                self.evictions["ttl"] += 1
+
+    def _evict_lru(self):
+        for key, session in list(self.sessions.items()):
+            if len(self.sessions) <= self.max_sessions:
+                break
+            if not session.busy:
+                del self.sessions[key]
+                self.evictions["lru"] += 1
+
+    def _evict_over_budget(self):
+        total = sum(s.history_bytes for s in self.sessions.values())
+        for key, session in list(self.sessions.items()):
+            if total <= self.max_history_bytes:
+                break
+            if not session.busy:
+                total -= session.history_bytes
+                del self.sessions[key]
+                self.evictions["memory"] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self.sessions),
+                "busy_sessions": sum(1 for s in self.sessions.values() if s.busy),
+                "spare_agents": len(self.spares),
+                "history_bytes": sum(s.history_bytes for s in self.sessions.values()),
+                "max_history_bytes": self.max_history_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": dict(self.evictions),
+            }
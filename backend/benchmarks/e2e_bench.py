@@ -0,0 +1,345 @@
+# end to end benchmark
+# purpose: the backend's own overhead, separate from provider latency
+# starts the mock llm (benchmarks/mock_llm_server.py) and main.py's app in their own processes, with litellm
+# pointed at the mock and the project env in a temp directory, then measures:
+#   - per-tool cost of every function in coding_tools.available_functions (called directly)
+#   - time to first chunk and total turn time on /prompt_agent_stream, and the overhead left after
+#     subtracting the time the mock spent simulating the model
+#   - WebSocket notification latency (/notify_file_change round trip and file_changed events from turns)
+#   - throughput and turn latency with N concurrent clients (one session each)
+# results are printed and written as json (--output) so runs can be compared.
+# the WebSocket part needs the websockets package (uvicorn[standard]), it is skipped without it.
+#
+# run from backend/: python benchmarks/e2e_bench.py --turns 10 --clients 1,4,16 --output e2e.json
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_NAME = "bench_project"
+
+PROJECT_FILES = {
+    "index.html": "<!DOCTYPE html>\n<html>\n<head>\n  <title>Bench</title>\n  <link rel=\"stylesheet\" href=\"styles.css\">\n</head>\n<body>\n"
+                  + "".join(f"  <div class=\"card\" id=\"card{i}\"><h2>Card {i}</h2><p>Text {i}</p></div>\n" for i in range(40))
+                  + "  <script src=\"app.js\"></script>\n</body>\n</html>\n",
+    "styles.css": "body {\n  margin: 0;\n  font-family: sans-serif;\n}\n" + "".join(f".card{i} {{\n  color: #{i * 4001:06x};\n}}\n" for i in range(120)),
+    "app.js": "".join(f"function handler{i}(event) {{\n  return event.target.id === 'card{i}';\n}}\n" for i in range(80)),
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def summarize(samples):
+    """median/p95/max in ms of samples in seconds"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "median_ms": round(statistics.median(ordered) * 1000, 2),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+def make_workdir(root):
+    """settings.json and a project env with one project, laid out like backend/"""
+    project_env = os.path.join(root, "project_env")
+    project_path = os.path.join(project_env, PROJECT_NAME)
+    os.makedirs(project_path)
+    for name, contents in PROJECT_FILES.items():
+        with open(os.path.join(project_path, name), "w") as f:
+            f.write(contents)
+    with open(os.path.join(root, "settings.json"), "w") as f:
+        quiet = {f"print_{level}_logs": False for level in ("system", "debug", "error", "llm", "tool")}
+        json.dump({"logging": dict(quiet, write_to_file=False), "active_project_path": project_path}, f)
+    return project_env, project_path
+
+
+def llm_env(llm_port):
+    env = dict(os.environ)
+    base = f"http://127.0.0.1:{llm_port}/v1"
+    env.update({"OPENAI_API_BASE": base, "OPENAI_BASE_URL": base, "OPENAI_API_KEY": "mock"})
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [BACKEND_DIR, env.get("PYTHONPATH")]))
+    return env
+
+
+def serve_backend(port, workdir):
+    """--serve-backend mode: main.py's app with its paths moved into workdir"""
+    os.chdir(workdir)
+    sys.path.insert(0, BACKEND_DIR)
+    import project_manager
+    project_env = os.path.join(workdir, "project_env")
+    project_manager.PROJECT_ENV_PATH = project_env
+    project_manager.PROJECTS_JSON_PATH = os.path.join(project_env, "projects.json")
+    project_manager.PROJECTS_DB_PATH = os.path.join(project_env, "projects.db")
+    project_manager.TRASH_PATH = os.path.join(project_env, ".trash")
+    import main
+    import uvicorn
+    from snapshot_store import SnapshotStore
+    main.PROJECT_ENV_PATH = project_env
+    main.snapshot_store = SnapshotStore(os.path.join(project_env, ".snapshots"), project_env)
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def start_process(args, env, log_path):
+    log = open(log_path, "w")
+    return subprocess.Popen([sys.executable] + args, env=env, stdout=log, stderr=subprocess.STDOUT, cwd=BACKEND_DIR)
+
+
+def wait_for(url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+TOOL_CASES = {
+    "list_project_directory_tool": {},
+    "read_file_tool": {"file_path": "", "file_name": "styles.css"},
+    "search_project_tool": {"query": "card1"},
+    "write_file_tool": {"file_path": "", "file_name": "bench_write.css", "contents": ".bench { color: red; }\n"},
+    "delete_file_tool": {"file_path": "", "file_name": "bench_write.css"},
+    "edit_file_tool": {"file_path": "", "file_name": "styles.css", "code_snippet": "<<<<<<< SEARCH\nbody {\n=======\nbody {\n>>>>>>> REPLACE"},
+    "batch_edit_tool": {"edits": [
+        {"file_path": "", "file_name": "index.html", "code_snippet": "<<<<<<< SEARCH\n</body>\n=======\n</body>\n>>>>>>> REPLACE"},
+        {"file_path": "", "file_name": "app.js", "code_snippet": "<<<<<<< SEARCH\nfunction handler0(event) {\n=======\nfunction handler0(event) {\n>>>>>>> REPLACE"},
+    ]},
+    "run_tools_in_parallel_tool": {"calls": [
+        {"name": "read_file_tool", "arguments": {"file_path": "", "file_name": name}} for name in PROJECT_FILES
+    ]},
+}
+
+
+def measure_tools(workdir, llm_port, repeat):
+    """per-call cost of each available function, in a child process so the imports don't skew the client"""
+    script = (
+        "import json, os, sys, time\n"
+        f"os.chdir({workdir!r})\n"
+        "from agent_developer_tools import coding_tools\n"
+        f"cases = json.loads({json.dumps(TOOL_CASES)!r})\n"
+        "results = {}\n"
+        "for name, function in coding_tools.available_functions.items():\n"
+        "    if name not in cases:\n"
+        "        results[name] = None\n"
+        "        continue\n"
+        "    samples = []\n"
+        f"    for _ in range({repeat}):\n"
+        "        if name == 'delete_file_tool':\n"
+        "            coding_tools.write_file_tool('', 'bench_write.css', '.bench {}\\n')\n"
+        "        start = time.perf_counter()\n"
+        "        function(**cases[name])\n"
+        "        samples.append(time.perf_counter() - start)\n"
+        "    results[name] = samples\n"
+        "print(json.dumps(results))\n"
+    )
+    output = subprocess.run([sys.executable, "-c", script], env=llm_env(llm_port), cwd=BACKEND_DIR,
+                            capture_output=True, text=True, timeout=600)
+    if output.returncode != 0:
+        return {"error": output.stderr.strip().splitlines()[-1] if output.stderr.strip() else "tool benchmark failed"}
+    samples = json.loads(output.stdout.strip().splitlines()[-1])
+    return {name: summarize(values) if values is not None else "no benchmark case" for name, values in samples.items()}
+
+
+async def run_turn(client, base_url, prompt, session_id):
+    """(time to first chunk, total time) of one /prompt_agent_stream turn, in seconds"""
+    start = time.perf_counter()
+    first = None
+    async with client.stream("POST", f"{base_url}/prompt_agent_stream", json={"prompt": prompt},
+                             headers={"X-Session-Id": session_id}, timeout=300) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes():
+            if chunk and first is None:
+                first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+async def mock_stats(client, llm_url):
+    return (await client.get(f"{llm_url}/stats")).json()
+
+
+async def measure_turns(base_url, llm_url, turns):
+    results = {}
+    async with httpx.AsyncClient() as client:
+        for script in ("chat", "default", "merge"):
+            ttfc, totals, overhead = [], [], []
+            for i in range(turns):
+                before = await mock_stats(client, llm_url)
+                first, total = await run_turn(client, base_url, f"[script:{script}] benchmark turn {i}", f"bench-{script}")
+                after = await mock_stats(client, llm_url)
+                ttfc.append(first or total)
+                totals.append(total)
+                overhead.append(max(total - (after["model_seconds"] - before["model_seconds"]), 0))
+            await client.get(f"{base_url}/reset_conversation", headers={"X-Session-Id": f"bench-{script}"})
+            results[script] = {
+                "time_to_first_chunk": summarize(ttfc),
+                "turn_time": summarize(totals),
+                "backend_overhead": summarize(overhead),
+            }
+    return results
+
+
+async def measure_concurrency(base_url, clients, turns_per_client):
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=clients * 2)) as client:
+        ttfc, totals = [], []
+
+        async def one_client(n):
+            for i in range(turns_per_client):
+                first, total = await run_turn(client, base_url, f"[script:default] concurrent turn {i}", f"bench-client-{n}")
+                ttfc.append(first or total)
+                totals.append(total)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one_client(n) for n in range(clients)))
+        elapsed = time.perf_counter() - start
+        for n in range(clients):
+            await client.get(f"{base_url}/reset_conversation", headers={"X-Session-Id": f"bench-client-{n}"})
+    return {
+        "clients": clients,
+        "turns": len(totals),
+        "elapsed_s": round(elapsed, 3),
+        "turns_per_second": round(len(totals) / elapsed, 3),
+        "time_to_first_chunk": summarize(ttfc),
+        "turn_time": summarize(totals),
+    }
+
+
+async def measure_websocket(base_url, notifications, turns):
+    try:
+        import websockets
+    except ImportError:
+        return {"skipped": "websockets package not installed"}
+    ws_url = base_url.replace("http://", "ws://") + "/ws"
+    notify_latency, file_event_latency = [], []
+    async with websockets.connect(ws_url) as ws, httpx.AsyncClient() as client:
+        # /notify_file_change round trip: POST until the message arrives on the socket
+        for i in range(notifications):
+            marker = f"bench-{i}"
+            start = time.perf_counter()
+            await client.post(f"{base_url}/notify_file_change", json={"type": "bench", "message": marker})
+            while True:
+                message = json.loads(await asyncio.wait_for(ws.recv(), 10))
+                if message.get("message") == marker:
+                    notify_latency.append(time.perf_counter() - start)
+                    break
+
+        # file_changed events published by the tools during turns (timestamp is the file's mtime)
+        async def collect():
+            while True:
+                message = json.loads(await ws.recv())
+                if message.get("type") == "file_changed" and message.get("timestamp"):
+                    file_event_latency.append(max(time.time() - float(message["timestamp"]), 0))
+
+        collector = asyncio.create_task(collect())
+        for i in range(turns):
+            await run_turn(client, base_url, f"[script:default] websocket turn {i}", "bench-ws")
+        await asyncio.sleep(0.5)
+        collector.cancel()
+        await client.get(f"{base_url}/reset_conversation", headers={"X-Session-Id": "bench-ws"})
+    return {
+        "notify_round_trip": summarize(notify_latency),
+        "file_changed_delivery": summarize(file_event_latency),
+        "stats": httpx.get(f"{base_url}/ws_stats").json(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End to end backend benchmark against a mock model")
+    parser.add_argument("--turns", type=int, default=10, help="sequential turns per script")
+    parser.add_argument("--clients", default="1,4,16", help="comma separated concurrent client counts")
+    parser.add_argument("--turns-per-client", type=int, default=3)
+    parser.add_argument("--tool-repeat", type=int, default=20)
+    parser.add_argument("--notifications", type=int, default=50)
+    parser.add_argument("--first-token-ms", type=float, default=300)
+    parser.add_argument("--tokens-per-second", type=float, default=80)
+    parser.add_argument("--output", help="write results as json to this file")
+    parser.add_argument("--keep-workdir", action="store_true")
+    parser.add_argument("--serve-backend", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_backend:
+        serve_backend(args.port, args.workdir)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="e2e_bench_")
+    make_workdir(workdir)
+    llm_port, backend_port = free_port(), free_port()
+    llm_url, base_url = f"http://127.0.0.1:{llm_port}", f"http://127.0.0.1:{backend_port}"
+    env = llm_env(llm_port)
+    processes = []
+    results = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("serve_backend", "port", "workdir")},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "started_at": datetime.datetime.now().isoformat(),
+    }
+    try:
+        processes.append(start_process([os.path.join(BENCH_DIR, "mock_llm_server.py"), "--port", str(llm_port),
+                                        "--first-token-ms", str(args.first_token_ms), "--tokens-per-second", str(args.tokens_per_second)],
+                                       env, os.path.join(workdir, "mock_llm.log")))
+        wait_for(f"{llm_url}/stats")
+
+        # tools run against a copy of the project, the backend gets the original
+        tools_workdir = os.path.join(workdir, "tools")
+        make_workdir(tools_workdir)
+        results["tools"] = measure_tools(tools_workdir, llm_port, args.tool_repeat)
+
+        start = time.perf_counter()
+        processes.append(start_process([os.path.abspath(__file__), "--serve-backend", "--port", str(backend_port), "--workdir", workdir],
+                                       env, os.path.join(workdir, "backend.log")))
+        # /ready answers 503 until the registry is synced and the agent is warmed up
+        wait_for(f"{base_url}/ready")
+        results["backend_startup_s"] = round(time.perf_counter() - start, 3)
+        results["startup_profile"] = httpx.get(f"{base_url}/startup_profile", params={"top": 10}).json()
+
+        results["turns"] = asyncio.run(measure_turns(base_url, llm_url, args.turns))
+        results["websocket"] = asyncio.run(measure_websocket(base_url, args.notifications, min(args.turns, 5)))
+        results["concurrency"] = [
+            asyncio.run(measure_concurrency(base_url, int(clients), args.turns_per_client))
+            for clients in args.clients.split(",") if clients.strip()
+        ]
+        results["mock_llm"] = httpx.get(f"{llm_url}/stats").json()
+    finally:
+        for process in processes:
+            process.terminate()
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if args.keep_workdir:
+            results["workdir"] = workdir
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+# mock llm server
+# purpose: local OpenAI-compatible stand-in for the model, so the backend can be benchmarked without a provider
+# serves /v1/chat/completions (streaming and not). requests that offer tools get the next step of a scripted
+# turn: the step is the number of assistant messages after the last user message, so the server keeps no
+# conversation state. pick a script by putting [script:<name>] in the prompt. requests without tools are
+# treated as the edit merge call and answered with the original plus the snippet.
+# latency is simulated with a time to first token and a token rate (a token is ~4 characters).
+# GET /stats returns the request count and the total time spent simulating the model, which the e2e
+# benchmark subtracts from turn times to get the backend's own overhead.
+#
+# run from backend/: python benchmarks/mock_llm_server.py --port 8765 --tokens-per-second 80
+# then point litellm at it: OPENAI_API_BASE=http://127.0.0.1:8765/v1 OPENAI_API_KEY=mock
+
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHARS_PER_TOKEN = 4
+# tokens sent per streamed chunk (a real stream sends one or a few)
+TOKENS_PER_CHUNK = 3
+
+# turns against the project the e2e benchmark creates (index.html, styles.css, app.js)
+SCRIPTS = {
+    # a typical edit turn: look around, read, change two files, answer
+    "default": [
+        {"tool_calls": [{"name": "list_project_directory_tool", "arguments": {}}]},
+        {"tool_calls": [
+            {"name": "read_file_tool", "arguments": {"file_path": "", "file_name": "index.html"}},
+            {"name": "read_file_tool", "arguments": {"file_path": "", "file_name": "styles.css"}},
+        ]},
+        {"tool_calls": [{"name": "batch_edit_tool", "arguments": {"edits": [
+            {"file_path": "", "file_name": "index.html", "code_snippet": "<<<<<<< SEARCH\n</body>\n=======\n<!-- bench -->\n</body>\n>>>>>>> REPLACE"},
+            {"file_path": "", "file_name": "styles.css", "code_snippet": "<<<<<<< SEARCH\nbody {\n=======\n/* bench */\nbody {\n>>>>>>> REPLACE"},
+        ]}}]},
+        {"content": "I updated index.html and styles.css. The header now uses the new colors and the layout is unchanged otherwise. " * 2},
+    ],
+    # the edit goes through the llm merge (a second model call per edit)
+    "merge": [
+        {"tool_calls": [{"name": "edit_file_tool", "arguments": {"file_path": "", "file_name": "app.js", "code_snippet": "function bench() { return 1; }", "instructions": "add the function at the end"}}]},
+        {"content": "Added the bench function to app.js."},
+    ],
+    # no tools, time to first chunk and streaming only
+    "chat": [
+        {"content": "Here is an overview of the project: an index page, one stylesheet and one script. " * 3},
+    ],
+}
+SCRIPT_RE = re.compile(r"\[script:([\w-]+)\]")
+
+
+def _message_text(message):
+    content = message.get("content")
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def next_step(messages, scripts):
+    """the scripted response for this point of the turn"""
+    last_user = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=-1)
+    step = sum(1 for m in messages[last_user + 1:] if m.get("role") == "assistant")
+    match = SCRIPT_RE.search(_message_text(messages[last_user])) if last_user >= 0 else None
+    script = scripts.get(match.group(1) if match else "default", scripts["default"])
+    if step >= len(script):
+        return script[-1] if "content" in script[-1] else {"content": "Done."}
+    return script[step]
+
+
+def merge_response(messages):
+    """stand-in for the edit merge model: the original with the snippet appended"""
+    # the system prompt describes the tags too, the file is in the last message that has them
+    text = next((_message_text(m) for m in reversed(messages) if "</original>" in _message_text(m)), "")
+    original = text.split("<original>", 1)[1].split("</original>", 1)[0] if "<original>" in text else ""
+    snippet = text.split("<code_snippet>", 1)[1].split("</code_snippet>", 1)[0] if "<code_snippet>" in text else ""
+    return original.rstrip("\n") + "\n" + snippet + "\n"
+
+
+class MockLLM:
+    def __init__(self, first_token_ms=300, tokens_per_second=80, scripts=None):
+        self.first_token = first_token_ms / 1000
+        self.tokens_per_second = tokens_per_second
+        self.scripts = scripts or SCRIPTS
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.model_seconds = 0.0
+
+    def tokens(self, text):
+        return max(1, len(text) // CHARS_PER_TOKEN)
+
+    def pace(self, started, tokens_sent):
+        """sleeps until the simulated model would have produced tokens_sent tokens"""
+        due = started + self.first_token + tokens_sent / self.tokens_per_second
+        delay = due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    def record(self, seconds):
+        with self.lock:
+            self.requests += 1
+            self.model_seconds += seconds
+
+    def stats(self):
+        with self.lock:
+            return {"requests": self.requests, "model_seconds": round(self.model_seconds, 4)}
+
+
+def _tool_call_objects(step):
+    return [{
+        "id": f"call_{uuid.uuid4().hex[:12]}",
+        "type": "function",
+        "function": {"name": call["name"], "arguments": json.dumps(call["arguments"])},
+    } for call in step.get("tool_calls", [])]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    llm = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            self._json(200, self.llm.stats())
+        elif self.path.rstrip("/").endswith("/models"):
+            self._json(200, {"object": "list", "data": [{"id": "mock", "object": "model"}]})
+        else:
+            self._json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._json(404, {"error": {"message": "not found"}})
+            return
+        started = time.perf_counter()
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        messages = request.get("messages") or []
+        if request.get("tools"):
+            step = next_step(messages, self.llm.scripts)
+        else:
+            step = {"content": merge_response(messages)}
+        content = step.get("content")
+        tool_calls = _tool_call_objects(step)
+        output_tokens = self.llm.tokens(content or json.dumps([c["function"] for c in tool_calls]))
+        usage = {
+            "prompt_tokens": self.llm.tokens(json.dumps(messages)),
+            "completion_tokens": output_tokens,
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        finish_reason = "tool_calls" if tool_calls else "stop"
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "created": int(time.time()), "model": request.get("model", "mock")}
+        try:
+            if request.get("stream"):
+                self._stream(request, base, content, tool_calls, output_tokens, usage, finish_reason, started)
+            else:
+                self.llm.pace(started, output_tokens)
+                message = {"role": "assistant", "content": content}
+                if tool_calls:
+                    message["tool_calls"] = tool_calls
+                self._json(200, dict(base, object="chat.completion", usage=usage, choices=[{"index": 0, "message": message, "finish_reason": finish_reason}]))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.llm.record(time.perf_counter() - started)
+
+    def _stream(self, request, base, content, tool_calls, output_tokens, usage, finish_reason, started):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send(delta, finish=None, extra=None):
+            chunk = dict(base, object="chat.completion.chunk", choices=[{"index": 0, "delta": delta, "finish_reason": finish}])
+            chunk.update(extra or {})
+            self._chunk(f"data: {json.dumps(chunk)}\n\n")
+
+        self.llm.pace(started, 0)
+        send({"role": "assistant", "content": ""})
+        step = TOKENS_PER_CHUNK * CHARS_PER_TOKEN
+        sent = 0
+        if content:
+            for i in range(0, len(content), step):
+                self.llm.pace(started, sent)
+                send({"content": content[i:i + step]})
+                sent += TOKENS_PER_CHUNK
+        for index, call in enumerate(tool_calls):
+            send({"tool_calls": [{"index": index, "id": call["id"], "type": "function", "function": {"name": call["function"]["name"], "arguments": ""}}]})
+            arguments = call["function"]["arguments"]
+            for i in range(0, len(arguments), step):
+                self.llm.pace(started, sent)
+                send({"tool_calls": [{"index": index, "function": {"arguments": arguments[i:i + step]}}]})
+                sent += TOKENS_PER_CHUNK
+        self.llm.pace(started, output_tokens)
+        send({}, finish_reason)
+        if (request.get("stream_options") or {}).get("include_usage"):
+            self._chunk(f"data: {json.dumps(dict(base, object='chat.completion.chunk', choices=[], usage=usage))}\n\n")
+        self._chunk("data: [DONE]\n\n")
+        self._chunk("")
+
+    def _chunk(self, text):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+def make_server(port=8765, first_token_ms=300, tokens_per_second=80, scripts=None, host="127.0.0.1"):
+    """the mock server (not started), its MockLLM is at server.llm"""
+    llm = MockLLM(first_token_ms, tokens_per_second, scripts)
+    handler = type("MockHandler", (Handler,), {"llm": llm})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.llm = llm
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock model for benchmarks")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--first-token-ms", type=float, default=300)
+    parser.add_argument("--tokens-per-second", type=float, default=80)
+    parser.add_argument("--scripts", help="json file with extra scripts: {name: [step, ...]}")
+    args = parser.parse_args()
+
+    scripts = dict(SCRIPTS)
+    if args.scripts:
+        with open(args.scripts) as f:
+            scripts.update(json.load(f))
+    server = make_server(args.port, args.first_token_ms, args.tokens_per_second, scripts)
+    print(f"< mock llm listening on http://127.0.0.1:{args.port}/v1 >", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# parallel tools benchmark
+# purpose: turn time of a multi-file "read everything, then edit everything" batch of tool calls, run one
+# at a time (the old dispatch) vs through the tool executor. the edits take the llm merge path, whose
+# model is replaced by one that sleeps --merge-latency seconds, so the numbers don't depend on an api.
+#
+# run from backend/: python benchmarks/parallel_tools_bench.py --files 3 --merge-latency 1.5
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+class SimulatedMergeModel:
+    """stands in for the gpt-4o-mini merge call: waits like a model would, then appends the snippet"""
+    latency = 1.0
+
+    def __init__(self, **kwargs):
+        pass
+
+    def prompt(self, prompt, predicted_output=None, **kwargs):
+        time.sleep(self.latency)
+        snippet = prompt.split("<code_snippet>", 1)[1].split("</code_snippet>", 1)[0]
+        return predicted_output + "\n" + snippet + "\n"
+
+
+def make_project(root, files):
+    os.makedirs(root)
+    names = []
+    for i in range(files):
+        name = f"file{i}.css"
+        with open(os.path.join(root, name), "w") as f:
+            f.write("".join(f".rule{j} {{ color: #{j:06x}; }}\n" for j in range(200)))
+        names.append(name)
+    return names
+
+
+def make_calls(names):
+    calls = [{"name": "list_project_directory_tool", "arguments": {}}]
+    calls += [{"name": "read_file_tool", "arguments": {"file_path": "", "file_name": name}} for name in names]
+    # instructions + a snippet that matches nothing forces the llm merge path
+    calls += [{
+        "name": "edit_file_tool",
+        "arguments": {
+            "file_path": "",
+            "file_name": name,
+            "code_snippet": f".header-{i} {{ background: navy; }}",
+            "instructions": "add the header rule at the end",
+        },
+    } for i, name in enumerate(names)]
+    calls += [{"name": "read_file_tool", "arguments": {"file_path": "", "file_name": name}} for name in names]
+    return calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequential vs parallel tool execution for one turn")
+    parser.add_argument("--files", type=int, default=3)
+    parser.add_argument("--merge-latency", type=float, default=1.0, help="seconds per simulated llm merge")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write results as json to this file")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="parallel_tools_bench_")
+    project = os.path.join(work_dir, "project")
+    # the tools find the active project through settings.json in the working directory
+    with open(os.path.join(work_dir, "settings.json"), "w") as f:
+        json.dump({"active_project_path": project}, f)
+    os.chdir(work_dir)
+
+    from agent_developer_tools import coding_tools
+    SimulatedMergeModel.latency = args.merge_latency
+    coding_tools.LitellmInterface = SimulatedMergeModel
+
+    results = {"config": vars(args), "sequential_s": [], "parallel_s": []}
+    try:
+        for _ in range(args.repeat):
+            for mode in ("sequential", "parallel"):
+                shutil.rmtree(project, ignore_errors=True)
+                calls = make_calls(make_project(project, args.files))
+                start = time.perf_counter()
+                if mode == "sequential":
+                    outputs = [coding_tools.available_functions[c["name"]](**c["arguments"]) for c in calls]
+                else:
+                    outputs = coding_tools.execute_tool_calls([{"function": c} for c in calls])
+                results[f"{mode}_s"].append(round(time.perf_counter() - start, 3))
+                edits = [o for o in outputs if isinstance(o, str) and o.startswith("Successfully applied edit")]
+                assert len(edits) == args.files, outputs
+    finally:
+        os.chdir(BACKEND_DIR)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    best_sequential = min(results["sequential_s"])
+    best_parallel = min(results["parallel_s"])
+    results["speedup"] = round(best_sequential / best_parallel, 2)
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
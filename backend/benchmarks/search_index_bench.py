@@ -0,0 +1,103 @@
+# search index benchmark
+# purpose: index build time and query latency of the project search index on a generated project with
+# thousands of files, compared with scanning every file for each query (the full scan counts every match,
+# the index stops at the default 50 results like the tool does)
+#
+# run from backend/: python benchmarks/search_index_bench.py --files 3000
+
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent_developer_tools.utils.search_index import ProjectSearchIndex
+
+WORDS = ["header", "footer", "card", "button", "modal", "grid", "item", "title", "panel", "menu", "list", "form"]
+
+
+def make_project(root, files, seed=1):
+    rng = random.Random(seed)
+    for i in range(files):
+        folder = os.path.join(root, f"module{i % 40}")
+        os.makedirs(folder, exist_ok=True)
+        if i % 2:
+            lines = [f".{rng.choice(WORDS)}-{rng.randrange(1000)} {{ color: #{rng.randrange(1 << 24):06x}; }}" for _ in range(60)]
+            name = f"style{i}.css"
+        else:
+            lines = [f"function {rng.choice(WORDS)}{rng.randrange(1000)}(el) {{ return el.querySelector('.{rng.choice(WORDS)}'); }}" for _ in range(60)]
+            name = f"script{i}.js"
+        with open(os.path.join(folder, name), "w") as f:
+            f.write("\n".join(lines) + "\n")
+    # one needle to find
+    with open(os.path.join(root, "module7", "needle.js"), "w") as f:
+        f.write("class KanbanBoardRenderer {\n  render() {}\n}\n")
+
+
+def brute_force(root, pattern):
+    found = 0
+    for folder, _, names in os.walk(root):
+        for name in names:
+            with open(os.path.join(folder, name)) as f:
+                for line in f:
+                    if pattern.search(line):
+                        found += 1
+    return found
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": round(statistics.median(samples), 3), "max_ms": round(max(samples), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search index build and query latency")
+    parser.add_argument("--files", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="write results as json to this file")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="search_bench_")
+    try:
+        make_project(root, args.files)
+        start = time.perf_counter()
+        index = ProjectSearchIndex(root)
+        build_ms = round((time.perf_counter() - start) * 1000, 1)
+        queries = {
+            "literal_rare": ("KanbanBoardRenderer", False, None),
+            "literal_common": ("header-12", False, None),
+            "regex": (r"function\s+modal\d+", True, None),
+            "literal_with_glob": ("querySelector('.card')", False, "*.js"),
+        }
+        results = {"config": vars(args), "build_ms": build_ms, "index": index.stats(), "queries": {}}
+        for label, (query, regex, glob) in queries.items():
+            matches, truncated = index.search(query, regex=regex, glob=glob)
+            pattern = re.compile(query if regex else re.escape(query), re.IGNORECASE)
+            results["queries"][label] = {
+                "query": query,
+                "matches": f"{len(matches)}+" if truncated else len(matches),
+                "indexed": timed(lambda: index.search(query, regex=regex, glob=glob), args.repeat),
+                "full_scan": timed(lambda: brute_force(root, pattern), 3),
+            }
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# ws fanout load test
+# purpose: push bursts of notifications through the Broadcaster to hundreds of simulated sockets
+# (some of them slow or dead) and report delivery latency for the healthy clients, drops/merges for the
+# slow ones, and the same burst through the old sequential send loop for comparison.
+#
+# run from backend/: python benchmarks/ws_fanout_load.py --clients 500 --slow 25 --messages 200
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ws_broadcaster import Broadcaster
+
+
+class SimulatedSocket:
+    """stands in for a starlette WebSocket: records when each message arrived"""
+
+    def __init__(self, delay=0.0, dead=False):
+        self.delay = delay
+        self.dead = dead
+        self.received = []  # (message id, arrival time)
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        if self.dead:
+            raise ConnectionResetError("client went away")
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        message = json.loads(text)
+        if "id" in message:
+            self.received.append((message["id"], time.perf_counter()))
+
+    async def close(self):
+        pass
+
+
+def make_message(i, projects, files):
+    return {
+        "type": "file_changed",
+        "id": i,
+        "file_path": f"/projects/p{i % projects}/file{i % files}.js",
+        "active_project_name": f"p{i % projects}",
+        "message": "File updated",
+    }
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def latency_summary(sent_at, sockets):
+    latencies = [(arrived - sent_at[i]) * 1000 for sock in sockets for i, arrived in sock.received]
+    return {
+        "delivered": len(latencies),
+        "p50_ms": round(percentile(latencies, 50), 3) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99), 3) if latencies else None,
+        "max_ms": round(max(latencies), 3) if latencies else None,
+        "mean_ms": round(statistics.mean(latencies), 3) if latencies else None,
+    }
+
+
+async def run_broadcaster(args):
+    broadcaster = Broadcaster(queue_size=args.queue_size, heartbeat_interval=3600)
+    fast, slow, fast_clients = [], [], []
+    for i in range(args.clients):
+        if i < args.slow:
+            sock = SimulatedSocket(delay=args.slow_delay)
+            slow.append(sock)
+        else:
+            sock = SimulatedSocket(dead=i < args.slow + args.dead)
+            fast.append(sock)
+        project = f"p{i % args.projects}" if args.topics else None
+        client = await broadcaster.connect(sock, project=project)
+        if sock.delay == 0:
+            fast_clients.append(client)
+
+    sent_at = {}
+    start = time.perf_counter()
+    for i in range(args.messages):
+        sent_at[i] = time.perf_counter()
+        broadcaster.publish(make_message(i, args.projects, args.files))
+        if args.interval:
+            await asyncio.sleep(args.interval)
+    publish_time = time.perf_counter() - start
+
+    # let the healthy clients drain
+    deadline = time.perf_counter() + 10
+    while time.perf_counter() < deadline and any(client.queue for client in fast_clients if client.id in broadcaster.clients):
+        await asyncio.sleep(0.01)
+    stats = broadcaster.stats()
+    await broadcaster.close()
+    return {
+        "publish_ms_total": round(publish_time * 1000, 2),
+        "healthy_clients": latency_summary(sent_at, fast),
+        "slow_clients": latency_summary(sent_at, slow),
+        "connections_left": stats["connections"],
+        "dropped": stats["dropped"],
+        "merged": stats["merged"],
+    }
+
+
+async def run_sequential(args):
+    """the old ConnectionManager: await every socket in turn for every message"""
+    sockets = [SimulatedSocket(delay=args.slow_delay if i < args.slow else 0.0) for i in range(args.clients)]
+    sent_at = {}
+    start = time.perf_counter()
+    # every slow client delays everyone, so only a few messages are sent this way
+    for i in range(min(args.messages, args.sequential_messages)):
+        sent_at[i] = time.perf_counter()
+        text = json.dumps(make_message(i, args.projects, args.files))
+        for sock in sockets:
+            await sock.send_text(text)
+        if args.interval:
+            await asyncio.sleep(args.interval)
+    return {
+        "publish_ms_total": round((time.perf_counter() - start) * 1000, 2),
+        "healthy_clients": latency_summary(sent_at, sockets[args.slow:]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket fan-out load test with simulated sockets")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--slow", type=int, default=25, help="clients that take --slow-delay per send")
+    parser.add_argument("--dead", type=int, default=10, help="clients whose sends fail")
+    parser.add_argument("--slow-delay", type=float, default=0.05)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.001, help="seconds between published messages")
+    parser.add_argument("--projects", type=int, default=4)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--queue-size", type=int, default=64)
+    parser.add_argument("--topics", action="store_true", help="subscribe each client to one project")
+    parser.add_argument("--sequential-messages", type=int, default=5, help="messages sent through the old sequential loop")
+    parser.add_argument("--skip-sequential", action="store_true")
+    parser.add_argument("--output", help="write results as json to this file")
+    args = parser.parse_args()
+
+    results = {"config": vars(args), "broadcaster": asyncio.run(run_broadcaster(args))}
+    if not args.skip_sequential:
+        results["sequential"] = asyncio.run(run_sequential(args))
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
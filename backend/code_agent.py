@@ -1,9 +1,14 @@
-from SimpleAgent.SimpleAgent.litellm_interface import LitellmInterface
 import prompts
 import os
-import base64
-from PIL import Image
-import io
+import time
+from agent_pool import AgentPool
+from agent_developer_tools.utils import diff_utils
+from agent_developer_tools.utils.active_project_path import load_active_project_path
+from history_compactor import compact_history, message_tokens
+from project_digest import get_digest, DEFAULT_TOKEN_BUDGET as DIGEST_TOKEN_BUDGET
+from settings_store import settings_store
+import tracing
+from log_writer import log
 
 # notes:
 # MVP: agent only edits one file at a time (so no extra logic needed to apply edits, since each file edit is contained in one tool call)
@@ -21,18 +26,119 @@ system_message = prompts.code_agent_system_prompt
 # model = "anthropic/claude-sonnet-4-20250514"
 model = "openai/gpt-4.1"
 
-# Create the LitellmInterface instance
-bot = LitellmInterface(
-    name="Code Agent",
-    model=model,
-    system_role=system_message,
-    stream=True,
-    tools=Tools
-)
-
-def prompt_agent(prompt: str, image: str = None):
-    return bot.prompt(prompt, image=image)
-
-def reset_conversation():
-    bot.forget()
-    return bot.show_chat()
\ No newline at end of file
+def create_agent():
+    """Create a LitellmInterface instance for one session"""
+    # imported on first use (or by warm_up), litellm takes seconds to import
+    from SimpleAgent.SimpleAgent.litellm_interface import LitellmInterface
+    tracing.install_litellm_callback()
+    return LitellmInterface(
+        name="Code Agent",
+        model=model,
+        system_role=system_message,
+        stream=True,
+        tools=Tools
+    )
+
+# one agent per client session (and optionally per project), see agent_pool
+agent_pool = AgentPool(create_agent)
+
+DEFAULT_SESSION = "default"
+
+def warm_up():
+    """imports the model stack and builds a spare agent ahead of the first turn, returns seconds per step"""
+    timings = {}
+    started = time.perf_counter()
+    from SimpleAgent.SimpleAgent import litellm_interface  # noqa: F401
+    timings["import_agent_interface"] = round(time.perf_counter() - started, 3)
+    started = time.perf_counter()
+    agent_pool.prewarm(1)
+    timings["build_agent"] = round(time.perf_counter() - started, 3)
+    return timings
+
+# history size (estimated tokens) above which old turns are summarized
+HISTORY_TOKEN_BUDGET = 24000
+
+def _project_digest():
+    """digest of the active project to put in front of the prompt, None when disabled or unavailable"""
+    budget = settings_store.get_value("context_digest_tokens", DIGEST_TOKEN_BUDGET)
+    if not budget:
+        return None
+    try:
+        project_path = load_active_project_path()
+        return get_digest(project_path, budget) if project_path and os.path.isdir(project_path) else None
+    except Exception as e:
+        log.error(f"could not build project digest: {e}")
+        return None
+
+def _compact_after_turn(session, tokens_at_start, diff_stats, digest=None, messages_at_start=0):
+    """compacts the session's history between turns and records the turn's token accounting"""
+    messages = getattr(session.bot, "messages", None)
+    if messages is None:
+        return
+    round_trips_saved = digest.round_trips_saved(messages[messages_at_start:]) if digest else 0
+    try:
+        project_path = load_active_project_path()
+    except Exception:
+        project_path = None
+    tokens_at_end = message_tokens(messages)
+    accounting = compact_history(messages, project_path=project_path, token_budget=HISTORY_TOKEN_BUDGET)
+    accounting["tokens_added"] = tokens_at_end - tokens_at_start
+    accounting["diff_tokens_saved"] = diff_stats["tokens_saved"]
+    accounting["digest_tokens"] = digest.tokens if digest else 0
+    accounting["digest_round_trips_saved"] = round_trips_saved
+    session.turn_stats.append(accounting)
+    log.system(f"turn tokens: +{accounting['tokens_added']}, history {accounting['tokens_before']} -> {accounting['tokens_after']} after compaction", **accounting)
+    if digest:
+        log.system(f"project digest: {digest.tokens} tokens, ~{round_trips_saved} tool round trips saved")
+
+def prompt_agent(prompt: str, image: str = None, session_id: str = DEFAULT_SESSION, project_name: str = None):
+    session = agent_pool.acquire(session_id, project_name)
+    turn = None
+    try:
+        # turns in the same session run one at a time, other sessions are not blocked
+        with session.lock, tracing.span("prompt_agent", session=session_id, project=project_name) as turn:
+            tracing.metrics.inc("turns_total")
+            diff_utils.begin_turn()
+            tokens_at_start = message_tokens(getattr(session.bot, "messages", []))
+            messages_at_start = len(getattr(session.bot, "messages", []))
+            # front-load the project tree and small files so the agent doesn't spend round trips exploring
+            with tracing.span("project_digest"):
+                digest = _project_digest()
+            full_prompt = digest.wrap(prompt) if digest else prompt
+            try:
+                with tracing.span("llm:agent", model=model) as llm:
+                    def first_chunk(seconds):
+                        llm.set(time_to_first_chunk_ms=round(seconds * 1000, 1))
+                        tracing.metrics.observe("llm_time_to_first_token_seconds", seconds, call="agent", model=model)
+                    yield from tracing.timed_chunks(session.bot.prompt(full_prompt, image=image), first_chunk)
+            finally:
+                messages = getattr(session.bot, "messages", [])
+                # estimates: the history and prompt sent with the first request, what the turn added
+                llm.set(tokens_in=tokens_at_start + message_tokens([full_prompt]), tokens_out=message_tokens(messages[messages_at_start:]))
+                tracing.record_llm_call("agent", model, tokens_in=llm.attrs["tokens_in"], tokens_out=llm.attrs["tokens_out"])
+                stats = diff_utils.end_turn()
+                if stats["results"]:
+                    log.system(f"turn used diff tool results: ~{stats['tokens_saved']} tokens saved per later turn")
+                with tracing.span("compact_history"):
+                    _compact_after_turn(session, tokens_at_start, stats, digest, messages_at_start)
+    finally:
+        agent_pool.release(session)
+        if turn is not None:
+            try:
+                trace_path = tracing.dump_trace(turn, session_id)
+                if trace_path:
+                    log.system(f"turn trace written to {trace_path}")
+            except OSError as e:
+                log.error(f"could not write turn trace: {e}")
+
+def conversation_stats(session_id: str = DEFAULT_SESSION, project_name: str = None):
+    """per-turn token accounting of a session (most recent turns last)"""
+    session = agent_pool.sessions.get(agent_pool.make_key(session_id, project_name))
+    if session is None:
+        return []
+    return list(session.turn_stats)
+
+def reset_conversation(session_id: str = DEFAULT_SESSION, project_name: str = None):
+    if agent_pool.reset(session_id, project_name):
+        return f"Conversation reset for session {session_id}"
+    return f"No conversation for session {session_id}"
\ No newline at end of file
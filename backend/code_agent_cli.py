@@ -1,8 +1,6 @@
 from SimpleAgent.SimpleAgent.litellm_interface import LitellmInterface
 import os
-import base64
-from PIL import Image
-import io
+from image_preprocessor import preprocess_image, ImageError
 
 # notes:
 # MVP: agent only edits one file at a time (so no extra logic needed to apply edits, since each file edit is contained in one tool call)
@@ -55,11 +53,15 @@ while True:
     image_path = None
     if image_files:
         image_path = os.path.join(image_dir, image_files[0])
-        img = Image.open(image_path)
-        buffer = io.BytesIO()
-        img.convert('RGB').save(buffer, format='JPEG')
-        buffer.seek(0)
-        base64_image = base64.b64encode(buffer.read()).decode("utf-8")
+        with open(image_path, "rb") as f:
+            raw_image = f.read()
+        # Downscale and re-encode for the model's vision input (cached by content hash)
+        try:
+            processed = preprocess_image(raw_image)
+            base64_image = processed.base64
+            print(f"< image: {processed.original_bytes // 1024} KB -> {len(processed.data) // 1024} KB, ~{processed.tokens_saved} vision tokens saved >")
+        except ImageError as e:
+            print(f"< skipping image {image_files[0]}: {e} >")
         # Delete the image after processing
         os.remove(image_path)
 
@@ -0,0 +1,92 @@
+# event bus
+# purpose: in-process pub/sub for file change events
+# tool code publishes directly (no http loopback to our own server), main.py's ConnectionManager consumes.
+# rapid events with the same key (e.g. several writes to one file) are merged into one delivery
+# for coalesced subscribers. immediate subscribers see every event synchronously.
+
+import threading
+
+from log_writer import log
+
+
+class EventBus:
+    def __init__(self, coalesce_window=0.15):
+        """coalesce_window: seconds to wait for more events with the same key before delivering"""
+        self.coalesce_window = coalesce_window
+        self._subscribers = []
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback, coalesce=True):
+        """
+        registers callback(event). coalesced subscribers get at most one event per key per window,
+        immediate subscribers are called inside publish() on the publishing thread.
+        returns a function that removes the subscription.
+        """
+        entry = (callback, coalesce)
+        with self._lock:
+            self._subscribers.append(entry)
+
+        def unsubscribe():
+            with self._lock:
+                if entry in self._subscribers:
+                    self._subscribers.remove(entry)
+        return unsubscribe
+
+    def has_subscribers(self, coalesce=None):
+        """any subscribers, or only coalesced (coalesce=True) / immediate (coalesce=False) ones"""
+        return any(coalesce is None or flag == coalesce for _, flag in self._subscribers)
+
+    def publish(self, event, key=None):
+        """publishes an event (dict). events sharing a key within the window are merged, the latest one wins"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback, coalesce in subscribers:
+            if not coalesce:
+                self._deliver(callback, event)
+
+        if not any(coalesce for _, coalesce in subscribers):
+            return
+        if key is None or self.coalesce_window <= 0:
+            self._deliver_coalesced(event)
+            return
+
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None:
+                # a delivery for this key is already scheduled, just replace its event
+                pending["event"] = event
+                pending["merged"] += 1
+                return
+            self._pending[key] = {"event": event, "merged": 1}
+        timer = threading.Timer(self.coalesce_window, self._flush, args=(key,))
+        timer.daemon = True
+        timer.start()
+
+    def _flush(self, key):
+        with self._lock:
+            pending = self._pending.pop(key, None)
+        if pending is None:
+            return
+        event = dict(pending["event"])
+        if pending["merged"] > 1:
+            event["merged_count"] = pending["merged"]
+        self._deliver_coalesced(event)
+
+    def _deliver_coalesced(self, event):
+        with self._lock:
+            subscribers = [callback for callback, coalesce in self._subscribers if coalesce]
+        for callback in subscribers:
+            self._deliver(callback, event)
+
+    @staticmethod
+    def _deliver(callback, event):
+        try:
+            callback(event)
+        except Exception as e:
+            # a broken subscriber must never break the tool that published
+            log.error(f"Error delivering event {event.get('type')}: {e}")
+
+
+# shared bus for file change notifications
+file_events = EventBus()
@@ -0,0 +1,221 @@
+# history compactor
+# purpose: keep agent conversations small between turns
+# 1. file snapshots (read_file_tool results, full-file edit echoes) are stubbed once the file has changed,
+#    either because a later snapshot of the same file is in the history or because the file on disk differs
+# 2. screenshots and project digests from earlier turns are replaced with a placeholder
+# 3. once the history is over the token budget, the oldest turns are folded into a short summary
+# tool calls and their results are only ever removed together (whole turns), so the history stays valid.
+
+import json
+import os
+import re
+
+from agent_developer_tools.utils.diff_utils import content_hash, estimate_tokens
+
+SNAPSHOT_TOOLS = ("read_file_tool", "write_file_tool", "edit_file_tool")
+HASH_RE = re.compile(r"sha256 ([0-9a-f]{12})")
+# read_file_tool results that only hold part of the file (a line/byte range or an outline)
+PARTIAL_RE = re.compile(r"sha256 [0-9a-f]{12}; (?:lines|bytes|outline)")
+# results shorter than this aren't worth stubbing
+MIN_STUB_CHARS = 400
+# turns always kept verbatim at the end of the history
+KEEP_RECENT_TURNS = 4
+SUMMARY_PREFIX = "Summary of earlier conversation:"
+# project digest (see project_digest) in front of a user prompt
+DIGEST_RE = re.compile(r"<project_digest>.*?</project_digest>\n*", re.S)
+
+
+def message_tokens(messages):
+    return estimate_tokens(json.dumps(messages, default=str))
+
+
+def _text(content):
+    """text of a message content (str, or a list of parts for image messages)"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return ""
+
+
+def _field(obj, name, default=None):
+    """tool calls may be dicts or litellm objects"""
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+def _set_content(message, content):
+    if isinstance(message, dict):
+        message["content"] = content
+    else:
+        setattr(message, "content", content)
+
+
+def _tool_calls_by_id(messages):
+    calls = {}
+    for message in messages:
+        for call in _field(message, "tool_calls") or []:
+            function = _field(call, "function")
+            try:
+                arguments = json.loads(_field(function, "arguments") or "{}")
+            except (TypeError, ValueError):
+                arguments = {}
+            calls[_field(call, "id")] = (_field(function, "name"), arguments)
+    return calls
+
+
+def _file_key(arguments):
+    return os.path.normpath(os.path.join(arguments.get("file_path") or "", arguments.get("file_name") or ""))
+
+
+def _current_hash(project_path, file_key, cache):
+    if file_key not in cache:
+        try:
+            with open(os.path.join(project_path, file_key), "r") as f:
+                cache[file_key] = content_hash(f.read())
+        except (OSError, UnicodeDecodeError, TypeError):
+            cache[file_key] = None
+    return cache[file_key]
+
+
+def stub_stale_snapshots(messages, project_path=None):
+    """replaces superseded file snapshots with a short stub, returns how many were stubbed"""
+    calls = _tool_calls_by_id(messages)
+    snapshots = []
+    for index, message in enumerate(messages):
+        if _field(message, "role") != "tool":
+            continue
+        name, arguments = calls.get(_field(message, "tool_call_id"), (None, {}))
+        if name not in SNAPSHOT_TOOLS:
+            continue
+        content = _text(_field(message, "content"))
+        match = HASH_RE.search(content)
+        snapshots.append((index, _file_key(arguments), name, match.group(1) if match else None, bool(PARTIAL_RE.search(content))))
+
+    stubbed = 0
+    disk_hashes = {}
+    for position, (index, file_key, name, snapshot_hash, _) in enumerate(snapshots):
+        content = _text(_field(messages[index], "content"))
+        if len(content) < MIN_STUB_CHARS:
+            continue
+        # superseded by a later version of the file, or by a later full copy of the same version
+        # (other ranges of the same version stay, they don't repeat each other)
+        stale = any(
+            later_key == file_key and (later_hash != snapshot_hash or snapshot_hash is None or not later_partial)
+            for _, later_key, _, later_hash, later_partial in snapshots[position + 1:]
+        )
+        if not stale and project_path and snapshot_hash:
+            stale = _current_hash(project_path, file_key, disk_hashes) != snapshot_hash
+        if stale:
+            version = f" (sha256 {snapshot_hash})" if snapshot_hash else ""
+            _set_content(messages[index], (
+                f"[{name} result for {file_key}{version} removed: the file has changed since, "
+                f"read it again if you need its contents]"
+            ))
+            stubbed += 1
+    return stubbed
+
+
+def strip_old_images(messages, keep_from):
+    """replaces image parts of messages before index keep_from with a text placeholder"""
+    stripped = 0
+    for message in messages[:keep_from]:
+        content = _field(message, "content")
+        if not isinstance(content, list):
+            continue
+        parts = []
+        for part in content:
+            if isinstance(part, dict) and part.get("type") == "image_url":
+                parts.append({"type": "text", "text": "[screenshot from an earlier turn removed]"})
+                stripped += 1
+            else:
+                parts.append(part)
+        _set_content(message, parts)
+    return stripped
+
+
+def strip_old_digests(messages, keep_from):
+    """drops the project digest from user messages before index keep_from (each turn gets a fresh one)"""
+    stripped = 0
+    for message in messages[:keep_from]:
+        if _field(message, "role") != "user":
+            continue
+        content = _field(message, "content")
+        if isinstance(content, str) and DIGEST_RE.search(content):
+            _set_content(message, DIGEST_RE.sub("[project digest from an earlier turn removed]\n\n", content))
+            stripped += 1
+        elif isinstance(content, list):
+            for part in content:
+                if isinstance(part, dict) and part.get("type") == "text" and DIGEST_RE.search(part.get("text", "")):
+                    part["text"] = DIGEST_RE.sub("[project digest from an earlier turn removed]\n\n", part["text"])
+                    stripped += 1
+    return stripped
+
+
+def _turn_starts(messages):
+    return [i for i, m in enumerate(messages) if _field(m, "role") == "user"]
+
+
+def _summarize(turn_messages, calls):
+    """extractive summary of old turns: what was asked, which files were touched, what was answered"""
+    lines = []
+    for message in turn_messages:
+        role = _field(message, "role")
+        if role == "user":
+            lines.append(f"- user asked: {DIGEST_RE.sub('', _text(_field(message, 'content')))[:200]}")
+        elif role == "assistant":
+            text = _text(_field(message, "content")).strip()
+            touched = []
+            for call in _field(message, "tool_calls") or []:
+                name, arguments = calls.get(_field(call, "id"), (None, {}))
+                if name:
+                    touched.append(f"{name}({_file_key(arguments)})" if arguments.get("file_name") else name)
+            if touched:
+                lines.append(f"  agent used: {', '.join(touched)}")
+            if text:
+                lines.append(f"  agent replied: {text[:200]}")
+        elif role == "system" and _text(_field(message, "content")).startswith(SUMMARY_PREFIX):
+            lines.extend(_text(_field(message, "content")).splitlines()[1:])
+    return "\n".join([SUMMARY_PREFIX] + lines)
+
+
+def summarize_old_turns(messages, token_budget, keep_recent=KEEP_RECENT_TURNS):
+    """folds the oldest turns into a summary message until the history fits the budget, returns turns folded"""
+    starts = _turn_starts(messages)
+    if len(starts) <= keep_recent or message_tokens(messages) <= token_budget:
+        return 0
+    calls = _tool_calls_by_id(messages)
+    head = [m for m in messages[:starts[0]] if not _text(_field(m, "content")).startswith(SUMMARY_PREFIX)]
+    folded = 0
+    # fold one turn at a time until under budget, never touching the most recent turns
+    while folded < len(starts) - keep_recent:
+        folded += 1
+        cut = starts[folded]
+        summary = {"role": "system", "content": _summarize(messages[:cut], calls)}
+        candidate = head + [summary] + messages[cut:]
+        if message_tokens(candidate) <= token_budget:
+            break
+    messages[:] = candidate
+    return folded
+
+
+def compact_history(messages, project_path=None, token_budget=24000):
+    """
+    compacts messages in place between turns.
+    returns token accounting: tokens before/after, snapshots stubbed, images/digests stripped, turns summarized
+    """
+    tokens_before = message_tokens(messages)
+    stubbed = stub_stale_snapshots(messages, project_path)
+    starts = _turn_starts(messages)
+    images = strip_old_images(messages, starts[-1] if starts else 0)
+    digests = strip_old_digests(messages, starts[-1] if starts else 0)
+    summarized = summarize_old_turns(messages, token_budget)
+    return {
+        "tokens_before": tokens_before,
+        "tokens_after": message_tokens(messages),
+        "snapshots_stubbed": stubbed,
+        "images_stripped": images,
+        "digests_stripped": digests,
+        "turns_summarized": summarized,
+    }
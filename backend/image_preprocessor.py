@@ -0,0 +1,210 @@
+# image preprocessor
+# purpose: shrink annotated screenshots before they are sent to the model
+# browsers capture retina screenshots at full device resolution (several MB of base64), but the model's
+# vision input is resized to fit 2048x2048 and then to 768px on the short side anyway, billed per 512px tile.
+# images are validated, decoded, downscaled to that target and re-encoded as JPEG, and the result is cached
+# by a hash of the original so a re-sent screenshot costs nothing. everything here is blocking (PIL), the
+# endpoints call it through asyncio.to_thread. PIL is imported on the first image, not at startup.
+
+import base64
+import binascii
+import hashlib
+import io
+import math
+import threading
+from collections import OrderedDict
+
+from settings_store import settings_store
+
+# defaults, overridable in settings.json under "image_preprocessing"
+DEFAULT_MAX_LONG_SIDE = 2048
+DEFAULT_MAX_SHORT_SIDE = 768
+DEFAULT_QUALITY = 80
+# shrink up to this fraction more when that drops a whole row or column of tiles
+DEFAULT_TILE_SNAP = 0.2
+# larger uploads are rejected before decoding
+MAX_INPUT_BYTES = 20 * 1024 * 1024
+# decompression bomb guard (a 8k x 8k screenshot is ~67M)
+MAX_PIXELS = 80_000_000
+ALLOWED_FORMATS = ("PNG", "JPEG", "WEBP", "GIF", "BMP")
+# processed images kept in memory
+MAX_CACHED_IMAGES = 32
+# vision token estimate: a base cost plus a cost per 512px tile (high detail)
+BASE_TOKENS = 85
+TILE_TOKENS = 170
+TILE_SIZE = 512
+
+
+class ImageError(ValueError):
+    pass
+
+
+def vision_tokens(width, height):
+    """estimated vision tokens for an image of this size, after the model's own resizing"""
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return BASE_TOKENS + TILE_TOKENS * math.ceil(width / TILE_SIZE) * math.ceil(height / TILE_SIZE)
+
+
+class ProcessedImage:
+    def __init__(self, data, width, height, original_bytes, original_size, cached=False):
+        self.data = data  # jpeg bytes
+        self.width = width
+        self.height = height
+        self.original_bytes = original_bytes
+        self.original_size = original_size  # (width, height)
+        self.cached = cached
+
+    @property
+    def base64(self):
+        return base64.b64encode(self.data).decode("utf-8")
+
+    @property
+    def bytes_saved(self):
+        return max(self.original_bytes - len(self.data), 0)
+
+    @property
+    def tokens_saved(self):
+        return max(vision_tokens(*self.original_size) - vision_tokens(self.width, self.height), 0)
+
+    def summary(self):
+        return {
+            "original_bytes": self.original_bytes,
+            "bytes": len(self.data),
+            "original_size": list(self.original_size),
+            "size": [self.width, self.height],
+            "bytes_saved": self.bytes_saved,
+            "tokens": vision_tokens(self.width, self.height),
+            "tokens_saved": self.tokens_saved,
+            "cached": self.cached,
+        }
+
+
+def _decode_base64(image):
+    """raw bytes of a base64 image, with or without a data: url prefix"""
+    if image.startswith("data:"):
+        image = image.partition(",")[2]
+    if len(image) > MAX_INPUT_BYTES * 4 // 3 + 4:
+        raise ImageError(f"Image is larger than {MAX_INPUT_BYTES // (1024 * 1024)} MB")
+    try:
+        return base64.b64decode(image, validate=True)
+    except (binascii.Error, ValueError):
+        raise ImageError("Image is not valid base64")
+
+
+def _target_size(width, height, max_long_side, max_short_side, tile_snap=0):
+    scale = min(1.0, max_long_side / max(width, height), max_short_side / min(width, height))
+    # an image just over a tile boundary pays for a mostly empty row/column of tiles, fit it to one less
+    snapped = 1.0
+    for side in (width * scale, height * scale):
+        tiles = math.ceil(side / TILE_SIZE)
+        if tiles > 1:
+            fit = (tiles - 1) * TILE_SIZE / side
+            if fit >= 1 - tile_snap and (snapped == 1.0 or fit > snapped):
+                snapped = fit
+    scale *= snapped
+    return max(1, math.floor(width * scale)), max(1, math.floor(height * scale))
+
+
+def _process(raw, max_long_side, max_short_side, quality, tile_snap):
+    from PIL import Image
+    try:
+        with Image.open(io.BytesIO(raw)) as img:
+            if img.format not in ALLOWED_FORMATS:
+                raise ImageError(f"Unsupported image format {img.format}")
+            if img.width * img.height > MAX_PIXELS:
+                raise ImageError(f"Image is too large ({img.width}x{img.height})")
+            original_size = img.size
+            size = _target_size(*original_size, max_long_side, max_short_side, tile_snap)
+            if img.format == "JPEG" and size == original_size:
+                # already a jpeg at the target size, re-encoding would only lose quality
+                return ProcessedImage(raw, size[0], size[1], len(raw), original_size)
+            # jpegs can be decoded at a reduced scale, much cheaper than resizing the full image
+            img.draft("RGB", size)
+            img.load()
+            if img.mode in ("RGBA", "LA", "P"):
+                # flatten transparency onto white, like the page behind the screenshot
+                img = img.convert("RGBA")
+                background = Image.new("RGB", img.size, (255, 255, 255))
+                background.paste(img, mask=img.getchannel("A"))
+                img = background
+            elif img.mode != "RGB":
+                img = img.convert("RGB")
+            if img.size != size:
+                img = img.resize(size, Image.LANCZOS)
+            buffer = io.BytesIO()
+            img.save(buffer, format="JPEG", quality=quality, optimize=True)
+    except ImageError:
+        raise
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise ImageError(f"Could not decode image: {e}")
+    return ProcessedImage(buffer.getvalue(), size[0], size[1], len(raw), original_size)
+
+
+class ImagePreprocessor:
+    def __init__(self, max_cached=MAX_CACHED_IMAGES):
+        self.max_cached = max_cached
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._totals = {"images": 0, "cache_hits": 0, "rejected": 0, "bytes_saved": 0, "tokens_saved": 0}
+
+    def _options(self):
+        options = settings_store.get_value("image_preprocessing", None) or {}
+        return (
+            int(options.get("max_long_side", DEFAULT_MAX_LONG_SIDE)),
+            int(options.get("max_short_side", DEFAULT_MAX_SHORT_SIDE)),
+            int(options.get("quality", DEFAULT_QUALITY)),
+            float(options.get("tile_snap", DEFAULT_TILE_SNAP)),
+        )
+
+    def process(self, image):
+        """
+        image: base64 string (or data: url) or raw bytes. returns a ProcessedImage
+        raises ImageError for anything that isn't a valid, reasonably sized image
+        """
+        try:
+            raw = image if isinstance(image, (bytes, bytearray)) else _decode_base64(image)
+            if len(raw) > MAX_INPUT_BYTES:
+                raise ImageError(f"Image is larger than {MAX_INPUT_BYTES // (1024 * 1024)} MB")
+        except ImageError:
+            self._count(rejected=1)
+            raise
+        options = self._options()
+        key = (hashlib.sha256(raw).hexdigest(), options)
+        with self._lock:
+            processed = self._cache.get(key)
+            if processed is not None:
+                self._cache.move_to_end(key)
+        if processed is not None:
+            self._count(images=1, cache_hits=1, bytes_saved=processed.bytes_saved, tokens_saved=processed.tokens_saved)
+            return ProcessedImage(processed.data, processed.width, processed.height, processed.original_bytes, processed.original_size, cached=True)
+        try:
+            processed = _process(bytes(raw), *options)
+        except ImageError:
+            self._count(rejected=1)
+            raise
+        with self._lock:
+            self._cache[key] = processed
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        self._count(images=1, bytes_saved=processed.bytes_saved, tokens_saved=processed.tokens_saved)
+        return processed
+
+    def _count(self, **amounts):
+        with self._lock:
+            for name, amount in amounts.items():
+                self._totals[name] += amount
+
+    def stats(self):
+        with self._lock:
+            return dict(self._totals, cached=len(self._cache))
+
+
+image_preprocessor = ImagePreprocessor()
+
+
+def preprocess_image(image):
+    """shared preprocessor, returns a ProcessedImage (see ImagePreprocessor.process)"""
+    return image_preprocessor.process(image)
@@ -0,0 +1,223 @@
+# log writer
+# purpose: structured backend logs that cost the request path almost nothing
+# callers only check the level's flag and put the record on a bounded queue, a background thread does the
+# formatting, console printing and file writing. flags come from the "logging" section of settings.json:
+# print_<level>_logs for the console, write_to_file for logs/backend.jsonl (one json object per line).
+# long values are cut down to a head plus their length and hash, debug records are sampled, and the file
+# is rotated by size and age with only the newest rotated files kept, so disk use stays bounded.
+# when the queue is full records are dropped (and counted) rather than blocking a turn.
+
+import datetime
+import glob
+import hashlib
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+from settings_store import settings_store
+
+LOG_DIR = "logs"
+LOG_NAME = "backend"
+# defaults, overridable in settings.json under "logging"
+DEFAULT_MAX_FILE_MB = 5
+DEFAULT_MAX_FILE_AGE_HOURS = 24
+DEFAULT_MAX_FILES = 10
+DEFAULT_MAX_FIELD_CHARS = 2000
+DEFAULT_DEBUG_SAMPLE_RATE = 0.1
+QUEUE_SIZE = 10000
+# head of a truncated value kept in the log
+TRUNCATED_HEAD_CHARS = 200
+
+
+def _options():
+    return settings_store.get_value("logging", None) or {}
+
+
+def truncate(value, max_chars):
+    """value, or for long strings (and anything that serializes long) a head with its length and sha256"""
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    if len(text) <= max_chars:
+        return value
+    return {
+        "truncated": True,
+        "length": len(text),
+        "sha256": hashlib.sha256(text.encode("utf-8", errors="replace")).hexdigest()[:16],
+        "head": text[:TRUNCATED_HEAD_CHARS],
+    }
+
+
+class LogWriter:
+    def __init__(self, log_dir=LOG_DIR, name=LOG_NAME, queue_size=QUEUE_SIZE):
+        self.log_dir = log_dir
+        self.name = name
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.counters = {"enqueued": 0, "written": 0, "printed": 0, "dropped": 0, "sampled_out": 0, "bytes_written": 0, "rotations": 0}
+        self._file = None
+        self._file_opened_at = 0.0
+        self._thread = None
+        self._lock = threading.Lock()
+        # counters are bumped from request, tool and writer threads
+        self._counters_lock = threading.Lock()
+
+    @property
+    def path(self):
+        return os.path.join(self.log_dir, f"{self.name}.jsonl")
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="log_writer", daemon=True)
+                self._thread.start()
+
+    def _count(self, name, amount=1):
+        with self._counters_lock:
+            self.counters[name] += amount
+
+    def log(self, level, message, **fields):
+        """queues a record if the level is printed or written, fields are serialized on the writer thread"""
+        options = _options()
+        printed = options.get(f"print_{level}_logs", level != "debug")
+        if not printed and not options.get("write_to_file", False):
+            return
+        if level == "debug" and random.random() >= options.get("debug_sample_rate", DEFAULT_DEBUG_SAMPLE_RATE):
+            self._count("sampled_out")
+            return
+        record = (time.time(), level, message, dict(fields), threading.current_thread().name)
+        try:
+            self.queue.put_nowait(record)
+            self._count("enqueued")
+        except queue.Full:
+            self._count("dropped")
+        if self._thread is None:
+            self._start()
+
+    def system(self, message, **fields):
+        self.log("system", message, **fields)
+
+    def debug(self, message, **fields):
+        self.log("debug", message, **fields)
+
+    def error(self, message, **fields):
+        self.log("error", message, **fields)
+
+    def llm(self, message, **fields):
+        self.log("llm", message, **fields)
+
+    def tool(self, message, **fields):
+        self.log("tool", message, **fields)
+
+    def _run(self):
+        while True:
+            record = self.queue.get()
+            if record is None:
+                self._close_file()
+                self.queue.task_done()
+                return
+            batch = [record]
+            # drain what else is waiting, one settings read and one flush per batch
+            while len(batch) < 500:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is None:
+                    self.queue.put(None)
+                    self.queue.task_done()
+                    break
+                batch.append(record)
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                print(f"< log writer failed: {e} >")
+            for _ in batch:
+                self.queue.task_done()
+
+    def _write_batch(self, batch):
+        options = _options()
+        max_chars = options.get("max_field_chars", DEFAULT_MAX_FIELD_CHARS)
+        lines = []
+        for timestamp, level, message, fields, thread in batch:
+            if options.get(f"print_{level}_logs", level != "debug"):
+                stamp = datetime.datetime.fromtimestamp(timestamp).strftime("%H:%M:%S")
+                shown = message if len(message) <= max_chars else message[:TRUNCATED_HEAD_CHARS] + f"... ({len(message)} chars)"
+                print(f"[{stamp}] <{level}> {shown}")
+                self._count("printed")
+            if options.get("write_to_file", False):
+                entry = {
+                    "ts": datetime.datetime.fromtimestamp(timestamp).isoformat(timespec="milliseconds"),
+                    "level": level,
+                    "msg": truncate(message, max_chars),
+                    "thread": thread,
+                }
+                for key, value in fields.items():
+                    entry[key] = truncate(value, max_chars)
+                lines.append(json.dumps(entry, default=str))
+        if lines:
+            self._append(lines, options)
+
+    def _append(self, lines, options):
+        max_bytes = options.get("max_file_mb", DEFAULT_MAX_FILE_MB) * 1024 * 1024
+        max_age = options.get("max_file_age_hours", DEFAULT_MAX_FILE_AGE_HOURS) * 3600
+        if self._file is None:
+            os.makedirs(self.log_dir, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+            # age counts from the file's first record, also across restarts
+            self._file_opened_at = self._first_record_time() if self._file.tell() else time.time()
+        if self._file.tell() >= max_bytes or time.time() - self._file_opened_at >= max_age:
+            self._rotate(options.get("max_files", DEFAULT_MAX_FILES))
+        data = "\n".join(lines) + "\n"
+        self._file.write(data)
+        self._file.flush()
+        self._count("written", len(lines))
+        self._count("bytes_written", len(data))
+
+    def _first_record_time(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return datetime.datetime.fromisoformat(json.loads(f.readline())["ts"]).timestamp()
+        except (OSError, ValueError, KeyError, TypeError):
+            return time.time()
+
+    def _rotate(self, max_files):
+        self._close_file()
+        stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        os.replace(self.path, os.path.join(self.log_dir, f"{self.name}_{stamp}.jsonl"))
+        self._count("rotations")
+        rotated = sorted(glob.glob(os.path.join(self.log_dir, f"{self.name}_*.jsonl")))
+        for old in rotated[:max(len(rotated) - max_files, 0)]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._file_opened_at = time.time()
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def flush(self, timeout=5):
+        """waits until everything queued so far is written (for shutdown and tests)"""
+        deadline = time.time() + timeout
+        while self.queue.unfinished_tasks and time.time() < deadline:
+            time.sleep(0.01)
+
+    def close(self, timeout=5):
+        if self._thread is not None and self._thread.is_alive():
+            self.flush(timeout)
+            self.queue.put(None)
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._counters_lock:
+            counters = dict(self.counters)
+        return dict(counters, queued=self.queue.qsize(), file=self.path)
+
+
+log = LogWriter()
@@ -1,46 +1,125 @@
 # main 
 # purpose: interface for frontend to interact with code agent
 
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+# time the imports below (and the warm-up's), see /startup_profile
+import startup_profile
+startup_profile.install()
+
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 import uvicorn
 import os
 import asyncio
 import json
-from fastapi.responses import StreamingResponse
-from code_agent import prompt_agent, reset_conversation
-from project_manager import create_project, list_projects, delete_project
+from typing import List
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
+from code_agent import prompt_agent, reset_conversation, conversation_stats, agent_pool, warm_up, DEFAULT_SESSION
+from project_manager import create_project, create_projects, list_projects, list_templates, delete_project, sync_registry, mark_project_opened, refresh_project_stats, start_reclaimer, pending_reclaims, DEFAULT_TEMPLATE
+from streaming_engine import StreamingEngine
+from event_bus import file_events
+from settings_store import settings_store
+from agent_developer_tools.utils.diff_utils import savings_totals
+from agent_developer_tools.utils.content_cache import content_cache
+from project_assets import router as project_assets_router
+from snapshot_store import SnapshotStore
+from ws_broadcaster import Broadcaster
+from image_preprocessor import preprocess_image, image_preprocessor, ImageError
+import tracing
+from log_writer import log
 import datetime
 
-print("< starting backend... >")
+startup_profile.mark("imports_done")
+log.system("starting backend")
 app = FastAPI()
 
 # Project environment path
 PROJECT_ENV_PATH = "/Users/coltonkirsten/Desktop/SeniorThesis/SimpleAgent-coder/backend/project_env"
 
-# WebSocket connection manager for notifications
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
+# WebSocket notifications: per-client bounded queues, sent concurrently (see ws_broadcaster)
+manager = Broadcaster()
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
+@app.on_event("shutdown")
+async def close_websockets():
+    await manager.close()
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+@app.on_event("startup")
+async def subscribe_file_events():
+    """Forward in-process file change events from the tools to WebSocket clients"""
+    loop = asyncio.get_running_loop()
 
-    async def send_notification(self, message: dict):
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(json.dumps(message))
-            except:
-                # Remove disconnected connections
-                self.active_connections.remove(connection)
+    def forward(event):
+        # events are published from worker threads, hop onto the event loop to queue them
+        loop.call_soon_threadsafe(manager.publish, event)
+
+    file_events.subscribe(forward)
+
+# Readiness: the server answers (liveness) right away, the registry sync and agent warm-up run in the background
+readiness = {"registry": False, "agent": False, "errors": {}, "warm_up": None}
+registry_sync_task = None
+
+async def _sync_registry_in_background():
+    """Import projects.json once and reconcile the project registry with project_env (off the event loop)"""
+    try:
+        result = await asyncio.to_thread(sync_registry)
+        readiness["registry"] = True
+        log.system("project registry synced", result=result)
+    except Exception as e:
+        readiness["errors"]["registry"] = str(e)
+        log.error(f"project registry sync failed: {e}")
+
+async def _warm_up_in_background():
+    """Import the model stack and build a spare agent so the first turn doesn't pay for it"""
+    try:
+        readiness["warm_up"] = await asyncio.to_thread(warm_up)
+        readiness["agent"] = True
+    except Exception as e:
+        readiness["errors"]["agent"] = f"{type(e).__name__}: {e}"
+        log.error(f"agent warm-up failed: {e}")
+
+@app.on_event("startup")
+async def start_background_startup():
+    global registry_sync_task
+    startup_profile.mark("app_started")
+    registry_sync_task = asyncio.create_task(_sync_registry_in_background())
+    warm_up_task = asyncio.create_task(_warm_up_in_background())
+
+    async def mark_ready():
+        await asyncio.gather(registry_sync_task, warm_up_task)
+        ready = readiness["registry"] and readiness["agent"]
+        startup_profile.mark("ready" if ready else "startup_failed")
+        startup_profile.stop()
+        profile = startup_profile.report(top=5)
+        if ready:
+            log.system(f"backend ready after {profile['phases_s'].get('ready')}s", **profile)
+        else:
+            log.error(f"backend startup finished with errors after {profile['phases_s'].get('startup_failed')}s, /ready stays 503",
+                      errors=readiness["errors"], **profile)
+
+    asyncio.create_task(mark_ready())
+
+# Per-turn project checkpoints (content-addressed, see snapshot_store)
+snapshot_store = SnapshotStore(os.path.join(PROJECT_ENV_PATH, ".snapshots"), PROJECT_ENV_PATH)
+
+@app.on_event("startup")
+async def start_project_reclaimer():
+    """Remove deleted projects' folders (and their snapshots) in the background"""
+    start_reclaimer(on_reclaimed=snapshot_store.delete_project_snapshots)
+
+# runs agent turns on worker threads so streaming doesn't block the event loop
+stream_engine = StreamingEngine()
 
-manager = ConnectionManager()
+@app.on_event("shutdown")
+def shutdown_stream_engine():
+    stream_engine.shutdown()
+
+@app.on_event("shutdown")
+def close_log_writer():
+    """Write out the queued log records"""
+    log.close()
+
+# Project files for the preview, served from one persistent route (/projects/{name}/...)
+app.include_router(project_assets_router)
 
 # Allow CORS for frontend
 app.add_middleware(
@@ -54,9 +133,23 @@ app.add_middleware(
 class Prompt(BaseModel):
     prompt: str
     image: str = None  # Optional base64 image
+    project_name: str = None  # Optional, binds the conversation to this project
+
+# Each client gets its own agent, identified by header or cookie
+SESSION_HEADER = "X-Session-Id"
+SESSION_COOKIE = "session_id"
+
+def get_session_id(request: Request):
+    """Session id from the X-Session-Id header or session_id cookie, clients that send neither share the default session"""
+    return request.headers.get(SESSION_HEADER) or request.cookies.get(SESSION_COOKIE) or DEFAULT_SESSION
 
 class ProjectCreate(BaseModel):
     project_name: str
+    template: str = DEFAULT_TEMPLATE
+
+class ProjectBatchCreate(BaseModel):
+    project_names: List[str]
+    template: str = DEFAULT_TEMPLATE
 
 class ProjectDelete(BaseModel):
     full_project_name: str
@@ -67,6 +160,12 @@ class ProjectContent(BaseModel):
 class SetActiveProject(BaseModel):
     full_project_name: str
 
+class RestoreSnapshot(BaseModel):
+    snapshot_id: str
+
+class TracingOptions(BaseModel):
+    dump_turns: bool
+
 class NotificationData(BaseModel):
     type: str
     file_path: str = None
@@ -75,33 +174,65 @@ class NotificationData(BaseModel):
     timestamp: str = None
 
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, project: str = None):
+    """Notifications for all projects, or only one with ?project=<name> (or a subscribe message)"""
+    client = await manager.connect(websocket, project=project)
     try:
         while True:
-            # Keep connection alive
-            await websocket.receive_text()
+            manager.handle_client_message(client, await websocket.receive_text())
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        pass
+    finally:
+        manager.disconnect(client)
+
+@app.get("/ws_stats")
+async def ws_stats_endpoint():
+    """Per-connection queue depth, drops/merges and send lag of the WebSocket notifications"""
+    return manager.stats()
 
 @app.post("/prompt_agent_stream")
-async def send_message_stream(payload: Prompt):
+async def send_message_stream(payload: Prompt, request: Request):
+    session_id = get_session_id(request)
+
+    # Downscale and re-encode the screenshot off the event loop, rejecting bad images before streaming starts
+    image = None
+    if payload.image:
+        try:
+            processed = await asyncio.to_thread(preprocess_image, payload.image)
+        except ImageError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        image = processed.base64
+        log.system(f"image: {processed.original_bytes // 1024} KB -> {len(processed.data) // 1024} KB, ~{processed.tokens_saved} vision tokens saved", **processed.summary())
+
     async def generate():
-        # Use generator from LitellmInterface
-        for chunk in prompt_agent(payload.prompt, image=payload.image):
+        # Checkpoint the active project before the agent touches it, so the turn can be reverted
+        turn_project_path = settings_store.get_value("active_project_path", "")
+        if turn_project_path:
+            try:
+                await asyncio.to_thread(snapshot_store.take_snapshot, os.path.basename(turn_project_path), payload.prompt[:80])
+            except Exception as e:
+                log.error(f"could not snapshot project before turn: {e}", project=turn_project_path)
+        
+        # Use generator from LitellmInterface, run on a worker thread
+        async for chunk in stream_engine.stream(
+            lambda: prompt_agent(payload.prompt, image=image, session_id=session_id, project_name=payload.project_name),
+            is_disconnected=request.is_disconnected
+        ):
             yield chunk
+
+        # Client went away mid-turn, the turn was cancelled
+        if await request.is_disconnected():
+            return
         
         # Get current active project for notification
-        settings_path = "settings.json"
         active_project_name = None
-        try:
-            with open(settings_path, 'r', encoding='utf-8') as f:
-                settings = json.load(f)
-            active_project_path = settings.get("active_project_path", "")
-            if active_project_path:
-                active_project_name = os.path.basename(active_project_path)
-        except:
-            pass  # Fail silently if can't read settings
+        active_project_path = settings_store.get_value("active_project_path", "")
+        if active_project_path:
+            active_project_name = os.path.basename(active_project_path)
+        
+        # Files may have changed during the turn, keep the registry's size/file count current
+        if active_project_name:
+            await asyncio.to_thread(refresh_project_stats, active_project_name)
         
         # Send notification when streaming is complete with project info
         await manager.send_notification({
@@ -117,34 +248,125 @@ async def send_message_stream(payload: Prompt):
     )
 
 @app.get("/reset_conversation")
-async def reset_conversation_endpoint():
-    current = reset_conversation()
-    print(current)
+async def reset_conversation_endpoint(request: Request, project_name: str = None):
+    current = reset_conversation(get_session_id(request), project_name)
+    log.system(current)
     return {"message": "Conversation reset", "status": "success"}
 
+@app.get("/agent_pool_stats")
+async def agent_pool_stats_endpoint():
+    """Session counts, history memory use and hit/eviction counters of the agent pool"""
+    return agent_pool.stats()
+
+@app.get("/health")
+async def health_endpoint():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "alive"}
+
+@app.get("/ready")
+async def ready_endpoint():
+    """Readiness: project registry synced and the agent warmed up, 503 until then"""
+    ready = readiness["registry"] and readiness["agent"]
+    return JSONResponse({"ready": ready, **readiness}, status_code=200 if ready else 503)
+
+@app.get("/startup_profile")
+async def startup_profile_endpoint(top: int = 25):
+    """Startup phases from process start and the slowest imports"""
+    return startup_profile.report(top=top)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Latency histograms and counters of turns, tools, file io and notifications, in Prometheus text format"""
+    gauges = [
+        ("active_turns", "Agent turns streaming right now", stream_engine.active_turns),
+        ("agent_sessions", "Agent sessions in the pool", len(agent_pool.sessions)),
+        ("websocket_clients", "Connected WebSocket clients", len(manager.clients)),
+    ]
+    text = tracing.metrics.render()
+    for name, help_text, value in gauges:
+        text += f"# HELP {name} {help_text}\n# TYPE {name} gauge\n{name} {value}\n"
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+@app.get("/tracing")
+async def get_tracing_endpoint():
+    """Whether each turn's span tree is written to logs/traces/"""
+    return {"dump_turns": tracing.dump_enabled(), "trace_dir": tracing.TRACE_DIR}
+
+@app.post("/tracing")
+async def set_tracing_endpoint(payload: TracingOptions):
+    """Turns the per-turn trace dump on or off, takes effect from the next turn"""
+    options = dict(settings_store.get_value("tracing", None) or {}, dump_turns=payload.dump_turns)
+    await asyncio.to_thread(settings_store.update, tracing=options)
+    return {"dump_turns": payload.dump_turns, "trace_dir": tracing.TRACE_DIR}
+
+@app.get("/log_stats")
+async def log_stats_endpoint():
+    """Records queued, written, dropped and sampled out by the background log writer"""
+    return log.stats()
+
+@app.get("/image_stats")
+async def image_stats_endpoint():
+    """Screenshots preprocessed, cache hits and the bytes/vision tokens saved by downscaling"""
+    return image_preprocessor.stats()
+
+@app.get("/conversation_stats")
+async def conversation_stats_endpoint(request: Request, project_name: str = None):
+    """Per-turn token accounting (history size, compaction) for the caller's session"""
+    return {"turns": conversation_stats(get_session_id(request), project_name)}
+
+@app.get("/content_cache_stats")
+async def content_cache_stats_endpoint():
+    """Hit/miss/eviction counters and memory use of the project file content cache"""
+    return content_cache.stats()
+
+@app.get("/tool_result_stats")
+async def tool_result_stats_endpoint():
+    """Prompt tokens saved by returning diffs instead of full file contents from tools"""
+    return savings_totals()
+
 @app.post("/create_project")
 async def create_project_endpoint(payload: ProjectCreate):
-    """Create a new project"""
-    result = create_project(payload.project_name)
+    """Create a new project from a template"""
+    result = await asyncio.to_thread(create_project, payload.project_name, payload.template)
     
     if result.startswith("SUCCESS"):
         return {"status": "success", "message": result}
     else:
         raise HTTPException(status_code=400, detail=result)
 
+@app.post("/create_projects")
+async def create_projects_endpoint(payload: ProjectBatchCreate):
+    """Create several projects from the same template"""
+    results = await asyncio.to_thread(create_projects, payload.project_names, payload.template)
+    return {
+        "status": "success" if all(result.startswith("SUCCESS") for result in results) else "partial",
+        "results": results,
+    }
+
+@app.get("/list_templates")
+async def list_templates_endpoint():
+    """Templates new projects can be created from"""
+    return {"templates": list_templates(), "default": DEFAULT_TEMPLATE}
+
 @app.get("/list_projects")
-async def list_projects_endpoint():
-    """List all projects"""
-    projects = list_projects()
-    return {"projects": projects}
+async def list_projects_endpoint(offset: int = 0, limit: int = None, sort: str = "created_at", order: str = "asc", prefix: str = None, details: bool = False):
+    """List projects, optionally paginated, sorted and filtered by name prefix"""
+    # right after startup the registry may still be syncing with project_env
+    if registry_sync_task is not None and not registry_sync_task.done():
+        await asyncio.shield(registry_sync_task)
+    try:
+        projects, total = list_projects(offset=offset, limit=limit, sort=sort, order=order, prefix=prefix, details=details)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"projects": projects, "total": total}
 
 @app.delete("/delete_project")
 async def delete_project_endpoint(payload: ProjectDelete):
-    """Delete a project"""
-    result = delete_project(payload.full_project_name)
+    """Delete a project (its folder is removed in the background)"""
+    result = await asyncio.to_thread(delete_project, payload.full_project_name)
     
     if result.startswith("SUCCESS"):
-        return {"status": "success", "message": result}
+        return {"status": "success", "message": result, "pending_reclaims": pending_reclaims()}
     else:
         raise HTTPException(status_code=400, detail=result)
 
@@ -163,17 +385,10 @@ async def get_project_content_endpoint(payload: ProjectContent):
         raise HTTPException(status_code=404, detail="index.html not found in project")
     
     try:
-        with open(index_file, 'r', encoding='utf-8') as f:
-            html_content = f.read()
+        html_content = content_cache.read(index_file)
         
-        # Mount the project for static assets (CSS, JS, images)
+        # Static assets (CSS, JS, images) are served by the project assets router
         mount_path = f"/projects/{payload.full_project_name}"
-        try:
-            app.unmount(mount_path)
-        except:
-            pass  # Ignore if mount doesn't exist
-        
-        app.mount(mount_path, StaticFiles(directory=project_path, html=True), name=f"project_{payload.full_project_name}")
         
         return {
             "status": "success",
@@ -192,34 +407,10 @@ async def set_active_project_endpoint(payload: SetActiveProject):
     if not os.path.exists(project_path):
         raise HTTPException(status_code=404, detail="Project not found")
     
-    # Read current settings
-    settings_path = "settings.json"
-    try:
-        with open(settings_path, 'r', encoding='utf-8') as f:
-            settings = json.load(f)
-    except FileNotFoundError:
-        # If settings file doesn't exist, create default structure
-        settings = {
-            "logging": {
-                "print_system_logs": True,
-                "print_debug_logs": False,
-                "print_error_logs": True,
-                "print_llm_logs": True,
-                "print_tool_logs": True,
-                "write_to_file": False
-            },
-            "active_project_path": ""
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error reading settings: {str(e)}")
-    
-    # Update the active project path
-    settings["active_project_path"] = project_path
-    
-    # Write updated settings back to file
+    # Update the active project path, written atomically (creates settings.json from defaults if missing)
     try:
-        with open(settings_path, 'w', encoding='utf-8') as f:
-            json.dump(settings, f, indent=2)
+        settings_store.update(active_project_path=project_path)
+        mark_project_opened(payload.full_project_name)
         
         return {
             "status": "success",
@@ -232,10 +423,8 @@ async def set_active_project_endpoint(payload: SetActiveProject):
 @app.get("/get_active_project")
 async def get_active_project_endpoint():
     """Get the current active project from settings.json"""
-    settings_path = "settings.json"
     try:
-        with open(settings_path, 'r', encoding='utf-8') as f:
-            settings = json.load(f)
+        settings = settings_store.get()
         
         active_project_path = settings.get("active_project_path", "")
         
@@ -266,12 +455,41 @@ async def get_active_project_endpoint():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error reading settings: {str(e)}")
 
+@app.get("/snapshots/{full_project_name}")
+async def list_snapshots_endpoint(full_project_name: str):
+    """List a project's checkpoints, newest first"""
+    try:
+        snapshots = await asyncio.to_thread(snapshot_store.list_snapshots, full_project_name)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"status": "success", "snapshots": snapshots}
+
+@app.get("/snapshots/{full_project_name}/diff")
+async def diff_snapshots_endpoint(full_project_name: str, from_id: str, to_id: str = "current"):
+    """Files added/removed/modified between two checkpoints (to_id defaults to the current project files)"""
+    try:
+        diff = await asyncio.to_thread(snapshot_store.diff, full_project_name, from_id, to_id)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"status": "success", **diff}
+
+@app.post("/snapshots/{full_project_name}/restore")
+async def restore_snapshot_endpoint(full_project_name: str, payload: RestoreSnapshot):
+    """Revert a project to a checkpoint (the current state is checkpointed first so it can be undone)"""
+    try:
+        result = await asyncio.to_thread(snapshot_store.restore, full_project_name, payload.snapshot_id)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error restoring snapshot: {str(e)}")
+    return {"status": "success", **result}
+
 @app.post("/notify_file_change")
 async def notify_file_change(notification: NotificationData):
-    """Endpoint to receive file change notifications and broadcast to WebSocket clients"""
+    """Fallback for out-of-process tools: receive file change notifications and broadcast to WebSocket clients"""
     await manager.send_notification(notification.dict())
     return {"status": "notification_sent"}
 
 if __name__ == "__main__":
-    print("< backend starting ... >")
+    log.system("backend starting")
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,158 @@
+# project assets
+# purpose: serve project files for the preview from one persistent /projects/{name}/... route
+# replaces mounting a new StaticFiles app per project on every /get_project_content call.
+# files are resolved per request inside the project folder (path jail), responses carry ETag and
+# Last-Modified so browser revalidations get a 304, and gzip variants are cached in memory
+# until the file changes.
+
+import email.utils
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import RedirectResponse, Response
+
+from event_bus import file_events
+from project_manager import PROJECT_ENV_PATH
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/xml")
+# smaller responses aren't worth compressing
+MIN_GZIP_BYTES = 512
+ASSET_CACHE_BYTES = 16 * 1024 * 1024
+
+router = APIRouter()
+
+
+class AssetCache:
+    """LRU of file bytes + etag + gzip variant, valid while the file's mtime/size are unchanged"""
+
+    def __init__(self, max_bytes=ASSET_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # realpath -> dict
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, path, st):
+        with self._lock:
+            entry = self.entries.get(path)
+            if entry is not None and entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+                self.entries.move_to_end(path)
+                return entry
+        return None
+
+    def load(self, path, st, content_type):
+        with open(path, "rb") as f:
+            body = f.read()
+        gzipped = None
+        if len(body) >= MIN_GZIP_BYTES and content_type.startswith(COMPRESSIBLE_TYPES):
+            gzipped = gzip.compress(body, compresslevel=6)
+            if len(gzipped) >= len(body):
+                gzipped = None
+        entry = {
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+            "etag": '"' + hashlib.sha256(body).hexdigest()[:20] + '"',
+            "body": body,
+            "gzip": gzipped,
+            "cost": len(body) + (len(gzipped) if gzipped else 0),
+        }
+        with self._lock:
+            self._drop(path)
+            if entry["cost"] <= self.max_bytes // 4:
+                self.entries[path] = entry
+                self.total_bytes += entry["cost"]
+                while self.total_bytes > self.max_bytes:
+                    _, evicted = self.entries.popitem(last=False)
+                    self.total_bytes -= evicted["cost"]
+        return entry
+
+    def invalidate(self, path):
+        with self._lock:
+            self._drop(os.path.realpath(path))
+
+    def _drop(self, path):
+        old = self.entries.pop(path, None)
+        if old is not None:
+            self.total_bytes -= old["cost"]
+
+
+asset_cache = AssetCache()
+
+# drop cached variants as soon as the tools change a file
+file_events.subscribe(lambda event: event.get("type") == "file_changed" and asset_cache.invalidate(event["file_path"]), coalesce=False)
+
+
+def resolve_asset(project_name, asset_path):
+    """absolute path of a project file, refusing anything outside the project folder"""
+    # dot folders in project_env are internal (.snapshots, .trash, .creating_*), not projects
+    if not project_name or project_name.startswith("."):
+        raise HTTPException(status_code=404, detail="Project not found")
+    project_root = os.path.realpath(os.path.join(PROJECT_ENV_PATH, project_name))
+    if os.path.dirname(project_root) != os.path.realpath(PROJECT_ENV_PATH) or not os.path.isdir(project_root):
+        raise HTTPException(status_code=404, detail="Project not found")
+    path = os.path.realpath(os.path.join(project_root, asset_path))
+    if path != project_root and not path.startswith(project_root + os.sep):
+        raise HTTPException(status_code=404, detail="File not found")
+    if os.path.isdir(path):
+        path = os.path.join(path, "index.html")
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="File not found")
+    return path
+
+
+def _not_modified(request, etag, mtime_ns):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(mtime_ns // 1_000_000_000) <= since
+    return False
+
+
+@router.get("/projects/{project_name}")
+async def project_root_redirect(project_name: str):
+    # relative asset urls in index.html need the trailing slash
+    return RedirectResponse(url=f"/projects/{project_name}/")
+
+
+# a plain def, so fastapi runs it in its threadpool: stat, reading, hashing and gzipping a large
+# bundle must not block the event loop (websockets and turn streams)
+@router.api_route("/projects/{project_name}/{asset_path:path}", methods=["GET", "HEAD"])
+def serve_project_asset(project_name: str, asset_path: str, request: Request):
+    """Serve a project file with ETag/Last-Modified revalidation and cached gzip variants"""
+    path = resolve_asset(project_name, asset_path)
+    st = os.stat(path)
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    entry = asset_cache.get(path, st) or asset_cache.load(path, st, content_type)
+
+    last_modified = email.utils.formatdate(st.st_mtime, usegmt=True)
+    gzipped = entry["gzip"] is not None and "gzip" in request.headers.get("accept-encoding", "")
+    # each encoding is a different representation and needs its own strong etag
+    etag = entry["etag"][:-1] + '-gz"' if gzipped else entry["etag"]
+    headers = {
+        "ETag": etag,
+        "Last-Modified": last_modified,
+        # the preview must see edits right away, so always revalidate (cheap thanks to the 304)
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if _not_modified(request, etag, entry["mtime_ns"]):
+        return Response(status_code=304, headers=headers)
+
+    body = entry["body"]
+    if gzipped:
+        body = entry["gzip"]
+        headers["Content-Encoding"] = "gzip"
+    if request.method == "HEAD":
+        headers["Content-Length"] = str(len(body))
+        return Response(status_code=200, headers=headers, media_type=content_type)
+    return Response(content=body, headers=headers, media_type=content_type)
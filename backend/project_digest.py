@@ -0,0 +1,191 @@
+# project digest
+# purpose: front-load a compact picture of the active project into each turn
+# most turns start with list_project_directory_tool and read_file_tool on index.html/styles.css, each a
+# full model round trip. the digest has the file tree, the stylesheets and scripts index.html links,
+# small files in full and outlines (or the first lines) of bigger ones, within a token budget.
+# digests are cached by a signature of the project's files (path, size, mtime) and built from the
+# shared tree index and content cache, so an unchanged project costs a few stats per turn.
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from agent_developer_tools.utils.content_cache import content_cache
+from agent_developer_tools.utils.diff_utils import estimate_tokens, file_summary
+from agent_developer_tools.utils.outline import format_outline, outline, supports_outline
+from agent_developer_tools.utils.tree_index import get_tree_index
+
+DEFAULT_TOKEN_BUDGET = 1500
+# files up to this size are included whole (when they fit the budget)
+SMALL_FILE_CHARS = 3000
+HEAD_LINES = 20
+MAX_TREE_FILES = 150
+MAX_OUTLINE_ITEMS = 40
+TEXT_EXTENSIONS = (".html", ".htm", ".css", ".js", ".mjs", ".jsx", ".ts", ".tsx", ".json", ".md", ".txt", ".svg", ".xml")
+# digests kept in memory
+MAX_DIGESTS = 16
+
+
+class ProjectDigest:
+    def __init__(self, text, signature, full_files, outlined_files, includes_tree, entry_files=()):
+        self.text = text
+        self.signature = signature
+        # files included whole / as an outline (relative paths)
+        self.full_files = full_files
+        self.outlined_files = outlined_files
+        self.includes_tree = includes_tree
+        # index.html and the files it links, what a turn usually starts by reading
+        self.entry_files = [rel for rel in entry_files if rel in full_files]
+        self.tokens = estimate_tokens(text)
+
+    def wrap(self, prompt):
+        """the user's prompt with the digest in front"""
+        return f"<project_digest>\n{self.text}\n</project_digest>\n\n{prompt}"
+
+    def round_trips_saved(self, new_messages):
+        """
+        estimated tool calls the digest saved in a turn: the listing and the entry file reads it covers,
+        minus the ones the agent still made (new_messages: the messages the turn added)
+        """
+        covered = (1 if self.includes_tree else 0) + len(self.entry_files)
+        made = 0
+        for message in new_messages:
+            tool_calls = message.get("tool_calls") if isinstance(message, dict) else getattr(message, "tool_calls", None)
+            for call in tool_calls or []:
+                function = call["function"] if isinstance(call, dict) else call.function
+                name = function["name"] if isinstance(function, dict) else function.name
+                arguments = function["arguments"] if isinstance(function, dict) else function.arguments
+                if name == "list_project_directory_tool" and self.includes_tree:
+                    made += 1
+                elif name == "read_file_tool":
+                    try:
+                        arguments = json.loads(arguments or "{}")
+                    except (TypeError, ValueError):
+                        continue
+                    path = os.path.normpath(os.path.join(arguments.get("file_path") or "", arguments.get("file_name") or ""))
+                    if path.replace(os.sep, "/") in self.entry_files:
+                        made += 1
+        return max(covered - made, 0)
+
+
+def project_signature(project_path, files):
+    """hash of the project's file paths, sizes and mtimes"""
+    digest = hashlib.sha256()
+    for rel in files:
+        try:
+            st = os.stat(os.path.join(project_path, rel))
+        except OSError:
+            continue
+        digest.update(f"{rel}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _linked_files(index_html, files):
+    """local stylesheets and scripts linked from index.html, and a one line summary of the links"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(index_html, "html.parser")
+    stylesheets = [tag.get("href") for tag in soup.find_all("link") if "stylesheet" in (tag.get("rel") or []) and tag.get("href")]
+    scripts = [tag.get("src") for tag in soup.find_all("script") if tag.get("src")]
+    inline_scripts = len([tag for tag in soup.find_all("script") if not tag.get("src")])
+    title = soup.title.string.strip() if soup.title and soup.title.string else None
+    summary = []
+    if title:
+        summary.append(f"title: {title}")
+    summary.append(f"stylesheets: {', '.join(stylesheets) or 'none'}")
+    summary.append(f"scripts: {', '.join(scripts) or 'none'}" + (f" (+{inline_scripts} inline)" if inline_scripts else ""))
+    linked = []
+    for ref in stylesheets + scripts:
+        rel = os.path.normpath(ref.split("?")[0].split("#")[0]).replace(os.sep, "/").lstrip("/")
+        if rel in files and rel not in linked:
+            linked.append(rel)
+    return linked, "index.html links " + "; ".join(summary)
+
+
+def build_digest(project_path, token_budget=DEFAULT_TOKEN_BUDGET, files=None, signature=None):
+    if files is None:
+        files = get_tree_index(project_path).glob("*")
+    if signature is None:
+        signature = project_signature(project_path, files)
+    sizes = {}
+    for rel in files:
+        try:
+            sizes[rel] = os.path.getsize(os.path.join(project_path, rel))
+        except OSError:
+            sizes[rel] = 0
+
+    sections = []
+    used = 0
+
+    def add(section):
+        nonlocal used
+        cost = estimate_tokens(section) + 1
+        if used + cost > token_budget:
+            return False
+        sections.append(section)
+        used += cost
+        return True
+
+    add(f"Active project {os.path.basename(project_path)}, preloaded for this turn: you don't need to list the "
+        f"directory or read the files included in full below unless you change them.")
+    shown = files[:MAX_TREE_FILES]
+    tree = "Files:\n" + "\n".join(f"- {rel} ({sizes[rel]} bytes)" for rel in shown)
+    if len(files) > len(shown):
+        tree += f"\n- ... {len(files) - len(shown)} more files"
+    includes_tree = add(tree)
+
+    # index.html and what it links first, then the remaining files smallest first
+    order = []
+    if "index.html" in files:
+        order.append("index.html")
+        try:
+            linked, links = _linked_files(content_cache.read(os.path.join(project_path, "index.html")), set(files))
+            add(links)
+            order.extend(rel for rel in linked if rel not in order)
+        except (OSError, UnicodeDecodeError):
+            pass
+    entry_files = list(order)
+    order.extend(sorted((rel for rel in files if rel not in order), key=lambda rel: sizes[rel]))
+
+    full_files, outlined_files = [], []
+    for rel in order:
+        if not rel.lower().endswith(TEXT_EXTENSIONS):
+            continue
+        try:
+            text = content_cache.read(os.path.join(project_path, rel))
+        except (OSError, UnicodeDecodeError):
+            continue
+        if len(text) <= SMALL_FILE_CHARS and add(f"=== {file_summary(rel, text)} (full) ===\n{text}"):
+            full_files.append(rel)
+            continue
+        items = outline(rel, text) if supports_outline(rel) else []
+        if items and add(f"=== {file_summary(rel, text)} (outline, line: item) ===\n{format_outline(items, MAX_OUTLINE_ITEMS)}"):
+            outlined_files.append(rel)
+            continue
+        head = "\n".join(text.splitlines()[:HEAD_LINES])
+        if add(f"=== {file_summary(rel, text)} (first {HEAD_LINES} lines) ===\n{head}"):
+            outlined_files.append(rel)
+    return ProjectDigest("\n\n".join(sections), signature, full_files, outlined_files, includes_tree, entry_files)
+
+
+_digests = OrderedDict()
+_digests_lock = threading.Lock()
+
+
+def get_digest(project_path, token_budget=DEFAULT_TOKEN_BUDGET):
+    """digest of the project, rebuilt only when its files changed"""
+    key = (os.path.realpath(project_path), token_budget)
+    files = get_tree_index(project_path).glob("*")
+    signature = project_signature(project_path, files)
+    with _digests_lock:
+        digest = _digests.get(key)
+        if digest is not None and digest.signature == signature:
+            _digests.move_to_end(key)
+            return digest
+    digest = build_digest(project_path, token_budget, files, signature)
+    with _digests_lock:
+        _digests[key] = digest
+        while len(_digests) > MAX_DIGESTS:
+            _digests.popitem(last=False)
+    return digest
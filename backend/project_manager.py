@@ -1,54 +1,147 @@
 # project manager
 # Functions:
 # create/init project with proper structure
-# list all projects
-# delete project
+# list all projects (paginated, from the sqlite registry)
+# create projects from templates (one or a batch)
+# delete project (tombstoned instantly, folder removed by a background worker)
 
 import os
-import json
+import queue
 import shutil
+import threading
+import time
 from datetime import datetime
+from project_registry import ProjectRegistry
+from log_writer import log
 
 # Project environment path
 PROJECT_ENV_PATH = "/Users/coltonkirsten/Desktop/SeniorThesis/SimpleAgent-coder/backend/project_env"
+# legacy project list, imported into the registry once
 PROJECTS_JSON_PATH = os.path.join(PROJECT_ENV_PATH, "projects.json")
+PROJECTS_DB_PATH = os.path.join(PROJECT_ENV_PATH, "projects.db")
+# deleted projects wait here until the reclaimer removes them (hidden, so never listed or indexed)
+TRASH_PATH = os.path.join(PROJECT_ENV_PATH, ".trash")
+# new projects are built in .creating_<name> and renamed into place, leftovers of a crash are removed once
+# they are older than this (so a create running in another process isn't touched)
+STAGING_PREFIX = ".creating_"
+STALE_STAGING_SECONDS = 600
+# one folder per template, files containing {{project_name}} get the project's name filled in
+TEMPLATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "project_templates")
+DEFAULT_TEMPLATE = "basic"
+TEMPLATE_PLACEHOLDER = b"{{project_name}}"
+# linux ioctl to clone a file's extents (copy-on-write)
+FICLONE = 0x40049409
 
-def _load_projects():
-    """Load projects from projects.json file"""
+_registry = None
+_registry_lock = threading.Lock()
+_templates = {}
+_templates_lock = threading.Lock()
+_reclaim_queue = queue.Queue()
+_reclaim_callbacks = []
+_reclaimer = None
+_reclaimer_lock = threading.Lock()
+
+def get_registry():
+    """Project registry (sqlite), opened on first use"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            os.makedirs(PROJECT_ENV_PATH, exist_ok=True)
+            _registry = ProjectRegistry(PROJECTS_DB_PATH, PROJECT_ENV_PATH)
+        return _registry
+
+def sync_registry():
+    """Import projects.json (first run only) and reconcile the registry with the folders in project_env"""
+    registry = get_registry()
+    imported = registry.import_projects_json(PROJECTS_JSON_PATH)
+    result = registry.reconcile()
+    result["imported"] = imported
+    return result
+
+def list_templates():
+    """Names of the project templates in project_templates/"""
     try:
-        if os.path.exists(PROJECTS_JSON_PATH):
-            with open(PROJECTS_JSON_PATH, 'r') as f:
-                content = f.read().strip()
-                if content:
-                    return json.loads(content)
-        return []
-    except (json.JSONDecodeError, FileNotFoundError):
+        return sorted(name for name in os.listdir(TEMPLATES_PATH)
+                      if not name.startswith(".") and os.path.isdir(os.path.join(TEMPLATES_PATH, name)))
+    except OSError:
         return []
 
-def _save_projects(projects):
-    """Save projects to projects.json file"""
+def _load_template(template):
+    """
+    Template files, read once and kept in memory: a list of (relative path, source path, bytes or None).
+    Files containing {{project_name}} keep their bytes to be rendered, all others are cloned from disk.
+    """
+    with _templates_lock:
+        files = _templates.get(template)
+        if files is not None:
+            return files
+    if template not in list_templates():
+        raise ValueError(f"Unknown template {template}, use one of {', '.join(list_templates())}")
+    template_dir = os.path.join(TEMPLATES_PATH, template)
+    files = []
+    for dir_path, dir_names, file_names in os.walk(template_dir):
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            source = os.path.join(dir_path, file_name)
+            with open(source, "rb") as f:
+                content = f.read()
+            rel = os.path.relpath(source, template_dir)
+            files.append((rel, source, content if TEMPLATE_PLACEHOLDER in content else None))
+    with _templates_lock:
+        return _templates.setdefault(template, files)
+
+def _clone_file(source, destination):
+    """
+    Copy-on-write clone (FICLONE, btrfs/xfs) when the filesystem supports it, otherwise a kernel-side copy.
+    Not a hardlink: the tools write project files in place, which would also change the template.
+    """
     try:
-        with open(PROJECTS_JSON_PATH, 'w') as f:
-            json.dump(projects, f, indent=2)
-        return True
-    except Exception as e:
-        return False
+        import fcntl
+        with open(source, "rb") as src, open(destination, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return
+    except (ImportError, OSError):
+        pass
+    shutil.copyfile(source, destination)
+
+def _build_project(project_dir, project_name, files):
+    """Create a project folder from template files. It is built under a hidden name and renamed into
+    place, so a half-created project is never listed."""
+    staging_dir = os.path.join(PROJECT_ENV_PATH, f"{STAGING_PREFIX}{os.path.basename(project_dir)}")
+    os.makedirs(staging_dir)
+    try:
+        for rel, source, content in files:
+            destination = os.path.join(staging_dir, rel)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            if content is None:
+                _clone_file(source, destination)
+            else:
+                with open(destination, "wb") as f:
+                    f.write(content.replace(TEMPLATE_PLACEHOLDER, project_name.encode("utf-8")))
+        os.rename(staging_dir, project_dir)
+    except Exception:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
 
-def create_project(project_name):
+def create_project(project_name, template=DEFAULT_TEMPLATE, datetime_str=None):
     """
     Creates a project in the folder with the name <project name>_(current datetime string)
     The current datetime string ensures that projects with the same name can be created without overwriting others.
-    In the project folder create a basic index.html file. Then update projects.json with the new project.
+    The project folder is cloned from a template in project_templates/. Then register the new project.
     
     Args:
         project_name (str): The base name of the project
+        template (str): Name of the template to create the project from
+        datetime_str (str): Datetime suffix to use instead of the current time
         
     Returns:
         str: SUCCESS message or failure message
     """
     try:
+        files = _load_template(template)
+
         # Generate datetime string in YYYYMMDD_HHMMSS format
-        datetime_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+        datetime_str = datetime_str or datetime.now().strftime("%Y%m%d_%H%M%S")
         full_project_name = f"{project_name}_{datetime_str}"
         
         # Create project directory path
@@ -58,55 +151,39 @@ def create_project(project_name):
         if os.path.exists(project_dir):
             return f"FAILURE: Project directory {full_project_name} already exists"
         
-        # Create project directory
-        os.makedirs(project_dir)
-
-        # Create basic index.html and styles.css files
-        index_html_path = os.path.join(project_dir, "index.html")
-        styles_css_path = os.path.join(project_dir, "styles.css")
-
-        html_content = f"""<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <title>{project_name}</title>
-    <link rel="stylesheet" href="styles.css">
-</head>
-<body>
-    
-</body>
-</html>"""
-
-        css_content = """/* css here */
-"""
-
-        # Write index.html
-        with open(index_html_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        # Write styles.css
-        with open(styles_css_path, 'w', encoding='utf-8') as f:
-            f.write(css_content)
-        
-        # Load current projects
-        projects = _load_projects()
-        
-        # Add new project to the list
-        projects.append(full_project_name)
+        _build_project(project_dir, project_name, files)
         
-        # Save updated projects list
-        if not _save_projects(projects):
-            # If saving fails, clean up the created directory
+        # Register the new project
+        if not get_registry().add(full_project_name):
+            # If registering fails, clean up the created directory
             shutil.rmtree(project_dir)
-            return "FAILURE: Could not update projects.json"
+            return "FAILURE: Could not register project"
+        get_registry().refresh_stats(full_project_name)
         
         return f"SUCCESS: Created project {full_project_name}"
         
     except Exception as e:
         return f"FAILURE: {str(e)}"
 
+def create_projects(project_names, template=DEFAULT_TEMPLATE):
+    """
+    Creates several projects from the same template, all with the same datetime suffix.
+    
+    Args:
+        project_names (list): Base names of the projects
+        template (str): Name of the template to create the projects from
+        
+    Returns:
+        list: SUCCESS or failure message per project, in order
+    """
+    datetime_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return [create_project(project_name, template, datetime_str) for project_name in project_names]
+
 def delete_project(full_project_name):
     """
-    Deletes a project from projects.json and deletes the actual project directory.
+    Deletes a project: it is removed from the registry and its folder is moved to project_env/.trash
+    (a rename, so this is instant whatever the project's size). The folder itself is removed later by
+    the background reclaimer.
     
     Args:
         full_project_name (str): The full project name including datetime
@@ -115,39 +192,127 @@ def delete_project(full_project_name):
         str: SUCCESS message or failure message
     """
     try:
-        # Load current projects
-        projects = _load_projects()
-        
-        # Check if project exists in projects.json
-        if full_project_name not in projects:
+        # Remove project from the registry
+        if not get_registry().remove(full_project_name):
             return f"FAILURE: Project {full_project_name} not found in projects list"
         
-        # Remove project from list
-        projects.remove(full_project_name)
-        
-        # Save updated projects list
-        if not _save_projects(projects):
-            return "FAILURE: Could not update projects.json"
-        
-        # Delete project directory
+        # Tombstone the project directory
         project_dir = os.path.join(PROJECT_ENV_PATH, full_project_name)
-        if os.path.exists(project_dir):
-            shutil.rmtree(project_dir)
+        if os.path.dirname(os.path.normpath(project_dir)) == os.path.normpath(PROJECT_ENV_PATH) and os.path.isdir(project_dir):
+            os.makedirs(TRASH_PATH, exist_ok=True)
+            tombstone = os.path.join(TRASH_PATH, f"{full_project_name}.{time.time_ns()}")
+            os.rename(project_dir, tombstone)
+            start_reclaimer()
+            _reclaim_queue.put(tombstone)
         
         return f"SUCCESS: Deleted project {full_project_name}"
         
     except Exception as e:
         return f"FAILURE: {str(e)}"
 
-def list_projects():
+def start_reclaimer(on_reclaimed=None):
+    """
+    Start the background worker that removes deleted projects' folders (safe to call more than once).
+    Tombstones left over from an earlier run are queued again, as are stale half-created projects.
+    
+    Args:
+        on_reclaimed (callable): Called with the project name after its folder is removed
+    """
+    global _reclaimer
+    with _reclaimer_lock:
+        if on_reclaimed is not None:
+            _reclaim_callbacks.append(on_reclaimed)
+        if _reclaimer is not None:
+            return
+        _reclaimer = threading.Thread(target=_reclaim_worker, name="project-reclaimer", daemon=True)
+        _reclaimer.start()
+        try:
+            leftovers = os.listdir(TRASH_PATH)
+        except OSError:
+            leftovers = []
+        for name in leftovers:
+            _reclaim_queue.put(os.path.join(TRASH_PATH, name))
+        for path in _stale_staging_dirs():
+            log.system(f"removing half-created project {os.path.basename(path)}")
+            _reclaim_queue.put(path)
+
+def _stale_staging_dirs():
+    try:
+        names = os.listdir(PROJECT_ENV_PATH)
+    except OSError:
+        return []
+    now = time.time()
+    stale = []
+    for name in names:
+        path = os.path.join(PROJECT_ENV_PATH, name)
+        try:
+            if name.startswith(STAGING_PREFIX) and now - os.path.getmtime(path) > STALE_STAGING_SECONDS:
+                stale.append(path)
+        except OSError:
+            pass
+    return stale
+
+def pending_reclaims():
+    """Number of deleted project folders still waiting to be removed"""
+    return _reclaim_queue.qsize()
+
+def _reclaim_worker():
+    while True:
+        tombstone = _reclaim_queue.get()
+        try:
+            shutil.rmtree(tombstone, ignore_errors=True)
+            if os.path.exists(tombstone):
+                log.error(f"could not fully remove deleted project {tombstone}")
+                continue
+            if os.path.dirname(tombstone) != TRASH_PATH:
+                # a half-created project, it was never registered
+                continue
+            full_project_name = os.path.basename(tombstone).rpartition(".")[0]
+            with _reclaimer_lock:
+                callbacks = list(_reclaim_callbacks)
+            for callback in callbacks:
+                try:
+                    callback(full_project_name)
+                except Exception as e:
+                    log.error(f"project reclaim callback failed for {full_project_name}: {e}")
+        finally:
+            _reclaim_queue.task_done()
+
+def list_projects(offset=0, limit=None, sort="created_at", order="asc", prefix=None, details=False):
     """
-    Lists all projects in the project folder (referring to the projects.json file).
+    Lists projects from the registry.
     
+    Args:
+        offset (int): Number of projects to skip (pagination)
+        limit (int): Max number of projects to return, None for all
+        sort (str): name, created_at, last_opened_at, size_bytes or file_count
+        order (str): asc or desc
+        prefix (str): Only projects whose name starts with this
+        details (bool): Return dicts with timestamps/size/file count instead of names
+        
     Returns:
-        list: List of full project names
+        tuple: (list of full project names (or dicts), total number of matching projects)
     """
     try:
-        projects = _load_projects()
-        return projects
+        projects, total = get_registry().list(offset=offset, limit=limit, sort=sort, order=order, prefix=prefix)
+        if details:
+            return projects, total
+        return [project["name"] for project in projects], total
+    except ValueError:
+        raise
     except Exception as e:
-        return []
\ No newline at end of file
+        return [], 0
+
+def mark_project_opened(full_project_name):
+    """Record that a project was opened (last_opened_at)"""
+    try:
+        get_registry().touch(full_project_name)
+    except Exception:
+        pass
+
+def refresh_project_stats(full_project_name):
+    """Re-measure a project's on-disk size and file count"""
+    try:
+        get_registry().refresh_stats(full_project_name)
+    except Exception:
+        pass
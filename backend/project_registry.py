@@ -0,0 +1,185 @@
+# project registry
+# purpose: sqlite (WAL) record of all projects, replaces rewriting projects.json on every change
+# stores name, created/last-opened time, on-disk size and file count per project.
+# projects.json is imported once, and reconcile() syncs the table with the folders in project_env.
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+SORT_COLUMNS = ("name", "created_at", "last_opened_at", "size_bytes", "file_count")
+# projects are named <name>_YYYYMMDD_HHMMSS (see project_manager.create_project)
+CREATED_SUFFIX_RE = re.compile(r"_(\d{8}_\d{6})$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    name TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    last_opened_at REAL,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    file_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS projects_created_at ON projects (created_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def created_time_from_name(full_project_name):
+    match = CREATED_SUFFIX_RE.search(full_project_name)
+    if match:
+        try:
+            return datetime.strptime(match.group(1), "%Y%m%d_%H%M%S").timestamp()
+        except ValueError:
+            pass
+    return None
+
+
+def directory_stats(path):
+    """(total bytes, file count) of a project folder"""
+    size = 0
+    count = 0
+    pending = [path]
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        size += entry.stat(follow_symlinks=False).st_size
+                        count += 1
+        except OSError:
+            continue
+    return size, count
+
+
+class ProjectRegistry:
+    def __init__(self, db_path, project_env_path):
+        self.db_path = db_path
+        self.project_env_path = project_env_path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    def _conn(self):
+        """one connection per thread (sqlite connections can't be shared across threads)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, name, created_at=None):
+        """registers a project, returns False if a project with that name already exists"""
+        try:
+            with self._conn() as conn:
+                conn.execute(
+                    "INSERT INTO projects (name, created_at) VALUES (?, ?)",
+                    (name, created_at if created_at is not None else time.time())
+                )
+            return True
+        except sqlite3.IntegrityError:
+            return False
+
+    def remove(self, name):
+        with self._conn() as conn:
+            return conn.execute("DELETE FROM projects WHERE name = ?", (name,)).rowcount > 0
+
+    def exists(self, name):
+        row = self._conn().execute("SELECT 1 FROM projects WHERE name = ?", (name,)).fetchone()
+        return row is not None
+
+    def touch(self, name):
+        """records that a project was opened"""
+        with self._conn() as conn:
+            conn.execute("UPDATE projects SET last_opened_at = ? WHERE name = ?", (time.time(), name))
+
+    def refresh_stats(self, name):
+        size, count = directory_stats(os.path.join(self.project_env_path, name))
+        with self._conn() as conn:
+            conn.execute("UPDATE projects SET size_bytes = ?, file_count = ? WHERE name = ?", (size, count, name))
+
+    def list(self, offset=0, limit=None, sort="created_at", order="asc", prefix=None):
+        """returns (projects as dicts, total matching count)"""
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Cannot sort by {sort}, use one of {', '.join(SORT_COLUMNS)}")
+        direction = "DESC" if str(order).lower() == "desc" else "ASC"
+        where, params = "", []
+        if prefix:
+            # range scan on the primary key instead of LIKE (no escaping issues with % and _)
+            where = "WHERE name >= ? AND name < ?"
+            params = [prefix, prefix + "\U0010ffff"]
+        conn = self._conn()
+        total = conn.execute(f"SELECT COUNT(*) FROM projects {where}", params).fetchone()[0]
+        query = f"SELECT * FROM projects {where} ORDER BY {sort} {direction}, name ASC LIMIT ? OFFSET ?"
+        rows = conn.execute(query, params + [limit if limit is not None else -1, max(offset, 0)]).fetchall()
+        return [dict(row) for row in rows], total
+
+    def import_projects_json(self, projects_json_path):
+        """one time import of the old projects.json list"""
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'projects_json_imported'").fetchone():
+            return 0
+        names = []
+        try:
+            with open(projects_json_path, "r") as f:
+                content = f.read().strip()
+                if content:
+                    names = json.loads(content)
+        except (OSError, json.JSONDecodeError):
+            pass
+        imported = 0
+        with conn:
+            for name in names:
+                created_at = created_time_from_name(name) or time.time()
+                imported += conn.execute(
+                    "INSERT OR IGNORE INTO projects (name, created_at) VALUES (?, ?)", (name, created_at)
+                ).rowcount
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('projects_json_imported', ?)", (str(time.time()),))
+        return imported
+
+    def reconcile(self, skip=()):
+        """
+        syncs the table with the project folders on disk: registers unknown folders, drops entries whose
+        folder is gone and refreshes size/file counts. names in skip (e.g. pending deletes) are left alone.
+        returns counts of added/removed projects.
+        """
+        try:
+            folders = {
+                entry.name: entry for entry in os.scandir(self.project_env_path)
+                if entry.is_dir() and not entry.name.startswith(".") and entry.name not in skip
+            }
+        except OSError:
+            return {"added": 0, "removed": 0}
+        # walk the folders before the transaction, so the write lock is only held for the updates themselves
+        # (creates and opens running meanwhile would otherwise wait on the whole disk walk)
+        stats = {}
+        for name, entry in folders.items():
+            try:
+                created_at = created_time_from_name(name) or entry.stat().st_mtime
+            except OSError:
+                continue
+            stats[name] = (created_at,) + directory_stats(entry.path)
+        conn = self._conn()
+        added = removed = 0
+        with conn:
+            known = {row["name"] for row in conn.execute("SELECT name FROM projects")}
+            for name in known - set(folders) - set(skip):
+                conn.execute("DELETE FROM projects WHERE name = ?", (name,))
+                removed += 1
+            for name, (created_at, size, count) in stats.items():
+                if name not in known:
+                    conn.execute("INSERT OR IGNORE INTO projects (name, created_at) VALUES (?, ?)", (name, created_at))
+                    added += 1
+                conn.execute("UPDATE projects SET size_bytes = ?, file_count = ? WHERE name = ?", (size, count, name))
+        return {"added": added, "removed": removed}
@@ -12,6 +12,8 @@ The user will not be able to see or interact with the code unless you show it to
 The user may annotate the interface with text and drawings, and provide you with a screenshot of the interface with the annotations.
 When you are given an annotated screenshot of the interface, do your best to interpret the users intent and edit the code accordingly.
 You can use the tools provided to you to edit the code, and you can use the list directory tool to see what files your working with.
+When a change touches several files, make all the edits in one step with batch_edit_tool. To read several files, use run_tools_in_parallel_tool instead of one tool call at a time.
+For big files, read_file_tool with outline=true shows where things are, then read just the lines you need with start_line/end_line.
 """
 
 code_agent_prompt = """
@@ -0,0 +1,144 @@
+# settings store
+# purpose: single cached copy of settings.json shared by the tools and the endpoints
+# the parsed settings are kept in memory and only re-read when the file's mtime/inode/size changes.
+# writes go to a temp file that is renamed over settings.json, so readers never see a half written file.
+
+import copy
+import json
+import os
+import tempfile
+import threading
+import time
+
+SETTINGS_PATH = "settings.json"
+
+DEFAULT_SETTINGS = {
+    "logging": {
+        "print_system_logs": True,
+        "print_debug_logs": False,
+        "print_error_logs": True,
+        "print_llm_logs": True,
+        "print_tool_logs": True,
+        "write_to_file": False
+    },
+    "active_project_path": ""
+}
+
+
+def _log_error(message):
+    # imported here, the log writer reads its options from this store
+    from log_writer import log
+    log.error(message)
+
+
+class SettingsStore:
+    def __init__(self, path=SETTINGS_PATH, check_interval=0.25):
+        """
+        path: settings file, relative to the backend's working directory like the rest of the code
+        check_interval: seconds a cached read is trusted before the file is stat'ed again
+        """
+        self.path = path
+        self.check_interval = check_interval
+        self._settings = None
+        self._file_key = None
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+        self._subscribers = []
+
+    def _stat_key(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+    def get(self):
+        """
+        returns a copy of the parsed settings (use update() to change them).
+        raises FileNotFoundError if the settings file doesn't exist.
+        """
+        return copy.deepcopy(self._load())
+
+    def _load(self):
+        """the cached settings dict itself, shared, must not be modified"""
+        now = time.monotonic()
+        settings = self._settings
+        if settings is not None and now - self._checked_at < self.check_interval:
+            return settings
+        with self._lock:
+            file_key = self._stat_key()
+            self._checked_at = now
+            if self._settings is not None and file_key == self._file_key:
+                return self._settings
+            old = self._settings
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._settings = json.load(f)
+            except json.JSONDecodeError:
+                # remembered, so the broken file is reported once and not re-parsed on every read
+                self._file_key = file_key
+                if self._settings is None:
+                    self._settings = {}
+                    _log_error(f"Error parsing {self.path}, no settings loaded yet.")
+                else:
+                    _log_error(f"Error parsing {self.path}, using last loaded settings.")
+                return self._settings
+            self._file_key = file_key
+            if old is not None and old != self._settings:
+                # changed on disk by something other than this store
+                self._notify(old, self._settings)
+            return self._settings
+
+    def get_value(self, key, default=None, missing_ok=True):
+        """one top level value, default when the file is missing (or FileNotFoundError with missing_ok=False)"""
+        try:
+            value = self._load().get(key, default)
+        except FileNotFoundError:
+            if not missing_ok:
+                raise
+            return default
+        # nested sections are copied so callers can't change the cached settings
+        return copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
+    def update(self, **changes):
+        """applies top level changes and writes the file atomically, creating it from defaults if missing"""
+        with self._lock:
+            try:
+                old = self._load()
+            except FileNotFoundError:
+                old = None
+            new = copy.deepcopy(old if old is not None else DEFAULT_SETTINGS)
+            new.update(changes)
+            self._write(new)
+            self._settings = new
+            self._file_key = self._stat_key()
+            self._checked_at = time.monotonic()
+        if old != new:
+            self._notify(old, new)
+        return new
+
+    def _write(self, settings):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix=".settings_", suffix=".json", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(settings, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def subscribe(self, callback):
+        """callback(old_settings, new_settings) is called whenever the settings change"""
+        self._subscribers.append(callback)
+
+    def _notify(self, old, new):
+        for callback in list(self._subscribers):
+            try:
+                callback(old, new)
+            except Exception as e:
+                _log_error(f"Error in settings subscriber: {e}")
+
+
+# shared store used by the tools and main.py
+settings_store = SettingsStore()
@@ -0,0 +1,271 @@
+# snapshot store
+# purpose: cheap per-turn checkpoints of a project, with diff and one step restore ("revert")
+# file contents are stored once per unique content, as blobs named by their sha256 (shared by all
+# snapshots and projects). a snapshot is a small json manifest of path -> hash and mode. files whose size and
+# mtime match the previous snapshot reuse its hash without being read, so a checkpoint only reads and
+# stores the files that changed. restore only rewrites files whose hash differs from the target.
+#
+# blobs are copied, not hardlinked: the tools (and most editors) write project files in place, which
+# would silently change a blob that shared the file's inode.
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import stat
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from event_bus import file_events
+from agent_developer_tools.utils.tree_index import IgnoreRules
+from agent_developer_tools.utils.file_utils import NEW_FILE_MODE
+
+SNAPSHOT_ID_RE = re.compile(r"^\d{8}_\d{6}_\d{6}$")
+# snapshots kept per project, older ones are pruned (and their unreferenced blobs removed)
+MAX_SNAPSHOTS = 50
+
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class SnapshotStore:
+    def __init__(self, root, project_env_path):
+        """root: folder for blobs and manifests, project_env_path: folder containing the projects"""
+        self.root = root
+        self.project_env_path = project_env_path
+        self.blob_dir = os.path.join(root, "blobs")
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        # held while blobs are added/removed, so garbage collection never races a snapshot being written
+        self._blob_lock = threading.RLock()
+
+    def _lock(self, project_name):
+        with self._locks_lock:
+            return self._locks.setdefault(project_name, threading.Lock())
+
+    def _project_path(self, project_name):
+        path = os.path.realpath(os.path.join(self.project_env_path, project_name))
+        if os.path.dirname(path) != os.path.realpath(self.project_env_path) or not os.path.isdir(path):
+            raise FileNotFoundError(f"Project {project_name} not found")
+        return path
+
+    def _manifest_dir(self, project_name):
+        if not project_name or project_name in (".", "..") or "/" in project_name or os.sep in project_name:
+            raise FileNotFoundError(f"Project {project_name} not found")
+        return os.path.join(self.root, "manifests", project_name)
+
+    def _blob_path(self, file_hash):
+        return os.path.join(self.blob_dir, file_hash[:2], file_hash[2:])
+
+    def _scan(self, project_path, previous_files):
+        """path -> {hash, size, mtime_ns, mode} for the project's files, hashing only files that changed"""
+        ignore = IgnoreRules.for_project(project_path)
+        files = {}
+        pending = [""]
+        while pending:
+            rel_dir = pending.pop()
+            with os.scandir(os.path.join(project_path, rel_dir)) as it:
+                for entry in it:
+                    if entry.name.startswith("."):
+                        continue
+                    rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        if not ignore.ignored(rel, True):
+                            pending.append(rel)
+                        continue
+                    if not entry.is_file(follow_symlinks=False) or ignore.ignored(rel, False):
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                    previous = previous_files.get(rel)
+                    # chmod doesn't touch the mtime, the mode is always taken from the stat
+                    mode = stat.S_IMODE(st.st_mode)
+                    if previous and previous["size"] == st.st_size and previous["mtime_ns"] == st.st_mtime_ns:
+                        files[rel] = previous if previous.get("mode") == mode else dict(previous, mode=mode)
+                    else:
+                        files[rel] = {"hash": _hash_file(entry.path), "size": st.st_size, "mtime_ns": st.st_mtime_ns, "mode": mode}
+        return files
+
+    def _store_blob(self, source_path, file_hash):
+        blob = self._blob_path(file_hash)
+        if os.path.exists(blob):
+            return
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(blob))
+        os.close(fd)
+        shutil.copyfile(source_path, tmp_path)
+        # re-check: the file may have changed between hashing and copying
+        if _hash_file(tmp_path) != file_hash:
+            os.remove(tmp_path)
+            raise RuntimeError(f"{source_path} changed while taking the snapshot")
+        os.replace(tmp_path, blob)
+
+    def _read_manifest(self, project_name, snapshot_id):
+        if not SNAPSHOT_ID_RE.match(snapshot_id or ""):
+            raise FileNotFoundError(f"Snapshot {snapshot_id} not found for project {project_name}")
+        path = os.path.join(self._manifest_dir(project_name), f"{snapshot_id}.json")
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Snapshot {snapshot_id} not found for project {project_name}")
+
+    def _snapshot_ids(self, project_name):
+        try:
+            names = os.listdir(self._manifest_dir(project_name))
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-5] for name in names if name.endswith(".json"))
+
+    def _latest(self, project_name):
+        ids = self._snapshot_ids(project_name)
+        return self._read_manifest(project_name, ids[-1]) if ids else None
+
+    def take_snapshot(self, project_name, label=None):
+        """checkpoints the project, returns the manifest (the latest one again if nothing changed)"""
+        with self._lock(project_name):
+            project_path = self._project_path(project_name)
+            latest = self._latest(project_name)
+            files = self._scan(project_path, latest["files"] if latest else {})
+            state = {k: (v["hash"], v.get("mode")) for k, v in files.items()}
+            if latest is not None and state == {k: (v["hash"], v.get("mode")) for k, v in latest["files"].items()}:
+                return latest
+            with self._blob_lock:
+                return self._write_snapshot(project_name, project_path, files, label)
+
+    def _write_snapshot(self, project_name, project_path, files, label):
+        for rel, info in files.items():
+            self._store_blob(os.path.join(project_path, rel), info["hash"])
+        snapshot_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        manifest = {
+            "id": snapshot_id,
+            "project": project_name,
+            "created_at": time.time(),
+            "label": label,
+            "files": files,
+        }
+        manifest_dir = self._manifest_dir(project_name)
+        os.makedirs(manifest_dir, exist_ok=True)
+        tmp_path = os.path.join(manifest_dir, f".{snapshot_id}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, os.path.join(manifest_dir, f"{snapshot_id}.json"))
+        self._prune(project_name)
+        return manifest
+
+    def list_snapshots(self, project_name):
+        snapshots = []
+        for snapshot_id in reversed(self._snapshot_ids(project_name)):
+            manifest = self._read_manifest(project_name, snapshot_id)
+            snapshots.append({
+                "id": manifest["id"],
+                "created_at": manifest["created_at"],
+                "label": manifest.get("label"),
+                "file_count": len(manifest["files"]),
+            })
+        return snapshots
+
+    def _files(self, project_name, snapshot_id):
+        """path -> hash for a snapshot, or for the working tree when snapshot_id is 'current'"""
+        if snapshot_id == "current":
+            latest = self._latest(project_name)
+            files = self._scan(self._project_path(project_name), latest["files"] if latest else {})
+        else:
+            files = self._read_manifest(project_name, snapshot_id)["files"]
+        return {rel: info["hash"] for rel, info in files.items()}
+
+    def diff(self, project_name, from_id, to_id="current"):
+        old = self._files(project_name, from_id)
+        new = self._files(project_name, to_id)
+        return {
+            "from": from_id,
+            "to": to_id,
+            "added": sorted(set(new) - set(old)),
+            "removed": sorted(set(old) - set(new)),
+            "modified": sorted(rel for rel in set(old) & set(new) if old[rel] != new[rel]),
+        }
+
+    def restore(self, project_name, snapshot_id):
+        """
+        makes the project match a snapshot. the current state is checkpointed first, so a restore can be undone.
+        returns the files written and deleted.
+        """
+        target = self._read_manifest(project_name, snapshot_id)["files"]
+        before = self.take_snapshot(project_name, label=f"before restore to {snapshot_id}")
+        with self._lock(project_name):
+            project_path = self._project_path(project_name)
+            current = before["files"]
+            written, deleted = [], []
+            for rel, info in target.items():
+                path = os.path.join(project_path, rel)
+                # manifests from before modes were recorded: keep the file's mode, new files get the default
+                mode = info.get("mode", current[rel].get("mode", NEW_FILE_MODE) if rel in current else NEW_FILE_MODE)
+                if rel in current and current[rel]["hash"] == info["hash"]:
+                    if current[rel].get("mode") != mode:
+                        os.chmod(path, mode)
+                    continue
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".restore_")
+                os.close(fd)
+                shutil.copyfile(self._blob_path(info["hash"]), tmp_path)
+                # mkstemp creates the file 0600
+                os.chmod(tmp_path, mode)
+                os.replace(tmp_path, path)
+                written.append(rel)
+            for rel in current:
+                if rel not in target:
+                    os.remove(os.path.join(project_path, rel))
+                    deleted.append(rel)
+        for rel in written + deleted:
+            file_events.publish({
+                "type": "file_changed",
+                "file_path": os.path.join(project_path, rel),
+                "change": "deleted" if rel in deleted else "written",
+                "message": f"File restored: {os.path.basename(rel)}",
+                "active_project_name": project_name,
+                "timestamp": time.time(),
+            }, key=os.path.join(project_path, rel))
+        return {"restored_to": snapshot_id, "undo_snapshot": before["id"], "written": written, "deleted": deleted}
+
+    def _prune(self, project_name):
+        ids = self._snapshot_ids(project_name)
+        if len(ids) <= MAX_SNAPSHOTS:
+            return
+        for snapshot_id in ids[:-MAX_SNAPSHOTS]:
+            os.remove(os.path.join(self._manifest_dir(project_name), f"{snapshot_id}.json"))
+        self.collect_garbage()
+
+    def delete_project_snapshots(self, project_name):
+        shutil.rmtree(self._manifest_dir(project_name), ignore_errors=True)
+        self.collect_garbage()
+
+    def collect_garbage(self):
+        """removes blobs no manifest refers to"""
+        with self._blob_lock:
+            return self._collect_garbage()
+
+    def _collect_garbage(self):
+        referenced = set()
+        manifests_root = os.path.join(self.root, "manifests")
+        for project_name in (os.listdir(manifests_root) if os.path.isdir(manifests_root) else []):
+            for snapshot_id in self._snapshot_ids(project_name):
+                try:
+                    referenced.update(info["hash"] for info in self._read_manifest(project_name, snapshot_id)["files"].values())
+                except (FileNotFoundError, ValueError):
+                    continue
+        removed = 0
+        if not os.path.isdir(self.blob_dir):
+            return removed
+        for prefix in os.listdir(self.blob_dir):
+            for name in os.listdir(os.path.join(self.blob_dir, prefix)):
+                if prefix + name not in referenced:
+                    os.remove(os.path.join(self.blob_dir, prefix, name))
+                    removed += 1
+        return removed
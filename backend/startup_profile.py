@@ -0,0 +1,126 @@
+# startup profile
+# purpose: see where backend startup time goes
+# install() (first thing in main.py) wraps every module executed from then on to time it, with its own time
+# separate from the modules it imports, until stop() once the backend is ready. mark() records phases
+# (imports done, app started, ready) measured from process start. served at /startup_profile.
+# for the full import tree run: python -X importtime main.py
+
+import os
+import sys
+import threading
+import time
+
+_lock = threading.Lock()
+_local = threading.local()
+_modules = {}  # name -> {"cumulative": s, "self": s}
+_phases = {}
+_installed_at = None
+_finder = None
+
+
+def _process_started_at():
+    """wall clock time the process started (linux), None elsewhere"""
+    try:
+        with open("/proc/self/stat") as f:
+            ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - uptime + ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class _ImportTimer:
+    """meta path finder that finds nothing itself, it times the loaders the other finders return"""
+
+    def find_spec(self, fullname, path, target=None):
+        if getattr(_local, "finding", False):
+            return None
+        _local.finding = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            _local.finding = False
+        loader = spec.loader
+        # builtin/frozen importers are classes shared by every module, leave them alone
+        if loader is None or isinstance(loader, type) or not hasattr(loader, "exec_module"):
+            return spec
+        exec_module = loader.exec_module
+
+        def timed_exec_module(module):
+            stack = getattr(_local, "stack", None)
+            if stack is None:
+                stack = _local.stack = []
+            stack.append(0.0)
+            started = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                elapsed = time.perf_counter() - started
+                children = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                with _lock:
+                    _modules[fullname] = {"cumulative": elapsed, "self": elapsed - children}
+
+        loader.exec_module = timed_exec_module
+        return spec
+
+
+def install():
+    """starts timing imports (idempotent)"""
+    global _finder, _installed_at
+    if _finder is not None:
+        return
+    _installed_at = time.time()
+    _finder = _ImportTimer()
+    sys.meta_path.insert(0, _finder)
+
+
+def stop():
+    """stops timing imports, later lazy imports run at full speed"""
+    global _finder
+    if _finder is not None and _finder in sys.meta_path:
+        sys.meta_path.remove(_finder)
+    _finder = None
+
+
+def mark(phase):
+    """records that phase was reached, as seconds since process start"""
+    with _lock:
+        _phases.setdefault(phase, time.time())
+
+
+def report(top=25):
+    started = _process_started_at() or _installed_at or time.time()
+    with _lock:
+        modules = dict(_modules)
+        phases = dict(_phases)
+    slowest = sorted(modules.items(), key=lambda item: item[1]["self"], reverse=True)[:top]
+    packages = {}
+    for name, m in modules.items():
+        package = name.split(".", 1)[0]
+        packages[package] = packages.get(package, 0.0) + m["self"]
+    return {
+        "phases_s": {name: round(at - started, 3) for name, at in sorted(phases.items(), key=lambda item: item[1])},
+        "before_profiling_s": round(_installed_at - started, 3) if _installed_at else None,
+        "imports": {
+            "modules": len(modules),
+            "total_s": round(sum(m["self"] for m in modules.values()), 3),
+            "slowest_packages": [
+                {"package": name, "ms": round(seconds * 1000, 1)}
+                for name, seconds in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+            ],
+            "slowest": [
+                {"module": name, "self_ms": round(m["self"] * 1000, 1), "cumulative_ms": round(m["cumulative"] * 1000, 1)}
+                for name, m in slowest
+            ],
+        },
+    }
@@ -0,0 +1,98 @@
+# streaming engine
+# purpose: run blocking agent turns on a worker pool and hand their chunks to async responses
+# the agent (LitellmInterface) is fully synchronous: llm reads, tool calls and file i/o all block.
+# running it directly inside an async generator stalls the whole event loop (websockets, other endpoints).
+# instead each turn runs on a worker thread and pushes chunks into a bounded asyncio queue.
+
+import asyncio
+import threading
+import concurrent.futures
+from concurrent.futures import ThreadPoolExecutor
+
+# sentinel put on the queue when the turn has finished
+_DONE = object()
+
+
+class _TurnError:
+    """wraps an exception raised inside the worker so it can be re-raised on the event loop"""
+    def __init__(self, error):
+        self.error = error
+
+
+class StreamingEngine:
+    def __init__(self, max_workers=8, queue_size=64, poll_interval=0.5):
+        """
+        max_workers: number of agent turns that can run at the same time
+        queue_size: max chunks buffered per turn before the worker waits for the client (backpressure)
+        poll_interval: how often (seconds) to check for a disconnected client while waiting for chunks
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent-turn")
+        self.queue_size = queue_size
+        self.poll_interval = poll_interval
+        self.active_turns = 0
+
+    async def stream(self, make_generator, is_disconnected=None):
+        """
+        runs make_generator() on a worker thread and yields its chunks on the event loop.
+        make_generator: callable returning the (synchronous) chunk generator for one turn
+        is_disconnected: optional async callable, when it returns True the turn is cancelled
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        cancelled = threading.Event()
+
+        def put(item):
+            """blocks the worker until the queue has room, gives up if the turn is cancelled"""
+            future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+            while not cancelled.is_set():
+                try:
+                    future.result(timeout=self.poll_interval)
+                    return True
+                except concurrent.futures.TimeoutError:
+                    continue
+            future.cancel()
+            return False
+
+        def run_turn():
+            generator = None
+            try:
+                generator = make_generator()
+                for chunk in generator:
+                    # cancellation is checked between chunks, a blocking llm call can't be interrupted
+                    if cancelled.is_set() or not put(chunk):
+                        break
+            except Exception as e:
+                put(_TurnError(e))
+            finally:
+                # close on the same thread that iterated, so the generator's cleanup runs here
+                if generator is not None and hasattr(generator, "close"):
+                    try:
+                        generator.close()
+                    except Exception:
+                        pass
+                put(_DONE)
+
+        self.active_turns += 1
+        worker = loop.run_in_executor(self.executor, run_turn)
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    if is_disconnected is not None and await is_disconnected():
+                        break
+                    continue
+                if item is _DONE:
+                    break
+                if isinstance(item, _TurnError):
+                    raise item.error
+                yield item
+        finally:
+            # client went away (or the response was cancelled): stop the worker at the next chunk
+            cancelled.set()
+            self.active_turns -= 1
+            if worker.done() and not worker.cancelled():
+                worker.exception()  # retrieve so asyncio doesn't warn about it
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,24 @@
+# tests
+# purpose: run from backend/ (python -m pytest tests), backend's flat modules import from the top level
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+
+import pytest
+
+
+@pytest.fixture
+def project_dir(tmp_path, monkeypatch):
+    """an empty active project, with settings.json in the working directory pointing at it"""
+    project = tmp_path / "project"
+    project.mkdir()
+    (tmp_path / "settings.json").write_text(json.dumps({"active_project_path": str(project), "logging": {}}))
+    monkeypatch.chdir(tmp_path)
+    # the store trusts its cached copy for a moment, make it notice the new file right away
+    from settings_store import settings_store
+    monkeypatch.setattr(settings_store, "check_interval", 0)
+    return project
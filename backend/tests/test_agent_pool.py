@@ -0,0 +1,24 @@
+import pytest
+
+from agent_pool import AgentPool
+
+
+def test_failed_agent_construction_leaves_no_busy_session():
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ImportError("no module named litellm")
+        return object()
+
+    pool = AgentPool(factory)
+    with pytest.raises(ImportError):
+        pool.acquire("s1")
+    assert pool.stats()["busy_sessions"] == 0
+    assert pool.stats()["sessions"] == 0
+
+    session = pool.acquire("s1")
+    assert session.bot is not None and session.busy == 1
+    pool.release(session)
+    assert pool.stats()["busy_sessions"] == 0
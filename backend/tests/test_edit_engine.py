@@ -0,0 +1,71 @@
+from agent_developer_tools.utils.edit_engine import apply_edit_locally
+
+RENDER = """import { draw } from "./draw.js";
+
+function render() {
+  const a = 1;
+  const b = 2;
+  const c = a + b;
+  draw(a);
+  draw(b);
+  draw(c);
+  return c;
+}
+
+render();
+"""
+
+
+def test_partial_snippet_is_left_to_the_llm_merge():
+    # only the changed line of the body, the rest of the function must not be dropped
+    result = apply_edit_locally(RENDER, "function render() {\n  const a = 10;\n}")
+    assert result.content is None
+    assert result.method == "anchored"
+
+
+def test_full_block_with_a_changed_line_is_applied():
+    snippet = RENDER.split("\n\n")[1].replace("const a = 1;", "const a = 10;")
+    result = apply_edit_locally(RENDER, snippet)
+    assert result.method == "anchored"
+    assert result.content == RENDER.replace("const a = 1;", "const a = 10;")
+
+
+def test_block_with_a_removed_line_is_applied():
+    snippet = RENDER.split("\n\n")[1].replace("  draw(b);\n", "")
+    result = apply_edit_locally(RENDER, snippet)
+    assert result.content == RENDER.replace("  draw(b);\n", "")
+
+
+def test_search_replace_block():
+    snippet = "<<<<<<< SEARCH\n  return c;\n=======\n  return c * 2;\n>>>>>>> REPLACE"
+    result = apply_edit_locally(RENDER, snippet)
+    assert result.method == "search_replace"
+    assert "return c * 2;" in result.content
+
+
+def test_reindented_block_is_not_reported_as_present():
+    indented = RENDER.replace("function render() {", "  function render() {", 1)
+    snippet = indented.split("\n\n")[1]
+    result = apply_edit_locally(RENDER, snippet)
+    assert result.method != "already_present"
+    assert result.content is None
+
+
+def test_exact_copy_is_already_present():
+    result = apply_edit_locally(RENDER, RENDER.split("\n\n")[1])
+    assert result.method == "already_present"
+    assert result.content == RENDER
+
+
+def test_ambiguous_hunk_is_left_to_the_llm_merge():
+    source = "a()\nb()\nc()\n\na()\nb()\nc()\n"
+    snippet = "@@ -5,3 +5,3 @@\n a()\n-b()\n+B()\n c()\n"
+    result = apply_edit_locally(source, snippet)
+    assert result.method == "unified_diff"
+    assert result.content is None
+
+
+def test_unique_hunk_is_applied():
+    snippet = "@@ -4,3 +4,3 @@\n   const a = 1;\n-  const b = 2;\n+  const b = 3;\n   const c = a + b;\n"
+    result = apply_edit_locally(RENDER, snippet)
+    assert result.content == RENDER.replace("const b = 2;", "const b = 3;")
@@ -0,0 +1,56 @@
+import pytest
+
+from agent_developer_tools.utils.merge_stream import MergeStreamError, consume_merge_stream
+
+ORIGINAL = "".join(f"function f{i}() {{\n  return {i};\n}}\n" for i in range(40))
+SNIPPET = "function f0() {\n  return 100;\n}"
+
+
+def chunked(text, size=16):
+    return (text[i:i + size] for i in range(0, len(text), size))
+
+
+def test_complete_stream_is_returned():
+    edited = ORIGINAL.replace("return 0;", "return 100;")
+    assert consume_merge_stream(chunked(edited), ORIGINAL, SNIPPET) == edited
+
+
+def test_truncated_stream_is_rejected():
+    edited = ORIGINAL.replace("return 0;", "return 100;")
+    with pytest.raises(MergeStreamError):
+        consume_merge_stream(chunked(edited[:len(edited) // 3]), ORIGINAL, SNIPPET)
+
+
+def test_stream_cut_off_before_the_edit_is_rejected():
+    # still identical to the original, stopped mid-line
+    with pytest.raises(MergeStreamError):
+        consume_merge_stream(chunked(ORIGINAL[:len(ORIGINAL) - 10]), ORIGINAL, SNIPPET)
+
+
+def test_empty_stream_is_rejected():
+    with pytest.raises(MergeStreamError):
+        consume_merge_stream(iter([]), ORIGINAL, SNIPPET)
+
+
+def test_diverged_then_cut_off_stream_is_rejected():
+    # changed early, then stopped at 80% of the file on a line boundary
+    edited = ORIGINAL.replace("return 0;", "return 100;")
+    cut = edited[:edited.index("\n", int(len(edited) * 0.8)) + 1]
+    with pytest.raises(MergeStreamError):
+        consume_merge_stream(chunked(cut), ORIGINAL, SNIPPET)
+
+
+def test_removing_the_last_lines_is_allowed():
+    edited = ORIGINAL[:ORIGINAL.rindex("function")]
+    snippet = "// ... existing code ...\nfunction f38() {\n  return 38;\n}"
+    assert consume_merge_stream(chunked(edited), ORIGINAL, snippet) == edited
+
+
+def test_appending_at_the_end_is_allowed():
+    edited = ORIGINAL + "function g() {\n  return 0;\n}\n"
+    assert consume_merge_stream(chunked(edited), ORIGINAL, "function g() {\n  return 0;\n}") == edited
+
+
+def test_runaway_stream_is_rejected():
+    with pytest.raises(MergeStreamError):
+        consume_merge_stream(chunked(ORIGINAL * 10, 4096), ORIGINAL, SNIPPET)
@@ -0,0 +1,38 @@
+import pytest
+from fastapi import FastAPI
+
+pytest.importorskip("httpx")  # the test client needs it
+from fastapi.testclient import TestClient  # noqa: E402
+
+import project_assets
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    project = tmp_path / "demo"
+    project.mkdir()
+    (project / "app.js").write_text("console.log('hello');\n" * 100)
+    (tmp_path / ".snapshots").mkdir()
+    (tmp_path / ".snapshots" / "index.html").write_text("manifest")
+    monkeypatch.setattr(project_assets, "PROJECT_ENV_PATH", str(tmp_path))
+    app = FastAPI()
+    app.include_router(project_assets.router)
+    return TestClient(app)
+
+
+def test_encodings_get_their_own_etags(client):
+    plain = client.get("/projects/demo/app.js", headers={"Accept-Encoding": "identity"})
+    gzipped = client.get("/projects/demo/app.js", headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert plain.headers["etag"] != gzipped.headers["etag"]
+    assert plain.headers["vary"] == gzipped.headers["vary"] == "Accept-Encoding"
+
+    revalidated = client.get("/projects/demo/app.js", headers={"Accept-Encoding": "gzip", "If-None-Match": gzipped.headers["etag"]})
+    assert revalidated.status_code == 304
+    # the identity tag doesn't validate the gzip representation
+    mismatched = client.get("/projects/demo/app.js", headers={"Accept-Encoding": "gzip", "If-None-Match": plain.headers["etag"]})
+    assert mismatched.status_code == 200
+
+
+def test_dot_folders_are_not_projects(client):
+    assert client.get("/projects/.snapshots/").status_code == 404
@@ -0,0 +1,27 @@
+from agent_developer_tools.coding_tools import read_file_tool
+from agent_developer_tools.utils.outline import MAX_LABEL_CHARS, outline
+
+BUNDLE = "function a(){return 1}" + "".join(f";function f{i}(x){{return x*{i}}}" for i in range(20000))
+
+
+def test_minified_outline_labels_are_short():
+    items = outline("bundle.js", BUNDLE)
+    assert len(items) == 1
+    assert len(items[0][1]) <= MAX_LABEL_CHARS
+
+
+def test_outline_respects_max_chars(project_dir):
+    source = "".join(f"function f{i}() {{\n  return {i};\n}}\n" for i in range(150))
+    (project_dir / "app.js").write_text(source)
+    (project_dir / "bundle.js").write_text(BUNDLE)
+
+    minified = read_file_tool("", "bundle.js", outline=True)
+    assert len(minified) < 500
+
+    result = read_file_tool("", "app.js", outline=True, max_chars=200)
+    header, body = result.split("\n", 1)
+    assert len(body) <= 200
+    assert "continue with outline=true, start_line=" in header
+    next_line = int(header.rsplit("start_line=", 1)[1].rstrip("]"))
+    rest = read_file_tool("", "app.js", outline=True, start_line=next_line)
+    assert rest.split("\n", 2)[1].startswith(f"{next_line}: function")
@@ -0,0 +1,54 @@
+import re
+
+import pytest
+
+from agent_developer_tools.utils.search_index import ProjectSearchIndex, regex_literals
+
+FILES = {
+    "index.html": "<h1>ABC title</h1>\n<p>Abc\tdef</p>\n",
+    "app.js": "const label = 'ABCD';\nconst other = 'xyz';\n",
+    "styles.css": "h1 { color: red; }\n",
+}
+
+PATTERNS = [
+    r"\x41BC",
+    r"ABC",
+    r"\U00000041BC",
+    r"\N{LATIN CAPITAL LETTER A}BC",
+    r"\101BC",
+    r"\x41BCD",
+    r"(AB)\1?C",
+    r"Abc\tdef",
+    r"label = 'ABC",
+]
+
+
+def brute_force(pattern):
+    found = set()
+    for name, text in FILES.items():
+        for number, line in enumerate(text.split("\n"), 1):
+            if re.search(pattern, line, re.IGNORECASE):
+                found.add((name, number))
+    return found
+
+
+@pytest.fixture
+def index(tmp_path):
+    for name, text in FILES.items():
+        (tmp_path / name).write_text(text)
+    return ProjectSearchIndex(str(tmp_path))
+
+
+@pytest.mark.parametrize("pattern", PATTERNS)
+def test_indexed_search_matches_brute_force(index, pattern):
+    matches, _ = index.search(pattern, regex=True)
+    assert {(m["file"], m["line"]) for m in matches} == brute_force(pattern)
+
+
+def test_escapes_are_not_read_as_literal_text():
+    assert regex_literals(r"\x41BC") == []
+    assert regex_literals(r"\x41BCDE") == ["BCDE"]
+    assert regex_literals(r"\N{LATIN CAPITAL LETTER A}BCD") == ["BCD"]
+    assert regex_literals(r"foo\tbar") == ["foo\tbar"]
+    # incomplete escape: no literals, full scan
+    assert regex_literals(r"abcd\x4") == []
@@ -0,0 +1,47 @@
+import stat
+
+from snapshot_store import SnapshotStore
+
+
+def mode(path):
+    return stat.S_IMODE(path.stat().st_mode)
+
+
+def test_restore_keeps_file_modes(tmp_path):
+    env = tmp_path / "project_env"
+    project = env / "demo"
+    project.mkdir(parents=True)
+    script, page = project / "build.sh", project / "index.html"
+    script.write_text("echo one\n")
+    script.chmod(0o755)
+    page.write_text("<p>one</p>\n")
+    page.chmod(0o644)
+
+    store = SnapshotStore(str(env / ".snapshots"), str(env))
+    first = store.take_snapshot("demo")
+    script.write_text("echo two\n")
+    page.unlink()
+    store.take_snapshot("demo")
+
+    result = store.restore("demo", first["id"])
+    assert sorted(result["written"]) == ["build.sh", "index.html"]
+    assert script.read_text() == "echo one\n"
+    assert mode(script) == 0o755
+    assert mode(page) == 0o644
+
+
+def test_mode_change_is_checkpointed_and_restored(tmp_path):
+    env = tmp_path / "project_env"
+    project = env / "demo"
+    project.mkdir(parents=True)
+    script = project / "build.sh"
+    script.write_text("echo one\n")
+    script.chmod(0o644)
+
+    store = SnapshotStore(str(env / ".snapshots"), str(env))
+    first = store.take_snapshot("demo")
+    script.chmod(0o755)
+    assert store.take_snapshot("demo")["id"] != first["id"]
+
+    store.restore("demo", first["id"])
+    assert mode(script) == 0o644
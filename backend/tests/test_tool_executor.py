@@ -0,0 +1,33 @@
+import pytest
+
+from agent_developer_tools.utils.tool_executor import ToolExecutor, classify_call, parse_arguments
+
+
+def test_parse_arguments():
+    assert parse_arguments('{"file_name": "a.css"}') == {"file_name": "a.css"}
+    assert parse_arguments("") == {}
+    assert parse_arguments(None) == {}
+
+
+@pytest.mark.parametrize("arguments", ['["a.css"]', "3", '"a.css"', ["a.css"], "{bad"])
+def test_parse_arguments_rejects_non_objects(arguments):
+    with pytest.raises(ValueError):
+        parse_arguments(arguments)
+
+
+def test_classify_call_normalizes_paths():
+    assert classify_call("edit_file_tool", {"file_path": ".", "file_name": "a.css"}) == ("edit", "a.css")
+    assert classify_call("read_file_tool", {"file_path": "", "file_name": "a.css"}) == ("read", "a.css")
+
+
+def test_invalid_arguments_become_a_result():
+    executor = ToolExecutor({"echo": lambda text: text})
+    try:
+        results = executor.execute([
+            {"name": "echo", "arguments": '{"text": "hi"}'},
+            {"name": "echo", "arguments": '["hi"]'},
+        ])
+    finally:
+        executor.shutdown()
+    assert results[0] == "hi"
+    assert results[1].startswith("Invalid arguments for echo")
@@ -0,0 +1,17 @@
+from tracing import Metrics
+
+
+def test_label_values_are_escaped():
+    metrics = Metrics()
+    metrics.inc("span_errors_total", span='tool:read "a\\b"\nc.js')
+    assert 'span_errors_total{span="tool:read \\"a\\\\b\\"\\nc.js"} 1' in metrics.render()
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics = Metrics(buckets=(0.1, 1.0))
+    metrics.observe("span_duration_seconds", 0.05, span="x")
+    metrics.observe("span_duration_seconds", 0.5, span="x")
+    text = metrics.render()
+    assert 'span_duration_seconds_bucket{span="x",le="0.1"} 1' in text
+    assert 'span_duration_seconds_bucket{span="x",le="1.0"} 2' in text
+    assert 'span_duration_seconds_count{span="x"} 2' in text
@@ -0,0 +1,37 @@
+import os
+import stat
+
+from agent_developer_tools.utils import file_utils
+from agent_developer_tools.utils.file_utils import NEW_FILE_MODE, write_files
+
+
+def test_new_files_get_the_default_mode(project_dir):
+    existing = project_dir / "run.sh"
+    existing.write_text("echo old\n")
+    existing.chmod(0o755)
+    assert write_files({str(existing): "echo new\n", str(project_dir / "new.css"): "a {}\n"}) == 0
+    assert stat.S_IMODE(existing.stat().st_mode) == 0o755
+    assert stat.S_IMODE((project_dir / "new.css").stat().st_mode) == NEW_FILE_MODE
+
+
+def test_failed_swap_rolls_back_earlier_files(project_dir, monkeypatch):
+    first, second = project_dir / "a.css", project_dir / "b.css"
+    first.write_text("a { color: red; }\n")
+    second.write_text("b { color: red; }\n")
+    replace = os.replace
+    calls = []
+
+    def failing_replace(source, destination):
+        calls.append(destination)
+        if len(calls) == 2:
+            raise OSError("disk full")
+        replace(source, destination)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(file_utils.os, "replace", failing_replace)
+        result = write_files({str(first): "a { color: blue; }\n", str(second): "b { color: blue; }\n"})
+
+    assert result == 3
+    assert first.read_text() == "a { color: red; }\n"
+    assert second.read_text() == "b { color: red; }\n"
+    assert sorted(os.listdir(project_dir)) == ["a.css", "b.css"]
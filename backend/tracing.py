@@ -0,0 +1,273 @@
+# tracing
+# purpose: lightweight spans and metrics for agent turns
+# a turn (prompt_agent) is the root span, tool calls, file reads/writes and the edit merge model call are
+# its children, so a slow turn can be split into model time, tool time and disk time. every finished span
+# is also observed in a latency histogram, served with the counters in prometheus text format at /metrics.
+# spans follow the context (contextvars), tool pools hand the parent span to their worker threads.
+# set "tracing": {"dump_turns": true} in settings.json (or POST /tracing) to write each turn's span tree
+# to logs/traces/ as json, it is read at the end of every turn so no restart is needed.
+
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from settings_store import settings_store
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TRACE_DIR = os.path.join("logs", "traces")
+# children kept per span in a trace (a turn reading thousands of files shouldn't make a huge dump)
+MAX_CHILDREN = 500
+
+_current = contextvars.ContextVar("current_span", default=None)
+
+
+def _escape_label(value):
+    # backslash, double quote and newline must be escaped in label values (text exposition format)
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label(value)}"' for name, value in labels) + "}"
+
+
+class Metrics:
+    """counters and histograms keyed by name and labels, rendered in prometheus text format"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+
+    def describe(self, name, text):
+        self._help[name] = text
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            values = self._histograms.get(key)
+            if values is None:
+                values = self._histograms[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    values[i] += 1
+            values[-2] += value
+            values[-1] += 1
+
+    def render(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, list(values)) for key, values in self._histograms.items())
+        lines = []
+        described = set()
+
+        def header(name, kind):
+            if name not in described:
+                described.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_label_text(labels)} {value}")
+        for (name, labels), values in histograms:
+            header(name, "histogram")
+            for bound, count in zip(self.buckets, values):
+                lines.append(f"{name}_bucket{_label_text(labels + (('le', bound),))} {count}")
+            lines.append(f"{name}_bucket{_label_text(labels + (('le', '+Inf'),))} {values[-1]}")
+            lines.append(f"{name}_sum{_label_text(labels)} {round(values[-2], 6)}")
+            lines.append(f"{name}_count{_label_text(labels)} {values[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+metrics.describe("span_duration_seconds", "Duration of traced operations (turns, tools, file io, notifications)")
+metrics.describe("span_errors_total", "Traced operations that raised")
+metrics.describe("llm_time_to_first_token_seconds", "Time from a model request to its first streamed chunk")
+metrics.describe("llm_tokens_total", "Model tokens in and out (estimated from the text where the provider's count isn't available)")
+metrics.describe("turns_total", "Agent turns run")
+
+
+class Span:
+    __slots__ = ("name", "attrs", "start", "duration", "children", "dropped", "_lock")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.start = time.time()
+        self.duration = None
+        self.children = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def add_child(self, span):
+        with self._lock:
+            if len(self.children) < MAX_CHILDREN:
+                self.children.append(span)
+            else:
+                self.dropped += 1
+
+    def to_dict(self, origin=None):
+        origin = self.start if origin is None else origin
+        data = {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+        }
+        if self.attrs:
+            data["attrs"] = self.attrs
+        if self.children:
+            data["children"] = [child.to_dict(origin) for child in self.children]
+        if self.dropped:
+            data["dropped_children"] = self.dropped
+        return data
+
+
+def current_span():
+    return _current.get()
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    times the block as a child of the current span (or as a root), records its duration in
+    span_duration_seconds{span=name}. yields the Span, use span.set() to add attributes
+    """
+    parent = _current.get()
+    current = Span(name, attrs)
+    if parent is not None:
+        parent.add_child(current)
+    token = _current.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except GeneratorExit:
+        # a streamed turn stopped early (client went away), not an error
+        current.attrs["cancelled"] = True
+        raise
+    except BaseException as e:
+        current.attrs["error"] = type(e).__name__
+        metrics.inc("span_errors_total", span=name)
+        raise
+    finally:
+        current.duration = time.perf_counter() - started
+        try:
+            _current.reset(token)
+        except ValueError:
+            # finished in another context (a generator closed elsewhere), just restore the parent
+            _current.set(parent)
+        metrics.observe("span_duration_seconds", current.duration, span=name)
+
+
+@contextmanager
+def attach(parent):
+    """makes parent the current span in this thread, for work handed to a pool"""
+    token = _current.set(parent)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def traced(name):
+    """decorator: runs the function inside span(name)"""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def traced_functions(functions, prefix):
+    """{name: function} with every function traced as <prefix>:<name>"""
+    return {name: traced(f"{prefix}:{name}")(function) for name, function in functions.items()}
+
+
+def record_llm_call(call, model, ttft=None, tokens_in=0, tokens_out=0):
+    """llm metrics for one model request (call: agent or merge)"""
+    if ttft is not None:
+        metrics.observe("llm_time_to_first_token_seconds", ttft, call=call, model=model)
+    metrics.inc("llm_tokens_total", tokens_in, call=call, model=model, direction="in")
+    metrics.inc("llm_tokens_total", tokens_out, call=call, model=model, direction="out")
+
+
+def timed_chunks(chunks, on_first):
+    """passes chunks through, calling on_first(seconds) when the first one arrives"""
+    started = time.perf_counter()
+    first = True
+    for chunk in chunks:
+        if first:
+            first = False
+            on_first(time.perf_counter() - started)
+        yield chunk
+
+
+def dump_enabled():
+    options = settings_store.get_value("tracing", None) or {}
+    return bool(options.get("dump_turns", False))
+
+
+def dump_trace(root, label="turn"):
+    """writes the span tree to logs/traces/ when dumping is on, returns the path or None"""
+    if not dump_enabled():
+        return None
+    os.makedirs(TRACE_DIR, exist_ok=True)
+    stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(root.start))
+    safe_label = "".join(c if c.isalnum() or c in "-_" else "_" for c in label)[:40]
+    path = os.path.join(TRACE_DIR, f"{stamp}_{int(root.start * 1000) % 1000:03d}_{safe_label}.json")
+    with open(path, "w") as f:
+        json.dump(root.to_dict(), f, indent=2, default=str)
+    return path
+
+
+_litellm_installed = False
+
+
+def install_litellm_callback():
+    """
+    records the provider's own numbers (time to first token, token usage) for every litellm request.
+    litellm runs the callback on its own threads, so these only go to the metrics, not into a trace.
+    """
+    global _litellm_installed
+    if _litellm_installed:
+        return
+    try:
+        import litellm
+    except ImportError:
+        return
+
+    def on_success(kwargs, response, start_time, end_time):
+        try:
+            model = kwargs.get("model") or "unknown"
+            first = kwargs.get("completion_start_time")
+            ttft = (first - start_time).total_seconds() if first and start_time else None
+            usage = getattr(response, "usage", None)
+            if ttft is not None:
+                metrics.observe("llm_time_to_first_token_seconds", ttft, call="provider", model=model)
+            metrics.observe("span_duration_seconds", (end_time - start_time).total_seconds(), span=f"llm:{model}")
+            if usage is not None:
+                metrics.inc("llm_tokens_total", getattr(usage, "prompt_tokens", 0) or 0, call="provider", model=model, direction="in")
+                metrics.inc("llm_tokens_total", getattr(usage, "completion_tokens", 0) or 0, call="provider", model=model, direction="out")
+        except Exception:
+            pass
+
+    litellm.success_callback = list(litellm.success_callback or []) + [on_success]
+    _litellm_installed = True
@@ -0,0 +1,187 @@
+# ws broadcaster
+# purpose: fan notifications out to WebSocket clients without one slow client holding up the others
+# every client gets a bounded outbound queue drained by its own sender task, so publish() never awaits
+# a socket. a queued message with the same merge key (same file, same project's agent_complete) is
+# replaced instead of queued twice, and when a queue is full its oldest message is dropped.
+# clients can subscribe to one project's events, get heartbeats when idle, and report send lag.
+
+import asyncio
+import itertools
+import json
+import time
+from collections import OrderedDict
+
+from fastapi import WebSocket
+
+import tracing
+
+# messages waiting per client before the oldest ones are dropped
+DEFAULT_QUEUE_SIZE = 64
+# seconds without traffic before a heartbeat is sent
+DEFAULT_HEARTBEAT_INTERVAL = 20
+# a send taking longer than this counts as a dead client
+DEFAULT_SEND_TIMEOUT = 5
+
+
+def merge_key(message):
+    """messages with the same key replace each other while queued, None means never merged"""
+    if message.get("type") == "file_changed" and message.get("file_path"):
+        return ("file_changed", message["file_path"])
+    if message.get("type") == "edit_progress" and message.get("file_path"):
+        return ("edit_progress", message["file_path"])
+    if message.get("type") == "agent_complete":
+        return ("agent_complete", message.get("active_project_name"))
+    return None
+
+
+class ClientConnection:
+    def __init__(self, client_id, websocket, project, queue_size):
+        self.id = client_id
+        self.websocket = websocket
+        # only events for this project (plus events without a project) are sent, None means all
+        self.project = project
+        self.queue_size = queue_size
+        self.queue = OrderedDict()  # key -> (json text, enqueued at)
+        self.ready = asyncio.Event()
+        self.sender = None
+        self.connected_at = time.time()
+        self.sent = 0
+        self.dropped = 0
+        self.merged = 0
+        self.heartbeats = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+
+    def wants(self, message):
+        project = message.get("active_project_name")
+        return self.project is None or project is None or project == self.project
+
+    def enqueue(self, text, key, seq):
+        now = time.monotonic()
+        if key is not None and key in self.queue:
+            # keep the place (and age) of the queued message, send the newest payload
+            self.queue[key] = (text, self.queue[key][1])
+            self.merged += 1
+            return
+        if len(self.queue) >= self.queue_size:
+            self.queue.popitem(last=False)
+            self.dropped += 1
+        self.queue[key if key is not None else seq] = (text, now)
+        self.ready.set()
+
+    def stats(self):
+        return {
+            "id": self.id,
+            "project": self.project,
+            "connected_for": round(time.time() - self.connected_at, 1),
+            "queued": len(self.queue),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "merged": self.merged,
+            "heartbeats": self.heartbeats,
+            "lag_ms": {
+                "last": round(self.last_lag * 1000, 2),
+                "max": round(self.max_lag * 1000, 2),
+                "avg": round(self.total_lag / self.sent * 1000, 2) if self.sent else None,
+            },
+        }
+
+
+class Broadcaster:
+    def __init__(self, queue_size=DEFAULT_QUEUE_SIZE, heartbeat_interval=DEFAULT_HEARTBEAT_INTERVAL, send_timeout=DEFAULT_SEND_TIMEOUT):
+        self.queue_size = queue_size
+        self.heartbeat_interval = heartbeat_interval
+        self.send_timeout = send_timeout
+        self.clients = {}  # id -> ClientConnection
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+        self.published = 0
+
+    async def connect(self, websocket: WebSocket, project=None):
+        await websocket.accept()
+        client = ClientConnection(next(self._ids), websocket, project, self.queue_size)
+        self.clients[client.id] = client
+        client.sender = asyncio.create_task(self._send_loop(client))
+        return client
+
+    def disconnect(self, client):
+        if self.clients.pop(client.id, None) is not None and client.sender is not None:
+            client.sender.cancel()
+
+    def publish(self, message: dict):
+        """queues message for every interested client and returns right away (call on the event loop)"""
+        with tracing.span("ws:publish", type=message.get("type")):
+            self.published += 1
+            key = merge_key(message)
+            # serialized once, not once per client
+            text = json.dumps(message)
+            # copy: clients may disconnect (and be removed) while we go through them
+            for client in list(self.clients.values()):
+                if client.wants(message):
+                    client.enqueue(text, key, next(self._seq))
+
+    async def send_notification(self, message: dict):
+        with tracing.span("ws:send_notification", type=message.get("type")):
+            self.publish(message)
+
+    def handle_client_message(self, client, text):
+        """clients can send {"type": "subscribe", "project": name} or {"type": "unsubscribe"}, anything else is ignored"""
+        try:
+            message = json.loads(text)
+        except ValueError:
+            return
+        if not isinstance(message, dict):
+            return
+        if message.get("type") == "subscribe":
+            client.project = message.get("project") or None
+        elif message.get("type") == "unsubscribe":
+            client.project = None
+
+    async def _send_loop(self, client):
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(client.ready.wait(), timeout=self.heartbeat_interval)
+                except asyncio.TimeoutError:
+                    client.heartbeats += 1
+                    await self._send(client, json.dumps({"type": "heartbeat", "timestamp": time.time()}))
+                    continue
+                while client.queue:
+                    _, (text, enqueued_at) = client.queue.popitem(last=False)
+                    await self._send(client, text)
+                    lag = time.monotonic() - enqueued_at
+                    client.sent += 1
+                    client.last_lag = lag
+                    client.max_lag = max(client.max_lag, lag)
+                    client.total_lag += lag
+                client.ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # dead or stuck socket, stop sending to it
+            self.clients.pop(client.id, None)
+            client.queue.clear()
+            try:
+                await client.websocket.close()
+            except Exception:
+                pass
+
+    async def _send(self, client, text):
+        await asyncio.wait_for(client.websocket.send_text(text), timeout=self.send_timeout)
+
+    async def close(self):
+        for client in list(self.clients.values()):
+            self.disconnect(client)
+
+    def stats(self):
+        clients = [client.stats() for client in self.clients.values()]
+        return {
+            "connections": len(clients),
+            "published": self.published,
+            "queued": sum(c["queued"] for c in clients),
+            "dropped": sum(c["dropped"] for c in clients),
+            "merged": sum(c["merged"] for c in clients),
+            "max_lag_ms": max((c["lag_ms"]["max"] for c in clients), default=0),
+            "clients": clients,
+        }